@@ -3,39 +3,586 @@ load_dotenv()  # This loads .env file
 
 
 import os
-from cryptography.fernet import Fernet
+import sys
+import base64
+import hashlib
+import itertools
+import json
+import multiprocessing
+import struct
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from sentinel_metrics import VAULT_BYTES, VAULT_ERRORS, VAULT_SECONDS
+
+# Streaming format: header, then length-prefixed AES-256-GCM frames
+#   header = MAGIC(4) | key_id(4) | salt(16) | chunk_size(4)
+#   frame  = final(1 bit) + length(31 bits) | AESGCM(nonce = counter(11) | final(1), aad = header)
+STREAM_MAGIC = b"SVS1"
+STREAM_HEADER = struct.Struct(">4s4s16sI")
+STREAM_FRAME = struct.Struct(">I")
+STREAM_FINAL_FLAG = 0x80000000
+STREAM_TAG_SIZE = 16
+STREAM_CHUNK_SIZE = int(os.getenv("VAULT_STREAM_CHUNK_SIZE", str(64 * 1024)))
+STREAM_MAX_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Key rotation: re-encryption worker processes and tokens per task
+ROTATE_WORKERS = int(os.getenv("VAULT_ROTATE_WORKERS", str(os.cpu_count() or 1)))
+ROTATE_CHUNK_SIZE = int(os.getenv("VAULT_ROTATE_CHUNK_SIZE", "2000"))
+
+
+def _key_id(raw_key: bytes) -> bytes:
+    """Short fingerprint identifying which master key encrypted a stream."""
+    return hashlib.sha256(raw_key).digest()[:4]
+
+
+def _derive_stream_key(raw_key: bytes, salt: bytes) -> AESGCM:
+    """Derive a per-stream AES-256-GCM key from the master key."""
+    key = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        info=b"sentinel-vault-stream-v1"
+    ).derive(raw_key)
+    return AESGCM(key)
+
+
+def _stream_nonce(counter: int, final: bool) -> bytes:
+    return counter.to_bytes(11, "big") + (b"\x01" if final else b"\x00")
+
+
+class StreamEncryptor:
+    """
+    Incremental encryptor for the chunked stream format.
+    Feed plaintext with update() and finish with finalize(); memory use is
+    bounded by the chunk size regardless of the total payload.
+    """
+    
+    def __init__(self, raw_key: bytes, chunk_size: int = STREAM_CHUNK_SIZE):
+        if not 0 < chunk_size <= STREAM_MAX_CHUNK_SIZE:
+            raise ValueError(f"Invalid stream chunk size: {chunk_size}")
+        
+        salt = os.urandom(16)
+        self.header = STREAM_HEADER.pack(STREAM_MAGIC, _key_id(raw_key), salt, chunk_size)
+        self._aead = _derive_stream_key(raw_key, salt)
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+        self._counter = 0
+        self._header_sent = False
+        self._finalized = False
+    
+    def _frame(self, chunk: bytes, final: bool) -> bytes:
+        sealed = self._aead.encrypt(_stream_nonce(self._counter, final), chunk, self.header)
+        self._counter += 1
+        return STREAM_FRAME.pack(len(sealed) | (STREAM_FINAL_FLAG if final else 0)) + sealed
+    
+    def _take_header(self) -> bytes:
+        if self._header_sent:
+            return b""
+        self._header_sent = True
+        return self.header
+    
+    def update(self, data: bytes) -> bytes:
+        """Buffer plaintext and return any complete frames."""
+        if self._finalized:
+            raise ValueError("Stream already finalized")
+        
+        VAULT_BYTES.inc(len(data), op="stream_encrypt")
+        self._buffer += data
+        out = [self._take_header()]
+        
+        # Always hold back at least one byte so the last frame can be marked final
+        offset = 0
+        while len(self._buffer) - offset > self._chunk_size:
+            out.append(self._frame(bytes(self._buffer[offset:offset + self._chunk_size]), False))
+            offset += self._chunk_size
+        del self._buffer[:offset]
+        
+        return b"".join(out)
+    
+    def finalize(self) -> bytes:
+        """Emit the remaining plaintext as the final frame."""
+        if self._finalized:
+            raise ValueError("Stream already finalized")
+        
+        self._finalized = True
+        out = self._take_header() + self._frame(bytes(self._buffer), True)
+        self._buffer = bytearray()
+        return out
+
+
+class StreamDecryptor:
+    """
+    Incremental decryptor for the chunked stream format.
+    Rejects tampered, reordered or truncated streams.
+    """
+    
+    def __init__(self, keys: Dict[bytes, bytes]):
+        # key_id -> raw master key
+        self._keys = keys
+        self._buffer = bytearray()
+        self._header = None
+        self._aead = None
+        self._chunk_size = 0
+        self._counter = 0
+        self._done = False
+    
+    @property
+    def header_parsed(self) -> bool:
+        return self._header is not None
+    
+    def _parse_header(self):
+        magic, key_id, salt, chunk_size = STREAM_HEADER.unpack_from(self._buffer)
+        if magic != STREAM_MAGIC:
+            raise ValueError("Not a Sentinel-Vault stream")
+        if key_id not in self._keys:
+            raise ValueError("Stream was encrypted with an unknown master key")
+        if not 0 < chunk_size <= STREAM_MAX_CHUNK_SIZE:
+            raise ValueError(f"Invalid stream chunk size: {chunk_size}")
+        
+        self._header = bytes(self._buffer[:STREAM_HEADER.size])
+        self._aead = _derive_stream_key(self._keys[key_id], salt)
+        self._chunk_size = chunk_size
+        del self._buffer[:STREAM_HEADER.size]
+    
+    def update(self, data: bytes) -> bytes:
+        """Buffer ciphertext and return the plaintext of any complete frames."""
+        self._buffer += data
+        
+        if self._header is None:
+            if len(self._buffer) < STREAM_HEADER.size:
+                return b""
+            self._parse_header()
+        
+        out = []
+        offset = 0
+        while len(self._buffer) - offset >= STREAM_FRAME.size:
+            if self._done:
+                raise ValueError("Unexpected data after final frame")
+            
+            (length,) = STREAM_FRAME.unpack_from(self._buffer, offset)
+            final = bool(length & STREAM_FINAL_FLAG)
+            length &= ~STREAM_FINAL_FLAG
+            if length < STREAM_TAG_SIZE or length > self._chunk_size + STREAM_TAG_SIZE:
+                raise ValueError("Corrupted stream frame")
+            
+            start = offset + STREAM_FRAME.size
+            if len(self._buffer) - start < length:
+                break
+            
+            sealed = bytes(self._buffer[start:start + length])
+            out.append(self._open(sealed, final))
+            offset = start + length
+        
+        del self._buffer[:offset]
+        return b"".join(out)
+    
+    def _open(self, sealed: bytes, final: bool) -> bytes:
+        try:
+            chunk = self._aead.decrypt(_stream_nonce(self._counter, final), sealed, self._header)
+        except Exception:
+            VAULT_ERRORS.inc(op="stream_decrypt")
+            raise ValueError("Stream authentication failed. Invalid key or corrupted data")
+        VAULT_BYTES.inc(len(chunk), op="stream_decrypt")
+        self._counter += 1
+        self._done = final
+        return chunk
+    
+    def finalize(self):
+        """Check that the stream ended cleanly with its final frame."""
+        if not self._done or self._buffer:
+            raise ValueError("Stream truncated or incomplete")
+
+class RotationStats:
+    """Running totals for a key rotation job."""
+    
+    MAX_FAILED_LINES = 100
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.processed = 0
+        self.rotated = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.failed_lines: List[int] = []
+    
+    def add(self, chunk: Dict):
+        for field in ("processed", "rotated", "unchanged", "failed"):
+            setattr(self, field, getattr(self, field) + chunk[field])
+        room = self.MAX_FAILED_LINES - len(self.failed_lines)
+        self.failed_lines.extend(chunk["failed_lines"][:max(0, room)])
+    
+    def as_dict(self) -> Dict:
+        seconds = time.perf_counter() - self.started
+        return {
+            "processed": self.processed,
+            "rotated": self.rotated,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+            "failed_lines": self.failed_lines,
+            "seconds": round(seconds, 3),
+            "tokens_per_second": round(self.processed / seconds, 1) if seconds else None
+        }
+
+
+def _split_keys(value: str) -> List[str]:
+    return [key.strip() for key in value.split(",") if key.strip()]
+
 
 class SecurityVault:
     """
     Sentinel-Vault: A modular encryption service for 
     handling sensitive system credentials.
+    
+    SENTINEL_MASTER_KEY encrypts; keys in SENTINEL_PREVIOUS_MASTER_KEYS
+    (newest first) still decrypt, so the master key can be rotated and
+    stored tokens re-encrypted afterwards with rotate_*.
     """
-    def __init__(self, master_key: str = None):
+    def __init__(self, master_key: str = None, previous_keys: Optional[List[str]] = None):
         # Load from env if not provided
         self.key = master_key or os.getenv("SENTINEL_MASTER_KEY")
         
         if not self.key:
             raise ValueError("SENTINEL_MASTER_KEY not found in environment")
         
-        # Ensure key is bytes (Fernet requires bytes, not string)
+        if previous_keys is None:
+            previous_keys = _split_keys(os.getenv("SENTINEL_PREVIOUS_MASTER_KEYS", ""))
+        
+        # Ensure keys are bytes (Fernet requires bytes, not string)
         if isinstance(self.key, str):
             self.key = self.key.encode()
-            
-        self.cipher = Fernet(self.key)
+        self.previous_keys = [k.encode() if isinstance(k, str) else k for k in previous_keys]
+        
+        self.primary = Fernet(self.key)
+        if self.previous_keys:
+            # Encrypts with the primary key; decrypt tries each key in order
+            self.cipher = MultiFernet([self.primary] + [Fernet(k) for k in self.previous_keys])
+        else:
+            self.cipher = self.primary
+        
+        # Raw 32-byte key material for the streaming format
+        self.stream_key = base64.urlsafe_b64decode(self.key)
+        self.stream_keys = {
+            _key_id(raw): raw
+            for raw in [self.stream_key] + [base64.urlsafe_b64decode(k) for k in self.previous_keys]
+        }
+        self._rotate_pool: Optional[ProcessPoolExecutor] = None
+    
+    def encrypt_bytes(self, data: bytes) -> bytes:
+        """Encrypts raw bytes, returning the Fernet token as bytes."""
+        try:
+            with VAULT_SECONDS.time(op="encrypt"):
+                token = self.cipher.encrypt(data)
+        except Exception as e:
+            VAULT_ERRORS.inc(op="encrypt")
+            raise ValueError(f"Encryption failed: {e}")
+        VAULT_BYTES.inc(len(data), op="encrypt")
+        return token
+    
+    def decrypt_bytes(self, token: bytes) -> bytes:
+        """Decrypts a Fernet token back to the original raw bytes."""
+        try:
+            with VAULT_SECONDS.time(op="decrypt"):
+                data = self.cipher.decrypt(token)
+        except Exception as e:
+            VAULT_ERRORS.inc(op="decrypt")
+            raise ValueError(f"Decryption failed. Invalid key or corrupted data: {e}")
+        VAULT_BYTES.inc(len(data), op="decrypt")
+        return data
     
     def encrypt_secret(self, secret_text: str):
         """Encrypts a string using AES-256."""
         try:
-            return self.cipher.encrypt(secret_text.encode()).decode()
+            data = secret_text.encode()
         except Exception as e:
             raise ValueError(f"Encryption failed: {e}")
+        return self.encrypt_bytes(data).decode()
     
     def decrypt_secret(self, encrypted_text: str):
         """Decrypts a string back to plain text."""
         try:
-            return self.cipher.decrypt(encrypted_text.encode()).decode()
+            token = encrypted_text.encode()
         except Exception as e:
             raise ValueError(f"Decryption failed. Invalid key or corrupted data: {e}")
+        
+        plaintext = self.decrypt_bytes(token)
+        try:
+            return plaintext.decode()
+        except UnicodeDecodeError:
+            raise ValueError("Decryption failed. Secret is binary; use the raw (octet-stream) endpoint")
+    
+    def encrypt_many(self, secrets: List[str]) -> List[Dict]:
+        """
+        Encrypt a batch of strings with the shared cipher.
+        Each result carries its index and either "encrypted" or "error".
+        """
+        results = []
+        for index, secret in enumerate(secrets):
+            try:
+                results.append({"index": index, "encrypted": self.encrypt_secret(secret)})
+            except ValueError as e:
+                results.append({"index": index, "error": str(e)})
+        return results
+    
+    def decrypt_many(self, tokens: List[str]) -> List[Dict]:
+        """
+        Decrypt a batch of tokens with the shared cipher.
+        Each result carries its index and either "decrypted" or "error".
+        """
+        results = []
+        for index, token in enumerate(tokens):
+            try:
+                results.append({"index": index, "decrypted": self.decrypt_secret(token)})
+            except ValueError as e:
+                results.append({"index": index, "error": str(e)})
+        return results
+    
+    def rotate_bytes(self, token: bytes) -> Tuple[bytes, bool]:
+        """
+        Re-encrypt a token under the primary key, keeping its timestamp.
+        Returns (token, changed); tokens already under the primary key are
+        returned as they are after an HMAC check, without decrypting.
+        """
+        try:
+            self.primary.extract_timestamp(token)
+            return token, False
+        except InvalidToken:
+            pass
+        
+        try:
+            if not self.previous_keys:
+                raise InvalidToken
+            with VAULT_SECONDS.time(op="rotate"):
+                rotated = self.cipher.rotate(token)
+        except InvalidToken:
+            VAULT_ERRORS.inc(op="rotate")
+            raise ValueError("Rotation failed. Token was not encrypted with a known master key")
+        VAULT_BYTES.inc(len(token), op="rotate")
+        return rotated, True
+    
+    def rotate_secret(self, token: str) -> Tuple[str, bool]:
+        """String form of rotate_bytes."""
+        try:
+            data = token.encode()
+        except Exception as e:
+            raise ValueError(f"Rotation failed: {e}")
+        rotated, changed = self.rotate_bytes(data)
+        return rotated.decode(), changed
+    
+    def rotate_many(self, tokens: List[str]) -> List[Dict]:
+        """
+        Rotate a batch of tokens.
+        Each result carries its index and either "rotated" (plus "changed")
+        or "error".
+        """
+        results = []
+        for index, token in enumerate(tokens):
+            try:
+                rotated, changed = self.rotate_secret(token)
+                results.append({"index": index, "rotated": rotated, "changed": changed})
+            except ValueError as e:
+                results.append({"index": index, "error": str(e)})
+        return results
+    
+    def rotation_pool(self) -> ProcessPoolExecutor:
+        """
+        Worker processes holding this vault's keys, created on first use.
+        Workers are spawned rather than forked, so they never inherit locks
+        (metrics, loggers) held by another thread of the API process.
+        """
+        if self._rotate_pool is None:
+            self._rotate_pool = ProcessPoolExecutor(
+                max_workers=max(1, ROTATE_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_rotate_worker,
+                initargs=(self.key, self.previous_keys)
+            )
+        return self._rotate_pool
+    
+    def submit_rotation(self, start: int, lines: List[bytes]) -> Future:
+        """Rotate a chunk of JSONL lines in the pool; see rotate_lines."""
+        return self.rotation_pool().submit(_rotate_lines, start, lines)
+    
+    def rotate_many_parallel(self, tokens: List[str], chunk_size: int = ROTATE_CHUNK_SIZE) -> List[Dict]:
+        """rotate_many spread across the rotation pool, results in input order."""
+        chunk_size = max(1, chunk_size)
+        futures = [
+            self.rotation_pool().submit(_rotate_token_chunk, start, tokens[start:start + chunk_size])
+            for start in range(0, len(tokens), chunk_size)
+        ]
+        return [result for future in futures for result in future.result()]
+    
+    def rotate_lines(self, lines: Iterable[bytes], chunk_size: int = ROTATE_CHUNK_SIZE,
+                     stats: Optional[RotationStats] = None,
+                     progress: Optional[Callable[[RotationStats], None]] = None) -> Iterator[bytes]:
+        """
+        Re-encrypt a JSONL stream of tokens under the primary key.
+        Each line is a JSON string, an object with an "encrypted" field or
+        a bare token; output lines keep their input form and order. Lines
+        that fail keep their old token and are counted in stats. Chunks
+        are parsed, rotated and serialised in the pool with a bounded
+        number in flight, so memory stays flat for any input size.
+        """
+        stats = stats if stats is not None else RotationStats()
+        window = deque()
+        in_flight = 2 * max(1, ROTATE_WORKERS)
+        
+        def collect() -> bytes:
+            out, chunk_stats = window.popleft().result()
+            stats.add(chunk_stats)
+            if progress:
+                progress(stats)
+            return out
+        
+        lines = iter(lines)
+        start = 0
+        try:
+            while True:
+                chunk = list(itertools.islice(lines, max(1, chunk_size)))
+                if not chunk:
+                    break
+                window.append(self.submit_rotation(start, chunk))
+                start += len(chunk)
+                while len(window) >= in_flight:
+                    yield collect()
+            while window:
+                yield collect()
+        finally:
+            for future in window:
+                future.cancel()
+    
+    def shutdown(self):
+        """Stop the rotation worker pool."""
+        if self._rotate_pool is not None:
+            self._rotate_pool.shutdown(wait=True, cancel_futures=True)
+            self._rotate_pool = None
+    
+    def stream_encryptor(self, chunk_size: int = STREAM_CHUNK_SIZE) -> StreamEncryptor:
+        """Create an incremental encryptor bound to the master key."""
+        return StreamEncryptor(self.stream_key, chunk_size)
+    
+    def stream_decryptor(self) -> StreamDecryptor:
+        """Create an incremental decryptor for streams under any known master key."""
+        return StreamDecryptor(self.stream_keys)
+    
+    def encrypt_stream(self, chunks: Iterable[bytes], chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        """Encrypt an iterable of byte chunks, yielding ciphertext as it is produced."""
+        encryptor = self.stream_encryptor(chunk_size)
+        for chunk in chunks:
+            out = encryptor.update(chunk)
+            if out:
+                yield out
+        yield encryptor.finalize()
+    
+    def decrypt_stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Decrypt an iterable of ciphertext chunks, yielding plaintext as
+        each frame is authenticated. Raises ValueError on tampering or
+        truncation.
+        """
+        decryptor = self.stream_decryptor()
+        for chunk in chunks:
+            out = decryptor.update(chunk)
+            if out:
+                yield out
+        decryptor.finalize()
+
+
+# ============================================================================
+# KEY ROTATION WORKERS
+# ============================================================================
+
+_rotate_vault: Optional[SecurityVault] = None
+
+
+def _init_rotate_worker(master_key: bytes, previous_keys: List[bytes]):
+    global _rotate_vault
+    _rotate_vault = SecurityVault(master_key, previous_keys)
+
+
+def _rotate_token_chunk(start: int, tokens: List[str]) -> List[Dict]:
+    results = _rotate_vault.rotate_many(tokens)
+    for result in results:
+        result["index"] += start
+    return results
+
+
+def _rotate_line(line: bytes) -> Tuple[bytes, bool]:
+    text = line.strip()
+    if text[:1] == b'"':
+        rotated, changed = _rotate_vault.rotate_secret(json.loads(text))
+        return json.dumps(rotated).encode(), changed
+    if text[:1] == b"{":
+        record = json.loads(text)
+        if not isinstance(record.get("encrypted"), str):
+            raise ValueError("Record has no encrypted field")
+        record["encrypted"], changed = _rotate_vault.rotate_secret(record["encrypted"])
+        return json.dumps(record, separators=(",", ":")).encode(), changed
+    rotated, changed = _rotate_vault.rotate_bytes(text)
+    return rotated, changed
+
+
+def _rotate_lines(start: int, lines: List[bytes]) -> Tuple[bytes, Dict]:
+    """Rotate one chunk of JSONL lines; runs in a rotation worker."""
+    out = []
+    stats = {"processed": 0, "rotated": 0, "unchanged": 0, "failed": 0, "failed_lines": []}
+    for number, line in enumerate(lines, start):
+        if not line.strip():
+            continue
+        stats["processed"] += 1
+        try:
+            rotated, changed = _rotate_line(line)
+        except ValueError:
+            # ValueError covers bad JSON too; keep the line so no token is lost
+            out.append(line.rstrip(b"\r\n"))
+            stats["failed"] += 1
+            stats["failed_lines"].append(number)
+            continue
+        out.append(rotated)
+        stats["rotated" if changed else "unchanged"] += 1
+    return b"".join(line + b"\n" for line in out), stats
+
+
+def rotate_file(vault: SecurityVault, source: str, target: str):
+    """
+    Re-encrypt a JSON list (.json) or JSONL file of tokens into target,
+    printing progress to stderr. Returns the final stats.
+    """
+    stats = RotationStats()
+    last_report = [0.0]
+    
+    def report(current: RotationStats):
+        now = time.perf_counter()
+        if now - last_report[0] >= 1:
+            last_report[0] = now
+            summary = current.as_dict()
+            print(f"  {summary['processed']} tokens, {summary['tokens_per_second']} tokens/s, "
+                  f"{summary['failed']} failed", file=sys.stderr)
+    
+    if source.endswith(".json"):
+        with open(source) as f:
+            items = json.load(f)
+        if not isinstance(items, list):
+            raise ValueError(f"{source} must contain a JSON list")
+        lines = (json.dumps(item).encode() for item in items)
+        output = b"".join(vault.rotate_lines(lines, stats=stats, progress=report))
+        rotated = [json.loads(line) for line in output.splitlines()]
+        tmp = target + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(rotated, f)
+    else:
+        tmp = target + ".tmp"
+        with open(source, "rb") as f, open(tmp, "wb") as out:
+            for chunk in vault.rotate_lines(f, stats=stats, progress=report):
+                out.write(chunk)
+    os.replace(tmp, target)
+    return stats.as_dict()
 
 
 def generate_master_key():
@@ -56,6 +603,20 @@ if __name__ == "__main__":
     # Uncomment this line to generate a new master key
     #generate_master_key()
     
+    # Key rotation: python Security_Vault.py rotate <tokens.json|tokens.jsonl> <output>
+    # Set the new key as SENTINEL_MASTER_KEY and the old one(s) in SENTINEL_PREVIOUS_MASTER_KEYS
+    if len(sys.argv) > 1 and sys.argv[1] == "rotate":
+        if len(sys.argv) < 4:
+            print("Usage: python Security_Vault.py rotate <tokens.json|tokens.jsonl> <output>")
+            sys.exit(1)
+        vault = SecurityVault()
+        try:
+            summary = rotate_file(vault, sys.argv[2], sys.argv[3])
+        finally:
+            vault.shutdown()
+        print(json.dumps(summary, indent=2))
+        sys.exit(1 if summary["failed"] else 0)
+    
     # Normal usage (requires SENTINEL_MASTER_KEY in environment)
     try:
         vault = SecurityVault()
@@ -0,0 +1,173 @@
+import os
+import fcntl
+import math
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Shared state for every worker on the host (SQLite buckets + slot lock files)
+ADMISSION_DIR = os.getenv("SENTINEL_ADMISSION_DIR", os.path.join(tempfile.gettempdir(), "sentinel-admission"))
+
+# Token buckets: sustained attempts per minute and burst size
+AUTH_IP_RATE = float(os.getenv("SENTINEL_AUTH_IP_RATE", "30"))
+AUTH_IP_BURST = float(os.getenv("SENTINEL_AUTH_IP_BURST", "10"))
+AUTH_USER_RATE = float(os.getenv("SENTINEL_AUTH_USER_RATE", "10"))
+AUTH_USER_BURST = float(os.getenv("SENTINEL_AUTH_USER_BURST", "5"))
+REGISTER_IP_RATE = float(os.getenv("SENTINEL_REGISTER_IP_RATE", "5"))
+REGISTER_IP_BURST = float(os.getenv("SENTINEL_REGISTER_IP_BURST", "3"))
+
+# Host-wide cap on concurrent bcrypt operations (0 disables)
+BCRYPT_MAX_CONCURRENCY = int(os.getenv("SENTINEL_BCRYPT_CONCURRENCY", str(os.cpu_count() or 1)))
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets kept in a SQLite file so every worker process on the
+    host draws from the same buckets. Each check is one short write
+    transaction; buckets that have refilled completely are pruned.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS buckets (
+            key     TEXT PRIMARY KEY,
+            tokens  REAL NOT NULL,
+            updated REAL NOT NULL,
+            full_at REAL NOT NULL
+        )
+    """
+    _SELECT = "SELECT tokens, updated FROM buckets WHERE key = ?"
+    _UPSERT = "INSERT OR REPLACE INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)"
+    _PRUNE = "DELETE FROM buckets WHERE full_at < ?"
+    _PRUNE_EVERY = 1000
+
+    def __init__(self, path=None):
+        self.path = str(path or Path(ADMISSION_DIR) / "buckets.db")
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._calls = 0
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute(self._SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def acquire(self, key: str, rate_per_minute: float, burst: float) -> float:
+        """
+        Take one token from the bucket for key.
+        Returns 0 if admitted, otherwise the seconds until a token is available.
+        """
+        return self.acquire_all([(key, rate_per_minute, burst)])[1]
+
+    def acquire_all(self, buckets: List[Tuple[str, float, float]]) -> Tuple[Optional[int], float]:
+        """
+        Take one token from each (key, rate_per_minute, burst) bucket, or
+        from none of them: tokens are only spent if every bucket has one,
+        so a request rejected by one bucket costs nothing in the others.
+        Buckets with a rate of 0 or less are disabled.
+        Returns (None, 0) if admitted, otherwise the index of the first
+        bucket that rejected and the seconds until all of them would admit.
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = []
+            rejected, retry_after = None, 0.0
+            for index, (key, rate_per_minute, burst) in enumerate(buckets):
+                if rate_per_minute <= 0:
+                    continue
+                rate = rate_per_minute / 60.0
+                row = conn.execute(self._SELECT, (key,)).fetchone()
+                tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+                if tokens < 1:
+                    if rejected is None:
+                        rejected = index
+                    retry_after = max(retry_after, (1 - tokens) / rate)
+                levels.append((key, tokens, rate, burst))
+
+            # Refill is computed from the stored time, so a rejection writes nothing
+            if rejected is None:
+                for key, tokens, rate, burst in levels:
+                    tokens -= 1
+                    conn.execute(self._UPSERT, (key, tokens, now, now + (burst - tokens) / rate))
+
+            self._calls += 1
+            if self._calls % self._PRUNE_EVERY == 0:
+                conn.execute(self._PRUNE, (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return rejected, retry_after
+
+
+class ConcurrencySlots:
+    """
+    Host-wide semaphore made of N lock files. A slot is held with a
+    non-blocking flock, so a crashed worker releases its slots
+    automatically and a saturated host is detected without waiting.
+    """
+
+    def __init__(self, slots: int = BCRYPT_MAX_CONCURRENCY, directory=None, name: str = "bcrypt"):
+        self.slots = slots
+        self.directory = Path(directory or ADMISSION_DIR)
+        self.name = name
+        self._files = {}
+        self._held = set()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _file(self, index: int):
+        if self._pid != os.getpid():
+            # Inherited descriptors share locks with the parent; start over
+            self._files, self._held, self._pid = {}, set(), os.getpid()
+        f = self._files.get(index)
+        if f is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            f = open(self.directory / f"{self.name}-slot-{index}.lock", "a")
+            self._files[index] = f
+        return f
+
+    def try_acquire(self) -> Optional[int]:
+        """Take a free slot and return its index, or None if all are busy."""
+        if self.slots <= 0:
+            return -1
+        with self._lock:
+            start = os.getpid() % self.slots
+            for step in range(self.slots):
+                index = (start + step) % self.slots
+                if index in self._held:
+                    continue
+                try:
+                    fcntl.flock(self._file(index), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                self._held.add(index)
+                return index
+        return None
+
+    def release(self, index: int):
+        if index < 0:
+            return
+        with self._lock:
+            if index in self._held:
+                fcntl.flock(self._files[index], fcntl.LOCK_UN)
+                self._held.discard(index)
+
+
+def retry_after_header(seconds: float) -> str:
+    """Retry-After value in whole seconds (at least 1)."""
+    return str(max(1, math.ceil(seconds)))
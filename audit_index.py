@@ -0,0 +1,390 @@
+import os
+import heapq
+import json
+import mmap
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from cursors import decode_cursor, encode_cursor
+
+# Events per query page
+AUDIT_QUERY_LIMIT = int(os.getenv("SENTINEL_AUDIT_QUERY_LIMIT", "100"))
+AUDIT_QUERY_MAX_LIMIT = int(os.getenv("SENTINEL_AUDIT_QUERY_MAX_LIMIT", "1000"))
+
+# Lines per block when indexing a plain segment that has no sidecar
+PLAIN_BLOCK_LINES = 1000
+
+SEGMENT_PATTERNS = ("audit-*.jsonl", "audit-*.jsonl.gz")
+BLOCKS_SUFFIX = ".blocks"
+INDEX_SUFFIX = ".idx"
+
+# Posting lists kept per segment: index name -> event fields it covers
+POSTINGS = {
+    "users": ("user", "subject"),
+    "routes": ("route",),
+    "statuses": ("status",),
+}
+
+
+def block_entry(offset: int, length: int, events: List[Dict]) -> Dict:
+    """Sidecar record for one block: where it is, its time range and what it holds."""
+    times = [e["ts"] for e in events if e.get("ts")]
+    entry = {
+        "offset": offset,
+        "length": length,
+        "count": len(events),
+        "t0": min(times) if times else "",
+        "t1": max(times) if times else "",
+    }
+    for name, fields in POSTINGS.items():
+        entry[name] = sorted({str(e[f]) for e in events for f in fields if e.get(f) is not None})
+    return entry
+
+
+class SegmentIndexWriter:
+    """
+    Writer side of a segment's sidecar index. Every block is appended to
+    <segment>.blocks as it is written; when the segment rotates, the
+    sidecar is compacted into <segment>.idx with per-user, per-route and
+    per-status posting lists.
+    """
+
+    def __init__(self, segment: Path):
+        self.segment = Path(segment)
+        self.blocks_path = Path(str(segment) + BLOCKS_SUFFIX)
+        self._file = open(self.blocks_path, "a")
+
+    def add(self, offset: int, length: int, events: List[Dict]):
+        self._file.write(json.dumps(block_entry(offset, length, events), separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def finalize(self):
+        """Write the compacted index and drop the per-block sidecar."""
+        self._file.close()
+        index = SegmentIndex(self.segment)
+        index.refresh()
+        index.save()
+        self.blocks_path.unlink()
+
+
+class SegmentIndex:
+    """
+    Block list and posting lists for one segment, loaded from its .idx,
+    its .blocks sidecar (read incrementally while the segment is still
+    being written) or, failing both, by scanning the segment once.
+    """
+
+    def __init__(self, segment: Path):
+        self.segment = Path(segment)
+        self.compressed = self.segment.suffix == ".gz"
+        self.blocks: List[Tuple[int, int, int, str, str]] = []
+        self.postings: Dict[str, Dict[str, List[int]]] = {name: {} for name in POSTINGS}
+        self.final = False
+        self._sidecar_pos = 0
+        self._scanned_to = 0
+        self._lock = threading.Lock()
+
+    @property
+    def index_path(self) -> Path:
+        return Path(str(self.segment) + INDEX_SUFFIX)
+
+    @property
+    def blocks_path(self) -> Path:
+        return Path(str(self.segment) + BLOCKS_SUFFIX)
+
+    def _add(self, entry: Dict):
+        block_id = len(self.blocks)
+        self.blocks.append((entry["offset"], entry["length"], entry["count"], entry["t0"], entry["t1"]))
+        for name in POSTINGS:
+            postings = self.postings[name]
+            for value in entry[name]:
+                postings.setdefault(value, []).append(block_id)
+
+    def refresh(self):
+        """Pick up blocks written since the last call."""
+        with self._lock:
+            if self.final:
+                return
+            if not self.index_path.exists():
+                try:
+                    self._read_sidecar()
+                    return
+                except FileNotFoundError:
+                    # No sidecar, or the writer compacted it just now
+                    pass
+            if self.index_path.exists():
+                self._load_index()
+            elif not self._sidecar_pos:
+                self._scan_segment()
+
+    def _load_index(self):
+        with open(self.index_path) as f:
+            data = json.load(f)
+        self.blocks = [tuple(block) for block in data["blocks"]]
+        self.postings = {name: data["postings"].get(name, {}) for name in POSTINGS}
+        self.final = True
+
+    def _read_sidecar(self):
+        with open(self.blocks_path) as f:
+            f.seek(self._sidecar_pos)
+            while True:
+                line = f.readline()
+                if not line.endswith("\n"):
+                    # A block record still being written; read it next time
+                    break
+                self._add(json.loads(line))
+                self._sidecar_pos = f.tell()
+
+    def _scan_segment(self):
+        """Index a segment with no sidecar (older trail files) by reading it once."""
+        with open(self.segment, "rb") as f:
+            f.seek(self._scanned_to)
+            data = f.read()
+        base = self._scanned_to
+        for start, end, events in (_gzip_members(data) if self.compressed else _plain_blocks(data)):
+            self._add(block_entry(base + start, end - start, events))
+            self._scanned_to = base + end
+
+    def save(self):
+        """Write the compacted index next to the segment."""
+        data = {
+            "segment": self.segment.name,
+            "blocks": self.blocks,
+            "postings": self.postings,
+        }
+        tmp = Path(str(self.index_path) + ".tmp")
+        tmp.write_text(json.dumps(data, separators=(",", ":")))
+        os.replace(tmp, self.index_path)
+        self.final = True
+
+    def candidates(self, filters: Dict[str, str], since: str, until: str) -> List[int]:
+        """Block ids that may hold matching events (posting list intersection + time overlap)."""
+        with self._lock:
+            ids = None
+            for name, value in filters.items():
+                posting = set(self.postings[name].get(value, ()))
+                ids = posting if ids is None else ids & posting
+            ids = range(len(self.blocks)) if ids is None else sorted(ids)
+            return [
+                i for i in ids
+                if self.blocks[i][2] and (not since or self.blocks[i][4] >= since)
+                and (not until or self.blocks[i][3] < until)
+            ]
+
+
+def _gzip_members(data: bytes) -> Iterator[Tuple[int, int, List[Dict]]]:
+    """Split concatenated gzip members, yielding (start, end, events) per complete member."""
+    view = memoryview(data)
+    offset = 0
+    while offset < len(data):
+        decompressor = zlib.decompressobj(wbits=31)
+        try:
+            text = decompressor.decompress(view[offset:])
+        except zlib.error:
+            return
+        if not decompressor.eof:
+            # Truncated member: the writer is mid-batch or crashed mid-batch
+            return
+        end = len(data) - len(decompressor.unused_data)
+        yield offset, end, _parse_lines(text)
+        offset = end
+
+
+def _plain_blocks(data: bytes) -> Iterator[Tuple[int, int, List[Dict]]]:
+    offset = 0
+    complete = data.rfind(b"\n") + 1
+    while offset < complete:
+        end = offset
+        for _ in range(PLAIN_BLOCK_LINES):
+            newline = data.find(b"\n", end, complete)
+            if newline < 0:
+                break
+            end = newline + 1
+        yield offset, end, _parse_lines(data[offset:end])
+        offset = end
+
+
+def _parse_lines(text: bytes) -> List[Dict]:
+    events = []
+    for line in text.splitlines():
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            continue
+    return events
+
+
+def normalize_time(value: Optional[str]) -> str:
+    """
+    Parse an ISO timestamp into the trail's own format (naive UTC isoformat).
+
+    Raises:
+        ValueError: If the value is not an ISO 8601 timestamp
+    """
+    if not value:
+        return ""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value}")
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed.isoformat()
+
+
+class AuditIndex:
+    """
+    Query side of the audit trail.
+    Keeps a SegmentIndex per segment file in the trail directory and
+    answers filtered, paginated queries by decompressing only the blocks
+    whose posting lists and time range match, read through mmap. Events
+    come back in time order across every worker's segments.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._segments: Dict[Path, SegmentIndex] = {}
+        self._lock = threading.Lock()
+
+    def segments(self) -> List[SegmentIndex]:
+        """Refresh and return the index of every segment in the directory."""
+        paths = set()
+        for pattern in SEGMENT_PATTERNS:
+            paths.update(self.directory.glob(pattern))
+        with self._lock:
+            for gone in set(self._segments) - paths:
+                del self._segments[gone]
+            indexes = [self._segments.setdefault(path, SegmentIndex(path)) for path in sorted(paths)]
+        for index in indexes:
+            try:
+                index.refresh()
+            except (OSError, ValueError) as e:
+                print(f"AUDIT INDEX ERROR: {index.segment.name}: {e}")
+        return indexes
+
+    @staticmethod
+    def _read_block(index: SegmentIndex, view, block_id: int) -> List[Dict]:
+        offset, length = index.blocks[block_id][:2]
+        data = view[offset:offset + length]
+        if index.compressed:
+            data = zlib.decompress(data, wbits=31)
+        return _parse_lines(data)
+
+    def query(self, user: Optional[str] = None, route: Optional[str] = None,
+              status: Optional[int] = None, since: Optional[str] = None,
+              until: Optional[str] = None, limit: int = AUDIT_QUERY_LIMIT,
+              cursor: Optional[str] = None) -> Dict:
+        """
+        Events matching every given filter, oldest first.
+        user matches the authenticated user or the auth subject; since is
+        inclusive, until exclusive. Pass next_cursor back for the next page.
+
+        Raises:
+            ValueError: On a malformed timestamp or a cursor for other filters
+        """
+        limit = max(1, min(limit, AUDIT_QUERY_MAX_LIMIT))
+        since, until = normalize_time(since), normalize_time(until)
+        filters = {
+            name: str(value) for name, value in
+            (("users", user), ("routes", route), ("statuses", status)) if value is not None
+        }
+        scope = json.dumps([filters, since, until], sort_keys=True)
+        try:
+            after = decode_cursor(cursor, scope)
+        except ValueError:
+            raise ValueError("Invalid cursor for these filters")
+        after_key = tuple(after.split("\t", 1)) if after else None
+
+        def matches(event: Dict) -> bool:
+            ts = event.get("ts", "")
+            if since and ts < since or until and ts >= until:
+                return False
+            if after_key and (ts, event.get("id", "")) <= after_key:
+                return False
+            if user is not None and user not in (event.get("user"), event.get("subject")):
+                return False
+            if route is not None and event.get("route") != route:
+                return False
+            return status is None or str(event.get("status")) == str(status)
+
+        # Candidate blocks from every segment, in order of their first event
+        floor = after_key[0] if after_key and after_key[0] > since else since
+        candidates = []
+        for index in self.segments():
+            for block_id in index.candidates(filters, floor, until):
+                candidates.append((index.blocks[block_id][3], str(index.segment), block_id, index))
+        candidates.sort(key=lambda c: c[:3])
+
+        # Merge blocks lazily: an event can be emitted once no unread block
+        # can start before it, so only the blocks the page needs are read
+        results = []
+        heap = []
+        views = {}
+        blocks_read = 0
+        try:
+            for t0, _, block_id, index in candidates:
+                while heap and heap[0][0] < t0 and len(results) < limit:
+                    results.append(heapq.heappop(heap)[2])
+                if len(results) >= limit:
+                    break
+                view = views.get(index.segment)
+                if view is None:
+                    try:
+                        with open(index.segment, "rb") as f:
+                            view = views[index.segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    except FileNotFoundError:
+                        # Pruned by retention since the listing
+                        continue
+                blocks_read += 1
+                for event in self._read_block(index, view, block_id):
+                    if matches(event):
+                        heapq.heappush(heap, (event.get("ts", ""), event.get("id", ""), event))
+            while heap and len(results) < limit:
+                results.append(heapq.heappop(heap)[2])
+        finally:
+            for view in views.values():
+                view.close()
+
+        more = bool(heap) or blocks_read < len(candidates)
+        next_cursor = None
+        if more and len(results) == limit:
+            last = results[-1]
+            next_cursor = encode_cursor(f"{last.get('ts', '')}\t{last.get('id', '')}", scope)
+
+        return {
+            "events": results,
+            "count": len(results),
+            "next_cursor": next_cursor,
+            "blocks_read": blocks_read,
+            "blocks_total": sum(len(index.blocks) for index in self._segments.values()),
+        }
+
+
+if __name__ == "__main__":
+    # Usage: python audit_index.py rebuild [directory]
+    #        python audit_index.py query [directory] [user]
+    import sys
+    from audit_trail import AUDIT_TRAIL_DIR
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    trail_dir = sys.argv[2] if len(sys.argv) > 2 else AUDIT_TRAIL_DIR
+
+    if command == "rebuild":
+        # Compact every segment that has no .idx yet (run after the writers have stopped)
+        for segment in AuditIndex(trail_dir).segments():
+            if not segment.final:
+                segment.save()
+                if segment.blocks_path.exists():
+                    segment.blocks_path.unlink()
+                print(f"Indexed {segment.segment.name}: {len(segment.blocks)} blocks")
+    elif command == "query":
+        page = AuditIndex(trail_dir).query(user=sys.argv[3] if len(sys.argv) > 3 else None)
+        for record in page["events"]:
+            print(json.dumps(record))
+        print(f"{page['count']} events, {page['blocks_read']}/{page['blocks_total']} blocks read")
+    else:
+        print("Usage: python audit_index.py rebuild|query [directory] [user]")
+        sys.exit(1)
@@ -0,0 +1,206 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import asyncio
+import fcntl
+import gzip
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from aws_sentinel import AuditSummary
+
+# Snapshot storage and scan schedule
+SNAPSHOT_DIR = os.getenv("AWS_SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_RETENTION = int(os.getenv("AWS_SNAPSHOT_RETENTION", "168"))
+SCAN_INTERVAL_SECONDS = float(os.getenv("AWS_SCAN_INTERVAL_SECONDS", "0"))
+SNAPSHOT_VERSION = 1
+
+
+class SnapshotStore:
+    """
+    Versioned, gzip-compressed audit snapshots on disk.
+    Snapshots are immutable, so loaded ones are kept in a small LRU and
+    served from memory.
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR, retention: int = SNAPSHOT_RETENTION,
+                 cache_size: int = 4):
+        self.directory = Path(directory)
+        self.retention = retention
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def _path(self, snapshot_id: str) -> Path:
+        return self.directory / f"audit-{snapshot_id}.json.gz"
+
+    def list_ids(self) -> List[str]:
+        """Snapshot IDs, oldest first."""
+        if not self.directory.exists():
+            return []
+        return sorted(
+            p.name[len("audit-"):-len(".json.gz")]
+            for p in self.directory.glob("audit-*.json.gz")
+        )
+
+    def latest_id(self) -> Optional[str]:
+        ids = self.list_ids()
+        return ids[-1] if ids else None
+
+    def latest_age(self) -> Optional[float]:
+        """Seconds since the newest snapshot was written, or None."""
+        latest = self.latest_id()
+        if latest is None:
+            return None
+        return time.time() - self._path(latest).stat().st_mtime
+
+    def write(self, audits: List[Dict], started_at: str) -> str:
+        """Persist one scan atomically and return its snapshot ID."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        snapshot_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+
+        summary = AuditSummary()
+        for audit in audits:
+            summary.add(audit)
+
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "id": snapshot_id,
+            "started_at": started_at,
+            "finished_at": datetime.utcnow().isoformat(),
+            "summary": summary.as_dict(),
+            "audits": audits
+        }
+
+        path = self._path(snapshot_id)
+        tmp = path.with_suffix(".tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+        self._prune()
+        return snapshot_id
+
+    def load(self, snapshot_id: str) -> Dict:
+        """
+        Load a snapshot by ID.
+
+        Raises:
+            ValueError: If the snapshot does not exist or has an unknown version
+        """
+        with self._lock:
+            if snapshot_id in self._cache:
+                self._cache.move_to_end(snapshot_id)
+                return self._cache[snapshot_id]
+
+        path = self._path(snapshot_id)
+        if "/" in snapshot_id or not path.exists():
+            raise ValueError(f"Snapshot not found: {snapshot_id}")
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {snapshot.get('version')}")
+
+        with self._lock:
+            self._cache[snapshot_id] = snapshot
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return snapshot
+
+    def _prune(self):
+        """Delete the oldest snapshots beyond the retention count."""
+        if self.retention <= 0:
+            return
+        for snapshot_id in self.list_ids()[:-self.retention]:
+            self._path(snapshot_id).unlink(missing_ok=True)
+
+
+def _statuses(audit: Dict) -> Dict[str, Optional[str]]:
+    """Status of every check result in an audit, keyed by check name."""
+    return {
+        name: result.get("status")
+        for name, result in audit.items()
+        if isinstance(result, dict) and "status" in result
+    }
+
+
+def diff_snapshots(old: Dict, new: Dict) -> Dict:
+    """Report buckets added, removed, or whose check statuses changed."""
+    before = {a["bucket"]: _statuses(a) for a in old.get("audits", [])}
+    after = {a["bucket"]: _statuses(a) for a in new.get("audits", [])}
+
+    changed = []
+    for bucket in sorted(before.keys() & after.keys()):
+        fields = sorted(before[bucket].keys() | after[bucket].keys())
+        changes = {
+            field: {"from": before[bucket].get(field), "to": after[bucket].get(field)}
+            for field in fields
+            if before[bucket].get(field) != after[bucket].get(field)
+        }
+        if changes:
+            changed.append({"bucket": bucket, "changes": changes})
+
+    return {
+        "from": old.get("id"),
+        "to": new.get("id"),
+        "added": [{"bucket": b, **after[b]} for b in sorted(after.keys() - before.keys())],
+        "removed": sorted(before.keys() - after.keys()),
+        "changed": changed
+    }
+
+
+class ScanScheduler:
+    """
+    Periodic full scans written to a SnapshotStore.
+    A host-wide lock file plus the age of the latest snapshot keep several
+    workers (or a worker and the daemon) from scanning the same interval.
+    """
+
+    def __init__(self, sentinel, store: SnapshotStore, interval: float = SCAN_INTERVAL_SECONDS):
+        self.sentinel = sentinel
+        self.store = store
+        self.interval = interval
+
+    def scan_once(self, force: bool = False) -> Optional[str]:
+        """Run one scan if it is due. Returns the new snapshot ID, or None if skipped."""
+        self.store.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.store.directory / ".scan.lock", "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+
+            age = self.store.latest_age()
+            if not force and age is not None and age < self.interval * 0.9:
+                return None
+
+            started_at = datetime.utcnow().isoformat()
+            audits = self.sentinel.audit_all_buckets(fresh=True)
+            return self.store.write(audits, started_at)
+
+    async def run(self):
+        """Scan loop for the API lifespan; scans run in a worker thread."""
+        while True:
+            try:
+                await asyncio.to_thread(self.scan_once)
+            except Exception as e:
+                print(f"SNAPSHOT SCAN ERROR: {e}")
+            await asyncio.sleep(self.interval)
+
+    def run_forever(self):
+        """Blocking scan loop for the standalone daemon."""
+        while True:
+            try:
+                snapshot_id = self.scan_once()
+                if snapshot_id:
+                    print(f"Snapshot written: {snapshot_id}")
+            except Exception as e:
+                print(f"SNAPSHOT SCAN ERROR: {e}")
+            time.sleep(self.interval)
@@ -0,0 +1,351 @@
+import os
+import asyncio
+import gzip
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from audit_index import BLOCKS_SUFFIX, INDEX_SUFFIX, SEGMENT_PATTERNS, SegmentIndexWriter
+from sentinel_metrics import AUDIT_EVENTS, AUDIT_FLUSH_SECONDS, AUDIT_WRITE_ERRORS
+
+# Compliance trail of API operations: one JSONL file set per worker process
+AUDIT_TRAIL_DIR = os.getenv("SENTINEL_AUDIT_DIR", "logs/audit")
+AUDIT_ENABLED = os.getenv("SENTINEL_AUDIT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Events held in memory while the writer is busy; beyond this, requests wait
+# up to AUDIT_ENQUEUE_TIMEOUT seconds for room and the event is then dropped
+AUDIT_QUEUE_SIZE = int(os.getenv("SENTINEL_AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_ENQUEUE_TIMEOUT = float(os.getenv("SENTINEL_AUDIT_ENQUEUE_TIMEOUT", "0.05"))
+
+# Events per write, and how long a partial batch may wait for company
+AUDIT_BATCH_SIZE = int(os.getenv("SENTINEL_AUDIT_BATCH_SIZE", "500"))
+AUDIT_LINGER_SECONDS = float(os.getenv("SENTINEL_AUDIT_LINGER_SECONDS", "0.2"))
+
+# Start a new file past this size; gzip each batch as its own member
+AUDIT_MAX_FILE_BYTES = int(os.getenv("SENTINEL_AUDIT_MAX_FILE_BYTES", str(64 * 1024 * 1024)))
+AUDIT_COMPRESS = os.getenv("SENTINEL_AUDIT_COMPRESS", "true").lower() in ("1", "true", "yes")
+AUDIT_FSYNC = os.getenv("SENTINEL_AUDIT_FSYNC", "false").lower() in ("1", "true", "yes")
+
+# Retention, applied by each writer when it rotates and at most hourly:
+# segments untouched for AUDIT_RETENTION_DAYS are deleted (0 keeps them), and
+# beyond AUDIT_MAX_SEGMENTS completed segments the oldest go (0 = no cap)
+AUDIT_RETENTION_DAYS = float(os.getenv("SENTINEL_AUDIT_RETENTION_DAYS", "90"))
+AUDIT_MAX_SEGMENTS = int(os.getenv("SENTINEL_AUDIT_MAX_SEGMENTS", "0"))
+AUDIT_PRUNE_INTERVAL_SECONDS = 3600
+
+# Routes that are not worth a trail entry
+AUDIT_EXCLUDE_ROUTES = {
+    r.strip() for r in os.getenv("SENTINEL_AUDIT_EXCLUDE_ROUTES", "/metrics").split(",") if r.strip()
+}
+
+
+def annotate(request, **fields):
+    """
+    Attach operation metadata to the request's audit event
+    (counts, sizes, targets - never secret values).
+    """
+    request.scope.setdefault("state", {}).setdefault("audit", {}).update(fields)
+
+
+class AuditFileWriter:
+    """
+    Appends batches of events to size-rotated JSONL files in one directory.
+    Each process writes its own files, so workers never interleave lines,
+    and prunes segments past the retention limits from its writer thread.
+    With compression on, every batch is a complete gzip member: the file
+    is a valid .gz at every batch boundary and a crash loses at most the
+    batch being written. Each batch is one block of the segment's sidecar
+    index (see audit_index).
+    """
+
+    def __init__(self, directory=AUDIT_TRAIL_DIR, max_bytes: int = AUDIT_MAX_FILE_BYTES,
+                 compress: bool = AUDIT_COMPRESS, fsync: bool = AUDIT_FSYNC,
+                 retention_days: float = AUDIT_RETENTION_DAYS, max_segments: int = AUDIT_MAX_SEGMENTS):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.fsync = fsync
+        self.retention_days = retention_days
+        self.max_segments = max_segments
+        self._next_prune = 0.0
+        self._file = None
+        self._index: Optional[SegmentIndexWriter] = None
+        self._size = 0
+        self._pid = None
+
+    def _open(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        suffix = ".jsonl.gz" if self.compress else ".jsonl"
+        path = self.directory / f"audit-{stamp}-{os.getpid()}{suffix}"
+        self._file = open(path, "ab")
+        self._index = SegmentIndexWriter(path)
+        self._size = self._file.tell()
+        self._pid = os.getpid()
+        self.prune()
+
+    def prune(self):
+        """
+        Delete expired segments with their index files. The count cap only
+        counts completed segments (no .blocks sidecar), so it never removes
+        a file another worker is still writing.
+        """
+        self._next_prune = time.monotonic() + AUDIT_PRUNE_INTERVAL_SECONDS
+        if self.retention_days <= 0 and self.max_segments <= 0:
+            return
+        current = Path(self._file.name) if self._file is not None else None
+        segments = sorted(
+            (p for pattern in SEGMENT_PATTERNS for p in self.directory.glob(pattern) if p != current),
+            key=lambda p: p.name
+        )
+        expired = set()
+        if self.retention_days > 0:
+            cutoff = time.time() - self.retention_days * 86400
+            for path in segments:
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        expired.add(path)
+                except FileNotFoundError:
+                    continue
+        if self.max_segments > 0:
+            completed = [
+                p for p in segments
+                if p not in expired and not Path(str(p) + BLOCKS_SUFFIX).exists()
+            ]
+            expired.update(completed[:max(0, len(completed) - self.max_segments)])
+
+        for path in expired:
+            for target in (path, Path(str(path) + BLOCKS_SUFFIX), Path(str(path) + INDEX_SUFFIX)):
+                try:
+                    target.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"AUDIT TRAIL PRUNE ERROR: {e}")
+
+    def write(self, events: List[Dict]):
+        """Write one batch; rotates first if the current file is full."""
+        if self._file is None or self._pid != os.getpid() or self._size >= self.max_bytes:
+            self.close()
+            self._open()
+        elif time.monotonic() >= self._next_prune:
+            self.prune()
+
+        data = "".join(json.dumps(e, separators=(",", ":"), default=str) + "\n" for e in events).encode()
+        if self.compress:
+            data = gzip.compress(data, compresslevel=6)
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._index.add(self._size, len(data), events)
+        self._size += len(data)
+
+    def close(self):
+        """Close the current segment and compact its index."""
+        if self._file is not None and self._pid == os.getpid():
+            self._file.close()
+            self._index.finalize()
+        self._file = None
+        self._index = None
+
+
+class AuditTrail:
+    """
+    Non-blocking audit trail.
+    Requests put events on a bounded asyncio queue; one background task
+    takes them off in batches and hands each batch to a single I/O thread,
+    so handlers never touch the disk. When the disk falls behind, the
+    queue fills, requests wait briefly for room (backpressure) and then
+    drop the event. Drops are counted and written to the trail as an
+    "audit.dropped" record once the writer catches up.
+    """
+
+    def __init__(self, writer: Optional[AuditFileWriter] = None,
+                 queue_size: int = AUDIT_QUEUE_SIZE, batch_size: int = AUDIT_BATCH_SIZE,
+                 linger: float = AUDIT_LINGER_SECONDS, enqueue_timeout: float = AUDIT_ENQUEUE_TIMEOUT):
+        self.writer = writer or AuditFileWriter()
+        self.queue_size = max(1, queue_size)
+        self.batch_size = max(1, batch_size)
+        self.linger = linger
+        self.enqueue_timeout = enqueue_timeout
+        self.dropped = 0
+        self.written = 0
+        self._unreported_drops = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._io: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the writer task on the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audit-writer")
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Flush everything queued so far, then stop the writer."""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        await asyncio.get_running_loop().run_in_executor(self._io, self.writer.close)
+        self._io.shutdown(wait=True)
+
+    def _drop(self, count: int = 1):
+        self.dropped += count
+        self._unreported_drops += count
+        AUDIT_EVENTS.inc(count, outcome="dropped")
+
+    async def record(self, event: Dict):
+        """Queue an event, waiting at most enqueue_timeout for room."""
+        if not self.running:
+            return
+        try:
+            self._queue.put_nowait(event)
+            return
+        except asyncio.QueueFull:
+            pass
+        try:
+            await asyncio.wait_for(self._queue.put(event), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self._drop()
+
+    async def _next_batch(self) -> List[Optional[Dict]]:
+        batch = [await self._queue.get()]
+        if self._queue.qsize() < self.batch_size and batch[0] is not None:
+            # Light load: give the batch a moment to fill before paying for a write
+            await asyncio.sleep(self.linger)
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = await self._next_batch()
+            if None in batch:
+                stopping = True
+                batch = [event for event in batch if event is not None]
+                # Anything queued behind the stop marker still belongs in the trail
+                while not self._queue.empty():
+                    event = self._queue.get_nowait()
+                    if event is not None:
+                        batch.append(event)
+
+            events = len(batch)
+            unreported, self._unreported_drops = self._unreported_drops, 0
+            if unreported:
+                batch.append({
+                    "ts": datetime.utcnow().isoformat(),
+                    "type": "audit.dropped",
+                    "count": unreported,
+                    "pid": os.getpid(),
+                })
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                await loop.run_in_executor(self._io, self.writer.write, batch)
+            except Exception as e:
+                print(f"AUDIT TRAIL WRITE ERROR: {e}")
+                AUDIT_WRITE_ERRORS.inc()
+                self._unreported_drops += unreported
+                self._drop(events)
+                continue
+            AUDIT_FLUSH_SECONDS.observe(time.perf_counter() - start)
+            AUDIT_EVENTS.inc(events, outcome="written")
+            self.written += events
+
+
+class AuditTrailMiddleware:
+    """
+    Pure ASGI middleware that records one event per HTTP request once the
+    response is complete: route template, path parameters, status,
+    latency, byte counts, the authenticated user (set by the auth
+    dependency) and any annotate() metadata. Bodies are never recorded.
+    """
+
+    def __init__(self, app, trail: AuditTrail):
+        self.app = app
+        self.trail = trail
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.trail.running:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+        sizes = [0, 0]
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes[0] += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes[1] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            if route not in AUDIT_EXCLUDE_ROUTES:
+                await self.trail.record(self._event(scope, route, status[0], sizes, start))
+
+    @staticmethod
+    def _event(scope, route: Optional[str], status: int, sizes: List[int], start: float) -> Dict:
+        state = scope.get("state") or {}
+        client = scope.get("client")
+        event = {
+            "ts": datetime.utcnow().isoformat(),
+            "type": "http",
+            "id": uuid.uuid4().hex,
+            "method": scope.get("method"),
+            "route": route or "unmatched",
+            "path": scope.get("path"),
+            "status": status,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+            "user": state.get("user"),
+            "client": client[0] if client else None,
+            "bytes_in": sizes[0],
+            "bytes_out": sizes[1],
+        }
+        if scope.get("path_params"):
+            event["params"] = dict(scope["path_params"])
+        if scope.get("query_string"):
+            event["query"] = scope["query_string"].decode("latin-1")
+        if state.get("audit"):
+            event.update(state["audit"])
+        return event
+
+
+if __name__ == "__main__":
+    # Usage: python audit_trail.py [directory]
+    # Prints every event in a trail directory, oldest file first.
+    import sys
+
+    directory = Path(sys.argv[1] if len(sys.argv) > 1 else AUDIT_TRAIL_DIR)
+    for path in sorted(p for pattern in SEGMENT_PATTERNS for p in directory.glob(pattern)):
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt") as f:
+            for line in f:
+                print(line, end="")
@@ -0,0 +1,287 @@
+import os
+import sys
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import boto3
+from botocore.credentials import CredentialProvider, DeferredRefreshableCredentials
+from botocore.session import get_session
+
+from aws_sentinel import AWS_AUDIT_ALL_TIMEOUT, AWSSentinel, AuditSummary
+
+# Accounts to audit: JSON list of {"name", "profile" | "role_arn", ...}
+AWS_ACCOUNTS_FILE = os.getenv("AWS_ACCOUNTS_FILE", "aws_accounts.json")
+# Accounts audited at once, and S3 calls in flight per account
+ACCOUNT_CONCURRENCY = int(os.getenv("AWS_ACCOUNT_CONCURRENCY", "8"))
+ACCOUNT_MAX_WORKERS = int(os.getenv("AWS_ACCOUNT_MAX_WORKERS", "4"))
+
+
+def load_accounts(path=AWS_ACCOUNTS_FILE) -> List[Dict]:
+    """
+    Read the account list. Each entry needs a unique "name" and at most one
+    of "profile" (a named AWS profile) or "role_arn" (assumed from the
+    default credentials, with optional "external_id"). "region" is optional.
+    An entry with neither uses the default credentials.
+
+    Raises:
+        ValueError: If the file is not a list of valid entries
+    """
+    if not os.path.exists(path):
+        return []
+
+    with open(path, 'r') as f:
+        accounts = json.load(f)
+
+    if not isinstance(accounts, list):
+        raise ValueError(f"{path} must contain a JSON list of accounts")
+
+    names = set()
+    for account in accounts:
+        name = account.get("name") if isinstance(account, dict) else None
+        if not name:
+            raise ValueError(f"Every account in {path} needs a name")
+        if name in names:
+            raise ValueError(f"Duplicate account name: {name}")
+        if account.get("profile") and account.get("role_arn"):
+            raise ValueError(f"Account {name}: set profile or role_arn, not both")
+        names.add(name)
+
+    return accounts
+
+
+class _AssumeRoleProvider(CredentialProvider):
+    """Credential provider that assumes a role on first use and refreshes before expiry."""
+
+    METHOD = "sts-assume-role"
+    CANONICAL_NAME = "custom-sts-assume-role"
+
+    def __init__(self, fetch):
+        super().__init__()
+        self._fetch = fetch
+
+    def load(self):
+        return DeferredRefreshableCredentials(refresh_using=self._fetch, method=self.METHOD)
+
+
+def _assume_role_session(account: Dict, region: str) -> boto3.session.Session:
+    """Session whose credentials come from sts:AssumeRole and refresh before expiry."""
+    sts = boto3.session.Session(region_name=region).client("sts")
+    params = {
+        "RoleArn": account["role_arn"],
+        "RoleSessionName": account.get("session_name", "aws-sentinel"),
+    }
+    if account.get("external_id"):
+        params["ExternalId"] = account["external_id"]
+
+    def fetch():
+        creds = sts.assume_role(**params)["Credentials"]
+        return {
+            "access_key": creds["AccessKeyId"],
+            "secret_key": creds["SecretAccessKey"],
+            "token": creds["SessionToken"],
+            "expiry_time": creds["Expiration"].isoformat(),
+        }
+
+    # Ahead of the environment and config providers in the session's chain
+    botocore_session = get_session()
+    botocore_session.get_component("credential_provider").insert_before(
+        "env", _AssumeRoleProvider(fetch)
+    )
+    return boto3.session.Session(botocore_session=botocore_session, region_name=region)
+
+
+def session_for_account(account: Dict) -> boto3.session.Session:
+    """Build the boto3 session for one configured account."""
+    region = account.get("region") or os.getenv("AWS_REGION", "us-east-1")
+    if account.get("role_arn"):
+        return _assume_role_session(account, region)
+    if account.get("profile"):
+        return boto3.session.Session(profile_name=account["profile"], region_name=region)
+    return boto3.session.Session(region_name=region)
+
+
+class MultiAccountAuditor:
+    """
+    Audits several AWS accounts concurrently.
+    Each account gets its own AWSSentinel (its own clients, cache and a
+    small S3 call pool), so one slow or throttled account neither starves
+    the others nor exceeds its own request budget.
+    """
+
+    def __init__(self, accounts: List[Dict], default: Optional[AWSSentinel] = None,
+                 concurrency: int = ACCOUNT_CONCURRENCY,
+                 max_workers: int = ACCOUNT_MAX_WORKERS):
+        self.accounts = {account["name"]: account for account in accounts}
+        self.concurrency = max(1, concurrency)
+        self.max_workers = max(1, max_workers)
+        self._sentinels: Dict[str, AWSSentinel] = {}
+        self._building: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+        if not self.accounts and default is not None:
+            # No account list configured: audit the primary account only
+            self.accounts = {"default": {"name": "default"}}
+            self._sentinels["default"] = default
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        """Pool running one account audit per thread, created on first use."""
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.concurrency,
+                        thread_name_prefix="aws-accounts"
+                    )
+        return self._pool
+
+    def sentinel_for(self, name: str) -> AWSSentinel:
+        """Return the account's AWSSentinel, creating it on first use."""
+        with self._lock:
+            sentinel = self._sentinels.get(name)
+            if sentinel is not None:
+                return sentinel
+            lock = self._building.setdefault(name, threading.Lock())
+
+        # Built outside the registry lock (assuming a role is a network
+        # call), but only once per account: the rest wait for the first
+        with lock:
+            with self._lock:
+                sentinel = self._sentinels.get(name)
+            if sentinel is not None:
+                return sentinel
+            sentinel = AWSSentinel(
+                max_workers=self.max_workers,
+                session=session_for_account(self.accounts[name])
+            )
+            with self._lock:
+                self._sentinels[name] = sentinel
+                self._building.pop(name, None)
+            return sentinel
+
+    def audit_account(self, name: str, fresh: bool = False,
+                      checks: Optional[List[str]] = None,
+                      include_audits: bool = False,
+                      cancel_event: Optional[threading.Event] = None) -> Dict:
+        """Audit every bucket in one account and summarise it."""
+        result = {"account": name}
+        try:
+            audits, _ = self.sentinel_for(name).audit_all_buckets_cached(
+                fresh, cancel_event, checks=checks
+            )
+        except Exception as e:
+            result.update({"error": str(e), "status": "ERROR"})
+            return result
+
+        summary = AuditSummary()
+        for audit in audits:
+            summary.add(audit)
+        result.update(summary.as_dict())
+        if include_audits:
+            result["audits"] = audits
+        return result
+
+    def _resolve_names(self, names: Optional[List[str]]) -> List[str]:
+        names = list(names) if names else list(self.accounts)
+        unknown = [name for name in names if name not in self.accounts]
+        if unknown:
+            raise ValueError(f"Unknown account(s): {', '.join(unknown)}")
+        return names
+
+    @staticmethod
+    def _report(results: List[Dict]) -> Dict:
+        totals = {"total_buckets": 0, "critical_issues": 0, "warnings": 0}
+        findings_by_check: Dict[str, Dict[str, int]] = {}
+        for result in results:
+            for field in totals:
+                totals[field] += result.get(field, 0)
+            for check, counts in result.get("findings_by_check", {}).items():
+                merged = findings_by_check.setdefault(check, {"CRITICAL": 0, "WARNING": 0})
+                for status, count in counts.items():
+                    merged[status] += count
+
+        return {
+            "total_accounts": len(results),
+            "failed_accounts": sum(1 for r in results if "error" in r),
+            **totals,
+            "findings_by_check": findings_by_check,
+            "accounts": results,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    def audit_accounts(self, fresh: bool = False, names: Optional[List[str]] = None,
+                       checks: Optional[List[str]] = None, include_audits: bool = False,
+                       cancel_event: Optional[threading.Event] = None) -> Dict:
+        """
+        Audit the named accounts (default: all) and aggregate the results.
+
+        Raises:
+            ValueError: If a requested account is not configured
+        """
+        names = self._resolve_names(names)
+        results = list(self.pool.map(
+            lambda name: self.audit_account(name, fresh, checks, include_audits, cancel_event),
+            names
+        ))
+        return self._report(results)
+
+    async def audit_accounts_async(self, fresh: bool = False, names: Optional[List[str]] = None,
+                                   checks: Optional[List[str]] = None, include_audits: bool = False,
+                                   timeout: float = AWS_AUDIT_ALL_TIMEOUT) -> Dict:
+        """
+        audit_accounts for the event loop: each account runs on the shared
+        pool and is awaited directly. A timeout or cancel stops further S3
+        calls and drops accounts that have not started.
+        """
+        names = self._resolve_names(names)
+        cancel_event = threading.Event()
+        futures = [
+            self.pool.submit(self.audit_account, name, fresh, checks, include_audits, cancel_event)
+            for name in names
+        ]
+        try:
+            results = await asyncio.wait_for(
+                asyncio.gather(*(asyncio.wrap_future(f) for f in futures)), timeout
+            )
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            cancel_event.set()
+            for future in futures:
+                future.cancel()
+            raise
+        return self._report(list(results))
+
+    def shutdown(self):
+        """Stop the account pool and every account's S3 call pool."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+            for sentinel in self._sentinels.values():
+                sentinel.shutdown()
+
+
+if __name__ == "__main__":
+    # Usage: python aws_accounts.py [account ...]
+    try:
+        default = AWSSentinel()
+    except ValueError:
+        default = None
+
+    auditor = MultiAccountAuditor(load_accounts(), default)
+    try:
+        report = auditor.audit_accounts(names=sys.argv[1:] or None)
+    finally:
+        auditor.shutdown()
+
+    print(f"Accounts: {report['total_accounts']} ({report['failed_accounts']} failed)")
+    for account in report["accounts"]:
+        if "error" in account:
+            print(f"  {account['account']}: ERROR {account['error']}")
+        else:
+            print(f"  {account['account']}: {account['total_buckets']} buckets, "
+                  f"{account['critical_issues']} critical, {account['warnings']} warnings")
@@ -2,132 +2,872 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
+import sys
+import asyncio
+import copy
+import functools
+import hashlib
+import json
+import threading
+import time
 import boto3
-from typing import List, Dict
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from cursors import decode_cursor, encode_cursor
+from sentinel_metrics import S3_CALLS, S3_LATENCY, S3_THROTTLED
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
 
+# Max S3 calls in flight per sentinel (also the HTTP connection pool size)
+AUDIT_CONCURRENCY = int(os.getenv("AWS_AUDIT_CONCURRENCY", "16"))
+# Attempts per S3 call, with adaptive client-side rate limiting on throttling
+AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "10"))
+
+# Buckets requested per ListBuckets page (S3 allows 1-10000)
+BUCKET_PAGE_SIZE = int(os.getenv("AWS_BUCKET_PAGE_SIZE", "1000"))
+
+# Seconds a bucket audit is served from cache (0 disables caching)
+AUDIT_CACHE_TTL = float(os.getenv("AWS_AUDIT_CACHE_TTL", "300"))
+# Seconds a failed bucket-region lookup falls back to AWS_REGION before S3 is asked again
+REGION_RETRY_SECONDS = float(os.getenv("AWS_REGION_RETRY_SECONDS", "60"))
+
+# Async facade: threads for blocking sentinel calls and per-call time limits
+AWS_EXECUTOR_WORKERS = int(os.getenv("AWS_EXECUTOR_WORKERS", "4"))
+AWS_CALL_TIMEOUT = float(os.getenv("AWS_CALL_TIMEOUT", "30"))
+AWS_AUDIT_ALL_TIMEOUT = float(os.getenv("AWS_AUDIT_ALL_TIMEOUT", "600"))
+
+def audit_etag(audit: Dict) -> str:
+    """
+    Weak ETag for an audit result. The scan timestamp is left out so a
+    re-scan with an unchanged posture keeps the same tag.
+    """
+    findings = {k: v for k, v in audit.items() if k != "timestamp"}
+    canonical = json.dumps(findings, sort_keys=True, separators=(",", ":"), default=str)
+    return 'W/"' + hashlib.sha256(canonical.encode()).hexdigest()[:32] + '"'
+
+
+def combine_etags(etags: List[str]) -> str:
+    """ETag for a list of audits, derived from the per-bucket ETags."""
+    digest = hashlib.sha256(",".join(etags).encode()).hexdigest()[:32]
+    return 'W/"' + digest + '"'
+
+
+# Error codes S3 (and the adaptive retry mode) treat as throttling
+THROTTLE_CODES = frozenset({
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestThrottled",
+    "RequestThrottledException", "SlowDown", "RequestLimitExceeded",
+    "TooManyRequestsException", "BandwidthLimitExceeded",
+})
+
+
+def _before_call(context, **kwargs):
+    context["sentinel_started"] = time.perf_counter()
+
+
+def _after_call(parsed, model, context, **kwargs):
+    """One logical call finished (after any retries)."""
+    code = parsed.get("Error", {}).get("Code")
+    outcome = "ok" if not code else ("throttled" if code in THROTTLE_CODES else "error")
+    S3_CALLS.inc(operation=model.name, outcome=outcome)
+    started = context.pop("sentinel_started", None)
+    if started is not None:
+        S3_LATENCY.observe(time.perf_counter() - started, operation=model.name)
+
+
+def _after_call_error(model, context, **kwargs):
+    """The call raised before a response was parsed (connection errors etc.)."""
+    S3_CALLS.inc(operation=model.name, outcome="exception")
+    started = context.pop("sentinel_started", None)
+    if started is not None:
+        S3_LATENCY.observe(time.perf_counter() - started, operation=model.name)
+
+
+def _response_received(parsed_response, event_name, **kwargs):
+    """Every HTTP attempt, so throttles that were retried still count."""
+    if parsed_response and parsed_response.get("Error", {}).get("Code") in THROTTLE_CODES:
+        S3_THROTTLED.inc(operation=event_name.rsplit(".", 1)[-1])
+
+
+def instrument_client(client):
+    """Attach call count, latency and throttling metrics to a boto3 S3 client."""
+    events = client.meta.events
+    events.register("before-call.s3", _before_call)
+    events.register("after-call.s3", _after_call)
+    events.register("after-call-error.s3", _after_call_error)
+    events.register("response-received.s3", _response_received)
+    return client
+
+
+# ============================================================================
+# CHECK REGISTRY
+# ============================================================================
+
+# check name -> (S3 client method it needs, evaluate(bucket, response, error))
+CHECK_REGISTRY: Dict[str, Tuple[str, Callable]] = {}
+
+
+def register_check(name: str, operation: str):
+    """
+    Register a posture check. The engine calls each distinct S3 operation
+    once per bucket and hands the response (or the ClientError) to every
+    check that declared it.
+    """
+    def decorator(evaluate: Callable) -> Callable:
+        CHECK_REGISTRY[name] = (operation, evaluate)
+        return evaluate
+    return decorator
+
+
+def _error_code(error: Exception) -> Optional[str]:
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code')
+    return None
+
+
+def _error_result(bucket_name: str, error: Exception) -> Dict:
+    return {
+        "bucket": bucket_name,
+        "error": str(error),
+        "status": "ERROR"
+    }
+
+
+@register_check("public_access", "get_bucket_acl")
+def _check_public_access(bucket_name: str, acl: Dict, error: Optional[Exception]) -> Dict:
+    """Check if bucket allows public access."""
+    if error is not None:
+        return _error_result(bucket_name, error)
+    
+    public_read = False
+    public_write = False
+    
+    for grant in acl['Grants']:
+        grantee = grant.get('Grantee', {})
+        permission = grant.get('Permission')
+        
+        # Check for public access
+        if grantee.get('Type') == 'Group' and 'AllUsers' in grantee.get('URI', ''):
+            if permission == 'READ':
+                public_read = True
+            if permission in ['WRITE', 'FULL_CONTROL']:
+                public_write = True
+    
+    return {
+        "bucket": bucket_name,
+        "public_read": public_read,
+        "public_write": public_write,
+        "status": "CRITICAL" if public_write else ("WARNING" if public_read else "SECURE")
+    }
+
+
+@register_check("encryption", "get_bucket_encryption")
+def _check_encryption(bucket_name: str, encryption: Dict, error: Optional[Exception]) -> Dict:
+    """Check if bucket has encryption enabled."""
+    if _error_code(error) == 'ServerSideEncryptionConfigurationNotFoundError':
+        return {
+            "bucket": bucket_name,
+            "encryption_enabled": False,
+            "status": "WARNING"
+        }
+    if error is not None:
+        return _error_result(bucket_name, error)
+    
+    return {
+        "bucket": bucket_name,
+        "encryption_enabled": True,
+        "rules": encryption.get('ServerSideEncryptionConfiguration', {}).get('Rules', []),
+        "status": "SECURE"
+    }
+
+
+@register_check("versioning", "get_bucket_versioning")
+def _check_versioning(bucket_name: str, versioning: Dict, error: Optional[Exception]) -> Dict:
+    """Check if bucket has versioning enabled."""
+    if error is not None:
+        return _error_result(bucket_name, error)
+    
+    status = versioning.get('Status', 'Disabled')
+    return {
+        "bucket": bucket_name,
+        "versioning_enabled": status == 'Enabled',
+        "status": "SECURE" if status == 'Enabled' else "INFO"
+    }
+
+
+@register_check("mfa_delete", "get_bucket_versioning")
+def _check_mfa_delete(bucket_name: str, versioning: Dict, error: Optional[Exception]) -> Dict:
+    """Check if deleting object versions requires MFA."""
+    if error is not None:
+        return _error_result(bucket_name, error)
+    
+    enabled = versioning.get('MFADelete') == 'Enabled'
+    return {
+        "bucket": bucket_name,
+        "mfa_delete_enabled": enabled,
+        "status": "SECURE" if enabled else "INFO"
+    }
+
+
+@register_check("public_access_block", "get_public_access_block")
+def _check_public_access_block(bucket_name: str, response: Dict, error: Optional[Exception]) -> Dict:
+    """Check that all four S3 Block Public Access settings are on."""
+    if _error_code(error) == 'NoSuchPublicAccessBlockConfiguration':
+        return {
+            "bucket": bucket_name,
+            "configured": False,
+            "status": "WARNING"
+        }
+    if error is not None:
+        return _error_result(bucket_name, error)
+    
+    settings = response.get('PublicAccessBlockConfiguration', {})
+    flags = ('BlockPublicAcls', 'IgnorePublicAcls', 'BlockPublicPolicy', 'RestrictPublicBuckets')
+    disabled = [flag for flag in flags if not settings.get(flag)]
+    return {
+        "bucket": bucket_name,
+        "configured": True,
+        "disabled_settings": disabled,
+        "status": "WARNING" if disabled else "SECURE"
+    }
+
+
+@register_check("policy_status", "get_bucket_policy_status")
+def _check_policy_status(bucket_name: str, response: Dict, error: Optional[Exception]) -> Dict:
+    """Check whether the bucket policy makes the bucket public."""
+    if _error_code(error) == 'NoSuchBucketPolicy':
+        return {
+            "bucket": bucket_name,
+            "has_policy": False,
+            "policy_public": False,
+            "status": "SECURE"
+        }
+    if error is not None:
+        return _error_result(bucket_name, error)
+    
+    public = bool(response.get('PolicyStatus', {}).get('IsPublic'))
+    return {
+        "bucket": bucket_name,
+        "has_policy": True,
+        "policy_public": public,
+        "status": "CRITICAL" if public else "SECURE"
+    }
+
+
+@register_check("logging", "get_bucket_logging")
+def _check_logging(bucket_name: str, response: Dict, error: Optional[Exception]) -> Dict:
+    """Check if server access logging is enabled."""
+    if error is not None:
+        return _error_result(bucket_name, error)
+    
+    target = response.get('LoggingEnabled', {}).get('TargetBucket')
+    return {
+        "bucket": bucket_name,
+        "logging_enabled": bool(target),
+        "target_bucket": target,
+        "status": "SECURE" if target else "INFO"
+    }
+
+
+@register_check("lifecycle", "get_bucket_lifecycle_configuration")
+def _check_lifecycle(bucket_name: str, response: Dict, error: Optional[Exception]) -> Dict:
+    """Check if the bucket has lifecycle rules."""
+    if _error_code(error) == 'NoSuchLifecycleConfiguration':
+        return {
+            "bucket": bucket_name,
+            "lifecycle_rules": 0,
+            "status": "INFO"
+        }
+    if error is not None:
+        return _error_result(bucket_name, error)
+    
+    rules = response.get('Rules', [])
+    return {
+        "bucket": bucket_name,
+        "lifecycle_rules": len(rules),
+        "status": "SECURE" if rules else "INFO"
+    }
+
+
+def resolve_checks(checks: Optional[Iterable[str]] = None) -> Tuple[str, ...]:
+    """
+    Normalise a requested check list (None means DEFAULT_CHECKS). The
+    result is sorted, so any ordering of the same checks shares one cache key.
+    
+    Raises:
+        ValueError: If a name is not registered
+    """
+    if checks is None:
+        return DEFAULT_CHECKS
+    names = tuple(sorted({c.strip() for c in checks if c.strip()}))
+    unknown = [c for c in names if c not in CHECK_REGISTRY]
+    if unknown:
+        raise ValueError(f"Unknown check(s): {', '.join(unknown)}. Available: {', '.join(CHECK_REGISTRY)}")
+    return names or DEFAULT_CHECKS
+
+
+# Checks run when none are requested (AWS_AUDIT_CHECKS, comma-separated).
+# The default is the original ACL/encryption/versioning audit; the other
+# registered checks are opt-in via ?checks= or AWS_AUDIT_CHECKS.
+DEFAULT_CHECKS: Tuple[str, ...] = ("encryption", "public_access", "versioning")
+if os.getenv("AWS_AUDIT_CHECKS"):
+    DEFAULT_CHECKS = resolve_checks(os.getenv("AWS_AUDIT_CHECKS").split(","))
+
+
+class AuditSummary:
+    """
+    Running finding counters over a stream of bucket audits.
+    critical_issues/warnings count buckets by their public_access status;
+    findings_by_check counts CRITICAL/WARNING results of every check.
+    """
+    
+    def __init__(self):
+        self.total_buckets = 0
+        self.critical_issues = 0
+        self.warnings = 0
+        self.findings_by_check: Dict[str, Dict[str, int]] = {}
+    
+    def add(self, audit: Dict):
+        """Count one bucket's audit."""
+        self.total_buckets += 1
+        status = audit.get('public_access', {}).get('status')
+        if status == 'CRITICAL':
+            self.critical_issues += 1
+        elif status == 'WARNING':
+            self.warnings += 1
+        
+        for check, result in audit.items():
+            if isinstance(result, dict) and result.get('status') in ('CRITICAL', 'WARNING'):
+                counts = self.findings_by_check.setdefault(check, {"CRITICAL": 0, "WARNING": 0})
+                counts[result['status']] += 1
+    
+    def as_dict(self) -> Dict:
+        return {
+            "total_buckets": self.total_buckets,
+            "critical_issues": self.critical_issues,
+            "warnings": self.warnings,
+            "findings_by_check": self.findings_by_check
+        }
+
+
 class AWSSentinel:
     """
     AWS Security Auditor for S3 bucket compliance scanning.
     Checks for public access, encryption, versioning, and logging.
     """
     
-    def __init__(self):
+    def __init__(self, max_workers: int = AUDIT_CONCURRENCY, cache_ttl: float = AUDIT_CACHE_TTL,
+                 session: Optional[boto3.session.Session] = None):
+        """
+        Audit the account behind the environment credentials, or behind
+        session when one is given (another profile or an assumed role).
+        """
         self.aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
         self.aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
         self.aws_region = os.getenv("AWS_REGION", "us-east-1")
         
-        if not self.aws_access_key or not self.aws_secret_key:
+        if session is None and (not self.aws_access_key or not self.aws_secret_key):
             raise ValueError("AWS credentials not found in environment")
         
-        self.s3_client = boto3.client(
-            's3',
-            aws_access_key_id=self.aws_access_key,
-            aws_secret_access_key=self.aws_secret_key,
-            region_name=self.aws_region
+        self.max_workers = max(1, max_workers)
+        self.client_config = Config(
+            max_pool_connections=self.max_workers,
+            retries={"mode": "adaptive", "max_attempts": AWS_MAX_ATTEMPTS}
         )
+        
+        # One session for every regional client; creating clients is not thread-safe
+        if session is None:
+            session = boto3.session.Session(
+                aws_access_key_id=self.aws_access_key,
+                aws_secret_access_key=self.aws_secret_key,
+                region_name=self.aws_region
+            )
+        else:
+            self.aws_region = session.region_name or self.aws_region
+        self.session = session
+        self._clients: Dict[str, object] = {}
+        self._clients_lock = threading.Lock()
+        self.s3_client = self.client_for_region(self.aws_region)
+        
+        # bucket -> region, filled from ListBuckets or get_bucket_location
+        self._bucket_regions: Dict[str, str] = {}
+        # bucket -> monotonic time until which a failed lookup is not retried
+        self._region_fallbacks: Dict[str, float] = {}
+        self._region_locks: Dict[str, threading.Lock] = {}
+        self._regions_lock = threading.Lock()
+        
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        
+        # key -> (expires_at, audit, etag); key -> [future, S3 call futures, waiters]
+        # for an in-flight audit
+        self.cache_ttl = cache_ttl
+        self._audit_cache: Dict[Tuple[str, Tuple[str, ...]], Tuple[float, Dict, str]] = {}
+        self._inflight: Dict[Tuple[str, Tuple[str, ...]], list] = {}
+        self._cache_lock = threading.Lock()
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Shared pool bounding concurrent S3 calls, created on first use."""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="aws-sentinel"
+                    )
+        return self._executor
+    
+    def shutdown(self):
+        """Stop the audit thread pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    def client_for_region(self, region: str):
+        """Return the S3 client for a region, creating it on first use."""
+        client = self._clients.get(region)
+        if client is None:
+            with self._clients_lock:
+                client = self._clients.get(region)
+                if client is None:
+                    client = instrument_client(
+                        self.session.client('s3', region_name=region, config=self.client_config)
+                    )
+                    self._clients[region] = client
+        return client
+    
+    def bucket_region(self, bucket_name: str) -> str:
+        """
+        Resolve a bucket's region once and cache it.
+        Falls back to the home region if the lookup fails; the fallback is
+        cached for REGION_RETRY_SECONDS so a failing bucket is not looked
+        up again on every call.
+        """
+        region = self._cached_region(bucket_name)
+        if region is not None:
+            return region
+        
+        with self._regions_lock:
+            lock = self._region_locks.setdefault(bucket_name, threading.Lock())
+        
+        # Only one thread per bucket asks S3; the rest wait for its answer
+        with lock:
+            region = self._cached_region(bucket_name)
+            if region is not None:
+                return region
+            try:
+                location = self.s3_client.get_bucket_location(Bucket=bucket_name)
+            except Exception:
+                location = None
+            
+            with self._regions_lock:
+                if location is None:
+                    region = self.aws_region
+                    self._region_fallbacks[bucket_name] = time.monotonic() + REGION_RETRY_SECONDS
+                else:
+                    constraint = location.get('LocationConstraint')
+                    # Legacy values: empty means us-east-1, "EU" means eu-west-1
+                    region = {None: 'us-east-1', '': 'us-east-1', 'EU': 'eu-west-1'}.get(constraint, constraint)
+                    self._bucket_regions[bucket_name] = region
+                    self._region_fallbacks.pop(bucket_name, None)
+                # Stored before the lock goes, so a newcomer finds the answer
+                self._region_locks.pop(bucket_name, None)
+            return region
+    
+    def _cached_region(self, bucket_name: str) -> Optional[str]:
+        region = self._bucket_regions.get(bucket_name)
+        if region is not None:
+            return region
+        retry_at = self._region_fallbacks.get(bucket_name)
+        if retry_at is not None and retry_at > time.monotonic():
+            return self.aws_region
+        return None
+    
+    def client_for_bucket(self, bucket_name: str):
+        """S3 client for the region the bucket lives in."""
+        return self.client_for_region(self.bucket_region(bucket_name))
+    
+    def list_buckets_page(self, limit: int = BUCKET_PAGE_SIZE, cursor: Optional[str] = None,
+                          prefix: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        """
+        Fetch one page of bucket names.
+        Returns (names, next_cursor); next_cursor is None on the last page.
+        """
+        params = {"MaxBuckets": max(1, min(limit, 10000))}
+        token = decode_cursor(cursor, prefix)
+        if token:
+            params["ContinuationToken"] = token
+        if prefix:
+            params["Prefix"] = prefix
+        
+        response = self.s3_client.list_buckets(**params)
+        names = []
+        for bucket in response.get('Buckets', []):
+            names.append(bucket['Name'])
+            if bucket.get('BucketRegion'):
+                self._bucket_regions[bucket['Name']] = bucket['BucketRegion']
+        return names, encode_cursor(response.get('ContinuationToken'), prefix)
+    
+    def iter_buckets(self, prefix: Optional[str] = None,
+                     page_size: int = BUCKET_PAGE_SIZE) -> Iterator[str]:
+        """Lazily iterate bucket names, fetching one ListBuckets page at a time."""
+        cursor = None
+        while True:
+            names, cursor = self.list_buckets_page(page_size, cursor, prefix)
+            yield from names
+            if not cursor:
+                return
     
-    def list_buckets(self) -> List[str]:
+    def list_buckets(self, prefix: Optional[str] = None) -> List[str]:
         """List all S3 buckets in the account."""
-        response = self.s3_client.list_buckets()
-        return [bucket['Name'] for bucket in response['Buckets']]
+        return list(self.iter_buckets(prefix))
     
-    def check_bucket_public_access(self, bucket_name: str) -> Dict:
-        """Check if bucket allows public access."""
+    def _call(self, bucket_name: str, operation: str):
+        """Issue one S3 call for a bucket. Returns (response, error)."""
         try:
-            acl = self.s3_client.get_bucket_acl(Bucket=bucket_name)
-            
-            public_read = False
-            public_write = False
-            
-            for grant in acl['Grants']:
-                grantee = grant.get('Grantee', {})
-                permission = grant.get('Permission')
-                
-                # Check for public access
-                if grantee.get('Type') == 'Group' and 'AllUsers' in grantee.get('URI', ''):
-                    if permission == 'READ':
-                        public_read = True
-                    if permission in ['WRITE', 'FULL_CONTROL']:
-                        public_write = True
-            
-            return {
-                "bucket": bucket_name,
-                "public_read": public_read,
-                "public_write": public_write,
-                "status": "CRITICAL" if public_write else ("WARNING" if public_read else "SECURE")
-            }
+            client = self.client_for_bucket(bucket_name)
+            return getattr(client, operation)(Bucket=bucket_name), None
         except Exception as e:
-            return {
-                "bucket": bucket_name,
-                "error": str(e),
-                "status": "ERROR"
-            }
+            return None, e
+    
+    def run_check(self, name: str, bucket_name: str) -> Dict:
+        """Run a single registered check synchronously."""
+        operation, evaluate = CHECK_REGISTRY[name]
+        return evaluate(bucket_name, *self._call(bucket_name, operation))
+    
+    def check_bucket_public_access(self, bucket_name: str) -> Dict:
+        """Check if bucket allows public access."""
+        return self.run_check("public_access", bucket_name)
     
     def check_bucket_encryption(self, bucket_name: str) -> Dict:
         """Check if bucket has encryption enabled."""
-        try:
-            encryption = self.s3_client.get_bucket_encryption(Bucket=bucket_name)
-            return {
-                "bucket": bucket_name,
-                "encryption_enabled": True,
-                "rules": encryption.get('Rules', []),
-                "status": "SECURE"
-            }
-        except self.s3_client.exceptions.ServerSideEncryptionConfigurationNotFoundError:
-            return {
-                "bucket": bucket_name,
-                "encryption_enabled": False,
-                "status": "WARNING"
-            }
-        except Exception as e:
-            return {
-                "bucket": bucket_name,
-                "error": str(e),
-                "status": "ERROR"
-            }
+        return self.run_check("encryption", bucket_name)
     
     def check_bucket_versioning(self, bucket_name: str) -> Dict:
         """Check if bucket has versioning enabled."""
+        return self.run_check("versioning", bucket_name)
+    
+    def _submit_audit(self, bucket_name: str, checks: Tuple[str, ...]):
+        """Queue each distinct S3 call the checks need on the shared pool."""
+        operations = dict.fromkeys(CHECK_REGISTRY[name][0] for name in checks)
+        calls = {
+            operation: self.executor.submit(self._call, bucket_name, operation)
+            for operation in operations
+        }
+        return bucket_name, datetime.utcnow().isoformat(), checks, calls
+    
+    @staticmethod
+    def _collect_audit(pending) -> Dict:
+        """Assemble a bucket audit once its S3 calls have finished."""
+        bucket_name, timestamp, checks, calls = pending
+        audit = {"bucket": bucket_name, "timestamp": timestamp}
+        for name in checks:
+            operation, evaluate = CHECK_REGISTRY[name]
+            audit[name] = evaluate(bucket_name, *calls[operation].result())
+        return audit
+    
+    def _audit_future(self, bucket_name: str, fresh: bool = False,
+                      checks: Tuple[str, ...] = None):
+        """
+        Return (future, key) for a bucket audit without blocking.
+        The future resolves to (audit, etag). It is served from the TTL
+        cache unless fresh is set, and concurrent callers share one
+        in-flight audit. A caller that gives up before the future is done
+        passes key to _release_audit; the S3 calls are only cancelled
+        once every caller sharing them has done so.
+        """
+        checks = checks or DEFAULT_CHECKS
+        key = (bucket_name, checks)
+        with self._cache_lock:
+            if not fresh:
+                entry = self._audit_cache.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    future = Future()
+                    future.set_result((entry[1], entry[2]))
+                    return future, None
+            
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                inflight[2] += 1
+                return inflight[0], key
+            
+            # Queue the S3 calls before publishing the entry, so a caller
+            # that joins and gives up can always cancel them
+            future = Future()
+            pending = self._submit_audit(bucket_name, checks)
+            calls = list(pending[3].values())
+            inflight = [future, calls, 1]
+            self._inflight[key] = inflight
+        
+        # Callbacks are attached outside the lock: a call that has already
+        # finished runs call_done here, and call_done takes the lock
+        remaining = [len(calls)]
+        
+        def call_done(_):
+            with self._cache_lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            self._finish_audit(key, pending, inflight)
+        
+        for call in calls:
+            call.add_done_callback(call_done)
+        
+        return future, key
+    
+    def _release_audit(self, key, future: Future):
+        """Drop one caller's interest in an in-flight audit."""
+        if key is None or future.done():
+            return
+        with self._cache_lock:
+            inflight = self._inflight.get(key)
+            if inflight is None or inflight[0] is not future:
+                return
+            inflight[2] -= 1
+            if inflight[2] > 0:
+                return
+            # Nobody is waiting any more: later callers start a fresh audit
+            del self._inflight[key]
+            calls = inflight[1]
+        for call in calls:
+            call.cancel()
+    
+    def _finish_audit(self, key, pending, inflight: list):
+        """Publish a completed audit to waiters and the cache."""
+        future = inflight[0]
         try:
-            versioning = self.s3_client.get_bucket_versioning(Bucket=bucket_name)
-            status = versioning.get('Status', 'Disabled')
+            audit = self._collect_audit(pending)
+            etag = audit_etag(audit)
+        except BaseException as e:
+            with self._cache_lock:
+                if self._inflight.get(key) is inflight:
+                    del self._inflight[key]
+            future.set_exception(e)
+            return
+        
+        with self._cache_lock:
+            # Errors are usually transient, so they are not cached
+            failed = any(
+                isinstance(v, dict) and v.get("status") == "ERROR" for v in audit.values()
+            )
+            if self.cache_ttl > 0 and not failed:
+                self._audit_cache[key] = (time.monotonic() + self.cache_ttl, audit, etag)
+            if self._inflight.get(key) is inflight:
+                del self._inflight[key]
+        future.set_result((audit, etag))
+    
+    @staticmethod
+    def _audit_result(future: Future) -> Tuple[Dict, str]:
+        """
+        Wait for an audit future. Cached and shared audits are the same
+        object for every caller, so each one gets its own copy.
+        """
+        audit, etag = future.result()
+        return copy.deepcopy(audit), etag
+    
+    def audit_bucket_cached(self, bucket_name: str, fresh: bool = False,
+                            checks: Optional[Iterable[str]] = None) -> Tuple[Dict, str]:
+        """Audit one bucket through the cache. Returns (audit, etag)."""
+        future, _ = self._audit_future(bucket_name, fresh, resolve_checks(checks))
+        return self._audit_result(future)
+    
+    def full_security_audit(self, bucket_name: str, fresh: bool = False,
+                            checks: Optional[Iterable[str]] = None) -> Dict:
+        """Perform complete security audit on a bucket (checks run concurrently)."""
+        return self.audit_bucket_cached(bucket_name, fresh, checks)[0]
+    
+    def iter_audits(self, fresh: bool = False,
+                    cancel_event: Optional[threading.Event] = None,
+                    buckets: Optional[List[str]] = None,
+                    checks: Optional[Iterable[str]] = None) -> Iterator[Tuple[Dict, str]]:
+        """
+        Yield (audit, etag) for the given buckets, or every bucket in
+        list_buckets order.
+        At most 2 x max_workers bucket audits are in flight at once, so
+        memory stays flat however many buckets the account has. Closing the
+        generator or setting cancel_event cancels the checks that have not
+        started yet.
+        """
+        checks = resolve_checks(checks)
+        window = 2 * self.max_workers
+        pending = []
+        buckets = iter(buckets) if buckets is not None else self.iter_buckets()
+        
+        try:
+            for bucket in buckets:
+                pending.append(self._audit_future(bucket, fresh, checks))
+                if len(pending) < window:
+                    continue
+                
+                if cancel_event is not None and cancel_event.is_set():
+                    raise CancelledError("Audit cancelled")
+                future, _ = pending.pop(0)
+                yield self._audit_result(future)
             
-            return {
-                "bucket": bucket_name,
-                "versioning_enabled": status == 'Enabled',
-                "status": "SECURE" if status == 'Enabled' else "INFO"
-            }
-        except Exception as e:
-            return {
-                "bucket": bucket_name,
-                "error": str(e),
-                "status": "ERROR"
-            }
-    
-    def full_security_audit(self, bucket_name: str) -> Dict:
-        """Perform complete security audit on a bucket."""
-        return {
-            "bucket": bucket_name,
-            "timestamp": datetime.utcnow().isoformat(),
-            "public_access": self.check_bucket_public_access(bucket_name),
-            "encryption": self.check_bucket_encryption(bucket_name),
-            "versioning": self.check_bucket_versioning(bucket_name)
-        }
+            while pending:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise CancelledError("Audit cancelled")
+                future, _ = pending.pop(0)
+                yield self._audit_result(future)
+        finally:
+            for future, key in pending:
+                self._release_audit(key, future)
     
-    def audit_all_buckets(self) -> List[Dict]:
-        """Audit all S3 buckets in the account."""
-        buckets = self.list_buckets()
+    def audit_all_buckets_cached(self, fresh: bool = False,
+                                 cancel_event: Optional[threading.Event] = None,
+                                 buckets: Optional[List[str]] = None,
+                                 checks: Optional[Iterable[str]] = None) -> Tuple[List[Dict], str]:
+        """Audit the given buckets, or all of them. Returns (audits, etag)."""
         results = []
-        
-        for bucket in buckets:
-            audit = self.full_security_audit(bucket)
+        etags = []
+        for audit, etag in self.iter_audits(fresh, cancel_event, buckets, checks):
             results.append(audit)
+            etags.append(etag)
         
-        return results
+        return results, combine_etags(etags)
+    
+    def audit_all_buckets(self, fresh: bool = False,
+                          cancel_event: Optional[threading.Event] = None) -> List[Dict]:
+        """Audit all S3 buckets in the account."""
+        return self.audit_all_buckets_cached(fresh, cancel_event)[0]
+    
+    def invalidate_cache(self, bucket_name: Optional[str] = None):
+        """Drop cached audits for one bucket, or all of them."""
+        with self._cache_lock:
+            if bucket_name is None:
+                self._audit_cache.clear()
+            else:
+                for key in [k for k in self._audit_cache if k[0] == bucket_name]:
+                    del self._audit_cache[key]
+
+class AsyncAWSSentinel:
+    """
+    Async facade over AWSSentinel for the API.
+    Blocking boto3 work runs in a dedicated, bounded thread pool with a
+    time limit per call; a cancelled or timed-out audit stops issuing
+    further S3 calls.
+    """
+    
+    def __init__(self, sentinel: AWSSentinel, max_workers: int = AWS_EXECUTOR_WORKERS,
+                 timeout: float = AWS_CALL_TIMEOUT):
+        self.sentinel = sentinel
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers),
+            thread_name_prefix="aws-facade"
+        )
+    
+    async def _run(self, fn, *args, timeout: Optional[float] = None,
+                   cancel_event: Optional[threading.Event] = None):
+        """Run fn in the facade pool; raises asyncio.TimeoutError past the limit."""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, fn, *args)
+        try:
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if cancel_event is not None:
+                cancel_event.set()
+            raise
+    
+    async def list_buckets(self, prefix: Optional[str] = None) -> List[str]:
+        return await self._run(self.sentinel.list_buckets, prefix)
+    
+    async def list_buckets_page(self, limit: int = BUCKET_PAGE_SIZE, cursor: Optional[str] = None,
+                                prefix: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        return await self._run(self.sentinel.list_buckets_page, limit, cursor, prefix)
+    
+    async def full_security_audit(self, bucket_name: str, fresh: bool = False,
+                                  checks: Optional[List[str]] = None) -> Dict:
+        return await self._run(self.sentinel.full_security_audit, bucket_name, fresh, checks)
+    
+    async def audit_bucket_cached(self, bucket_name: str, fresh: bool = False,
+                                  checks: Optional[List[str]] = None) -> Tuple[Dict, str]:
+        return await self._run(self.sentinel.audit_bucket_cached, bucket_name, fresh, checks)
+    
+    async def audit_all_buckets(self, fresh: bool = False,
+                                timeout: float = AWS_AUDIT_ALL_TIMEOUT) -> List[Dict]:
+        return (await self.audit_all_buckets_cached(fresh, timeout))[0]
+    
+    async def audit_all_buckets_cached(self, fresh: bool = False,
+                                       timeout: float = AWS_AUDIT_ALL_TIMEOUT,
+                                       buckets: Optional[List[str]] = None,
+                                       checks: Optional[List[str]] = None) -> Tuple[List[Dict], str]:
+        cancel_event = threading.Event()
+        return await self._run(
+            functools.partial(
+                self.sentinel.audit_all_buckets_cached, fresh,
+                cancel_event=cancel_event, buckets=buckets, checks=checks
+            ),
+            timeout=timeout,
+            cancel_event=cancel_event
+        )
+    
+    async def iter_audits(self, fresh: bool = False, timeout: Optional[float] = None,
+                          buckets: Optional[List[str]] = None,
+                          checks: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+        """
+        Async generator over per-bucket audits, pulling each one from the
+        blocking iterator in the facade pool. timeout applies per bucket.
+        """
+        cancel_event = threading.Event()
+        audits = self.sentinel.iter_audits(fresh, cancel_event, buckets, checks)
+        async for audit, _ in self._iterate(audits, cancel_event, timeout):
+            yield audit
+    
+    async def scan_objects(self, bucket_name: str, prefix: Optional[str] = None,
+                           checkpoint: Optional[str] = None, sample: float = 1.0,
+                           timeout: Optional[float] = None) -> AsyncIterator[Dict]:
+        """Async generator over ObjectScanner records for one bucket."""
+        from object_scanner import ObjectScanner
+        
+        cancel_event = threading.Event()
+        records = ObjectScanner(self.sentinel).scan(bucket_name, prefix, checkpoint, sample, cancel_event)
+        async for record in self._iterate(records, cancel_event, timeout):
+            yield record
+    
+    async def _iterate(self, iterator: Iterator, cancel_event: threading.Event,
+                       timeout: Optional[float] = None) -> AsyncIterator:
+        """
+        Pull items from a blocking iterator in the facade pool.
+        timeout applies per item; leaving early cancels the iterator.
+        """
+        done = object()
+        try:
+            while True:
+                item = await self._run(next, iterator, done, timeout=timeout, cancel_event=cancel_event)
+                if item is done:
+                    break
+                yield item
+        finally:
+            cancel_event.set()
+            try:
+                iterator.close()
+            except ValueError:
+                # Still running in a pool thread; it stops at the next cancel check
+                pass
+    
+    def shutdown(self):
+        """Stop the facade pool and the sentinel's S3 call pool."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.sentinel.shutdown()
+
+def run_daemon():
+    """Scheduled scanner: python aws_sentinel.py --daemon [interval_seconds]"""
+    from audit_snapshots import SCAN_INTERVAL_SECONDS, ScanScheduler, SnapshotStore
+    
+    interval = float(sys.argv[2]) if len(sys.argv) > 2 else (SCAN_INTERVAL_SECONDS or 3600)
+    store = SnapshotStore()
+    print(f"AWS Sentinel scan daemon: every {interval:.0f}s into {store.directory}/")
+    ScanScheduler(AWSSentinel(), store, interval).run_forever()
 
 
 if __name__ == "__main__":
+    if "--daemon" in sys.argv[1:2]:
+        run_daemon()
+        sys.exit(0)
+    
     # Test the AWS Sentinel
     try:
         sentinel = AWSSentinel()
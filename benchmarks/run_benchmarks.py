@@ -0,0 +1,313 @@
+"""
+SentinelCloud benchmark suite.
+
+Drives the FastAPI app in-process (httpx ASGI transport) and/or through a
+multi-worker uvicorn, against a local S3 stand-in, and reports throughput
+and latency percentiles per scenario. Results are saved as JSON; pass
+--compare to diff against an earlier run.
+
+    python benchmarks/run_benchmarks.py --mode both --output results.json
+    python benchmarks/run_benchmarks.py --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path[:0] = [str(REPO_ROOT), str(BENCH_DIR)]
+
+from s3_standin import start_standin  # noqa: E402
+
+BENCH_USER = {"username": "bench-user", "password": "BenchPassw0rd!", "role": "user"}
+PAYLOAD_SIZES = (64, 4096, 65536)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarise(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "throughput_rps": round(count / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3) if count else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3) if count else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3) if count else None,
+        "mean_ms": round(sum(latencies) / count * 1000, 3) if count else None,
+    }
+
+
+async def run_scenario(client, request, total, concurrency):
+    """Issue `total` requests with at most `concurrency` in flight."""
+    latencies = []
+    errors = 0
+    queue = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in queue:
+            start = time.perf_counter()
+            try:
+                response = await request(client)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return summarise(latencies, errors, time.perf_counter() - started)
+
+
+async def prepare(client):
+    """Register the benchmark user and return auth headers plus sample ciphertexts."""
+    await client.post("/auth/register", json=BENCH_USER)
+    login = await client.post("/auth/login", json={
+        "username": BENCH_USER["username"], "password": BENCH_USER["password"]
+    })
+    login.raise_for_status()
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    ciphertexts = {}
+    for size in PAYLOAD_SIZES:
+        response = await client.post("/vault/encrypt", json={"secret": "x" * size}, headers=headers)
+        response.raise_for_status()
+        ciphertexts[size] = response.json()["encrypted"]
+    return headers, ciphertexts
+
+
+def scenarios(args, headers, ciphertexts):
+    """Scenario name -> (request coroutine factory, total requests, concurrency)."""
+    credentials = {"username": BENCH_USER["username"], "password": BENCH_USER["password"]}
+    plan = {
+        "login_bcrypt": (
+            lambda c: c.post("/auth/login", json=credentials),
+            args.login_requests, args.concurrency
+        ),
+        "token_verify": (
+            lambda c: c.get("/auth/me", headers=headers),
+            args.requests, args.concurrency
+        ),
+    }
+    for size in PAYLOAD_SIZES:
+        secret = "x" * size
+        token = ciphertexts[size]
+        plan[f"vault_encrypt_{size}b"] = (
+            lambda c, s=secret: c.post("/vault/encrypt", json={"secret": s}, headers=headers),
+            args.requests, args.concurrency
+        )
+        plan[f"vault_decrypt_{size}b"] = (
+            lambda c, t=token: c.post("/vault/decrypt", json={"secret": t}, headers=headers),
+            args.requests, args.concurrency
+        )
+    plan["aws_audit_all_fresh"] = (
+        lambda c: c.get("/aws/audit-all", params={"fresh": "true"}, headers=headers),
+        args.audit_requests, 1
+    )
+    plan["aws_audit_all_cached"] = (
+        lambda c: c.get("/aws/audit-all", headers=headers),
+        args.audit_requests, 1
+    )
+    return plan
+
+
+async def run_suite(client, args):
+    headers, ciphertexts = await prepare(client)
+    results = {}
+    for name, (request, total, concurrency) in scenarios(args, headers, ciphertexts).items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = await run_scenario(client, request, total, concurrency)
+        print(f"  {name:<24} {format_stats(results[name])}")
+    return results
+
+
+def format_stats(stats):
+    return (f"{stats['throughput_rps']:>9} req/s  p50 {stats['p50_ms']:>9} ms  "
+            f"p95 {stats['p95_ms']:>9} ms  p99 {stats['p99_ms']:>9} ms  errors {stats['errors']}")
+
+
+async def bench_inprocess(args):
+    """Import the app in this process and call it over the ASGI transport."""
+    import sentinel_api
+
+    transport = httpx.ASGITransport(app=sentinel_api.app)
+    async with sentinel_api.app.router.lifespan_context(sentinel_api.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                     timeout=args.timeout) as client:
+            return await run_suite(client, args)
+
+
+async def bench_uvicorn(args, env, workdir):
+    """Start uvicorn with several workers and benchmark it over HTTP."""
+    command = [
+        sys.executable, "-m", "uvicorn", "sentinel_api:app",
+        "--host", "127.0.0.1", "--port", str(args.port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    server = subprocess.Popen(command, cwd=workdir, env=env)
+    base_url = f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    if (await client.get("/")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError("uvicorn did not start")
+                await asyncio.sleep(0.2)
+            return await run_suite(client, args)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def bench_environment(args, endpoint, workdir):
+    """Environment for the app under test: isolated state, S3 pointed at the stand-in."""
+    from cryptography.fernet import Fernet
+
+    env = dict(os.environ)
+    env.setdefault("SENTINEL_MASTER_KEY", Fernet.generate_key().decode())
+    env.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+    # login_bcrypt measures bcrypt, not admission control: a rate of 0
+    # disables each token bucket and 0 slots lifts the bcrypt cap
+    for name in ("SENTINEL_AUTH_IP_RATE", "SENTINEL_AUTH_USER_RATE", "SENTINEL_REGISTER_IP_RATE",
+                 "SENTINEL_BCRYPT_CONCURRENCY"):
+        env.setdefault(name, "0")
+    env.update({
+        "AWS_ACCESS_KEY_ID": "bench",
+        "AWS_SECRET_ACCESS_KEY": "bench",
+        "AWS_REGION": "us-east-1",
+        "AWS_ENDPOINT_URL_S3": endpoint,
+        "AWS_SCAN_INTERVAL_SECONDS": "0",
+        "AWS_SNAPSHOT_DIR": str(Path(workdir) / "snapshots"),
+        "SENTINEL_METRICS_DIR": str(Path(workdir) / "metrics"),
+        "SENTINEL_ADMISSION_DIR": str(Path(workdir) / "admission"),
+        "SENTINEL_AUDIT_DIR": str(Path(workdir) / "audit"),
+        "SHADOW_GATE_REFRESH_DB": str(Path(workdir) / "refresh_tokens.db"),
+        "SHADOW_GATE_REVOCATION_DB": str(Path(workdir) / "revocations.db"),
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")])),
+    })
+    return env
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path, threshold):
+    """Print per-scenario changes; return True if any p95 regressed past threshold %."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    regressed = False
+    print(f"\nComparison with {baseline_path} (revision {baseline['meta'].get('revision')})")
+    for mode, scenarios_now in current["results"].items():
+        before = baseline["results"].get(mode, {})
+        for name, stats in scenarios_now.items():
+            old = before.get(name)
+            if not old or not old.get("p95_ms") or not stats.get("p95_ms"):
+                continue
+            p95_change = (stats["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+            rps_change = (stats["throughput_rps"] - old["throughput_rps"]) / old["throughput_rps"] * 100
+            flag = "  REGRESSION" if p95_change > threshold else ""
+            regressed = regressed or bool(flag)
+            print(f"  {mode:<10} {name:<24} p95 {p95_change:+7.1f}%  throughput {rps_change:+7.1f}%{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SentinelCloud benchmark suite")
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn", "both"), default="inprocess")
+    parser.add_argument("--workers", type=int, default=4, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--requests", type=int, default=500, help="requests per fast scenario")
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--audit-requests", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--buckets", type=int, default=300, help="buckets seeded in the S3 stand-in")
+    parser.add_argument("--latency", type=float, default=0.02, help="injected S3 latency in seconds")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--only", nargs="*", help="run only these scenarios")
+    parser.add_argument("--output", default=str(BENCH_DIR / "results" / "latest.json"))
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=15.0, help="p95 regression threshold in %%")
+    args = parser.parse_args()
+    args.output = os.path.abspath(args.output)
+    args.compare = args.compare and os.path.abspath(args.compare)
+
+    server, state, endpoint = start_standin(args.buckets, args.latency)
+    workdir = tempfile.mkdtemp(prefix="sentinel-bench-")
+    env = bench_environment(args, endpoint, workdir)
+
+    # The in-process app reads its configuration (and users.json) at import time
+    os.environ.update(env)
+    os.chdir(workdir)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "results": {},
+    }
+
+    try:
+        if args.mode in ("inprocess", "both"):
+            print("In-process (ASGI transport):")
+            report["results"]["inprocess"] = asyncio.run(bench_inprocess(args))
+        if args.mode in ("uvicorn", "both"):
+            print(f"uvicorn ({args.workers} workers):")
+            report["results"]["uvicorn"] = asyncio.run(bench_uvicorn(args, env, workdir))
+    finally:
+        server.shutdown()
+
+    report["meta"]["s3_calls"] = dict(state.calls)
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {output}")
+
+    if args.compare and compare(report, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
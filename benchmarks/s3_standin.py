@@ -0,0 +1,240 @@
+"""
+Minimal S3 stand-in for benchmarks: a threaded HTTP server answering the
+bucket-level calls AWSSentinel makes, with seeded buckets and injected
+per-request latency.
+
+Point boto3 at it with AWS_ENDPOINT_URL_S3=http://127.0.0.1:<port>.
+"""
+import argparse
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+S3_NS = "http://s3.amazonaws.com/doc/2006-03-01/"
+ALL_USERS = "http://acs.amazonaws.com/groups/global/AllUsers"
+
+
+class FakeS3State:
+    """Seeded buckets and objects with a mix of good and bad posture."""
+
+    def __init__(self, buckets=300, objects_per_bucket=0, seed=42, regions=("us-east-1",)):
+        rng = random.Random(seed)
+        self.buckets = {}
+        for i in range(buckets):
+            name = f"bench-bucket-{i:05d}"
+            self.buckets[name] = {
+                "region": regions[i % len(regions)],
+                "public": rng.choice([None, None, None, "READ", "WRITE"]),
+                "encrypted": rng.random() < 0.7,
+                "versioning": rng.choice(["Enabled", "Suspended", None]),
+                "objects": [
+                    (f"data/obj-{j:07d}.bin", rng.random() < 0.02)
+                    for j in range(objects_per_bucket)
+                ],
+            }
+        self.names = sorted(self.buckets)
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def count(self, op):
+        with self.lock:
+            self.calls[op] = self.calls.get(op, 0) + 1
+
+
+def _xml(body):
+    return ('<?xml version="1.0" encoding="UTF-8"?>' + body).encode()
+
+
+def _acl_xml(root, public):
+    grants = (
+        "<Grant><Grantee xmlns:xsi=\"http://www.w3.org/2001/XMLSchema-instance\" xsi:type=\"CanonicalUser\">"
+        "<ID>owner</ID></Grantee><Permission>FULL_CONTROL</Permission></Grant>"
+    )
+    if public:
+        grants += (
+            "<Grant><Grantee xmlns:xsi=\"http://www.w3.org/2001/XMLSchema-instance\" xsi:type=\"Group\">"
+            f"<URI>{ALL_USERS}</URI></Grantee><Permission>{public}</Permission></Grant>"
+        )
+    return _xml(
+        f'<{root} xmlns="{S3_NS}"><Owner><ID>owner</ID></Owner>'
+        f"<AccessControlList>{grants}</AccessControlList></{root}>"
+    )
+
+
+def _error(code, message, status):
+    return status, _xml(f"<Error><Code>{code}</Code><Message>{message}</Message></Error>")
+
+
+def make_handler(state, latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+
+            url = urlsplit(self.path)
+            query = parse_qs(url.query, keep_blank_values=True)
+            host = self.headers.get("Host", "").split(":")[0]
+            parts = [p for p in url.path.split("/") if p]
+
+            # Support both path-style and virtual-hosted-style addressing
+            bucket = None
+            if host.count(".") and not host.replace(".", "").isdigit() and host != "localhost":
+                bucket = host.split(".")[0]
+            elif parts:
+                bucket = parts.pop(0)
+            key = "/".join(parts)
+
+            status, body = self.route(bucket, key, query)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/xml")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def route(self, bucket, key, query):
+            if bucket is None:
+                state.count("ListBuckets")
+                return self.list_buckets(query)
+
+            info = state.buckets.get(bucket)
+            if info is None:
+                return _error("NoSuchBucket", "The specified bucket does not exist", 404)
+
+            if key:
+                state.count("GetObjectAcl")
+                public = dict(info["objects"]).get(key)
+                if public is None:
+                    return _error("NoSuchKey", "The specified key does not exist", 404)
+                return 200, _acl_xml("AccessControlPolicy", "READ" if public else None)
+
+            for op in ("acl", "encryption", "versioning", "location", "publicAccessBlock",
+                       "policyStatus", "logging", "lifecycle"):
+                if op in query:
+                    state.count(op)
+                    return getattr(self, "op_" + op)(bucket, info)
+
+            if query.get("list-type") == ["2"]:
+                state.count("ListObjectsV2")
+                return self.list_objects(bucket, info, query)
+
+            return _error("NotImplemented", "Not implemented by the stand-in", 501)
+
+        def list_buckets(self, query):
+            names = state.names
+            prefix = query.get("prefix", [""])[0]
+            if prefix:
+                names = [n for n in names if n.startswith(prefix)]
+            start = query.get("continuation-token", [""])[0]
+            if start:
+                names = [n for n in names if n > start]
+            limit = int(query.get("max-buckets", ["10000"])[0])
+            page, more = names[:limit], len(names) > limit
+
+            entries = "".join(
+                f"<Bucket><Name>{n}</Name><CreationDate>2026-01-01T00:00:00.000Z</CreationDate>"
+                f"<BucketRegion>{state.buckets[n]['region']}</BucketRegion></Bucket>"
+                for n in page
+            )
+            token = f"<ContinuationToken>{page[-1]}</ContinuationToken>" if more else ""
+            return 200, _xml(
+                f'<ListAllMyBucketsResult xmlns="{S3_NS}"><Owner><ID>owner</ID></Owner>'
+                f"<Buckets>{entries}</Buckets>{token}</ListAllMyBucketsResult>"
+            )
+
+        def op_acl(self, bucket, info):
+            return 200, _acl_xml("AccessControlPolicy", info["public"])
+
+        def op_encryption(self, bucket, info):
+            if not info["encrypted"]:
+                return _error(
+                    "ServerSideEncryptionConfigurationNotFoundError",
+                    "The server side encryption configuration was not found", 404
+                )
+            return 200, _xml(
+                f'<ServerSideEncryptionConfiguration xmlns="{S3_NS}"><Rule>'
+                "<ApplyServerSideEncryptionByDefault><SSEAlgorithm>AES256</SSEAlgorithm>"
+                "</ApplyServerSideEncryptionByDefault><BucketKeyEnabled>false</BucketKeyEnabled>"
+                "</Rule></ServerSideEncryptionConfiguration>"
+            )
+
+        def op_versioning(self, bucket, info):
+            status = f"<Status>{info['versioning']}</Status>" if info["versioning"] else ""
+            return 200, _xml(f'<VersioningConfiguration xmlns="{S3_NS}">{status}</VersioningConfiguration>')
+
+        def op_location(self, bucket, info):
+            region = "" if info["region"] == "us-east-1" else info["region"]
+            return 200, _xml(f'<LocationConstraint xmlns="{S3_NS}">{region}</LocationConstraint>')
+
+        def op_publicAccessBlock(self, bucket, info):
+            if info["public"]:
+                return _error("NoSuchPublicAccessBlockConfiguration", "No public access block", 404)
+            flags = "".join(
+                f"<{f}>true</{f}>" for f in
+                ("BlockPublicAcls", "IgnorePublicAcls", "BlockPublicPolicy", "RestrictPublicBuckets")
+            )
+            return 200, _xml(f'<PublicAccessBlockConfiguration xmlns="{S3_NS}">{flags}</PublicAccessBlockConfiguration>')
+
+        def op_policyStatus(self, bucket, info):
+            return _error("NoSuchBucketPolicy", "The bucket policy does not exist", 404)
+
+        def op_logging(self, bucket, info):
+            return 200, _xml(f'<BucketLoggingStatus xmlns="{S3_NS}"></BucketLoggingStatus>')
+
+        def op_lifecycle(self, bucket, info):
+            return _error("NoSuchLifecycleConfiguration", "The lifecycle configuration does not exist", 404)
+
+        def list_objects(self, bucket, info, query):
+            objects = info["objects"]
+            after = query.get("continuation-token", query.get("start-after", [""]))[0]
+            if after:
+                objects = [o for o in objects if o[0] > after]
+            limit = int(query.get("max-keys", ["1000"])[0])
+            page, more = objects[:limit], len(objects) > limit
+
+            contents = "".join(
+                f"<Contents><Key>{escape(k)}</Key><Size>1024</Size>"
+                "<LastModified>2026-01-01T00:00:00.000Z</LastModified></Contents>"
+                for k, _ in page
+            )
+            token = f"<NextContinuationToken>{escape(page[-1][0])}</NextContinuationToken>" if more else ""
+            return 200, _xml(
+                f'<ListBucketResult xmlns="{S3_NS}"><Name>{bucket}</Name><KeyCount>{len(page)}</KeyCount>'
+                f"<IsTruncated>{'true' if more else 'false'}</IsTruncated>{contents}{token}</ListBucketResult>"
+            )
+
+    return Handler
+
+
+def start_standin(buckets=300, latency=0.02, port=0, objects_per_bucket=0, regions=("us-east-1",)):
+    """Start the stand-in in a daemon thread. Returns (server, state, endpoint_url)."""
+    state = FakeS3State(buckets=buckets, objects_per_bucket=objects_per_bucket, regions=regions)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state, latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local S3 stand-in for benchmarks")
+    parser.add_argument("--buckets", type=int, default=300)
+    parser.add_argument("--objects", type=int, default=0, help="objects per bucket")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per request")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--regions", default="us-east-1", help="comma-separated bucket regions")
+    args = parser.parse_args()
+
+    server, state, url = start_standin(args.buckets, args.latency, args.port, args.objects,
+                                       tuple(args.regions.split(",")))
+    print(f"S3 stand-in serving {args.buckets} buckets at {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,38 @@
+import base64
+import json
+from typing import Optional
+
+
+# Opaque pagination cursors shared by the bucket listing, the object scan
+# and the audit trail query. A cursor wraps a resume position (an S3
+# continuation token, the last key scanned, the last event returned)
+# together with the prefix or filter scope it was issued for, so it cannot
+# be replayed against a different listing.
+
+
+def encode_cursor(position: Optional[str], prefix: Optional[str]) -> Optional[str]:
+    """Wrap a resume position into an opaque API cursor."""
+    if not position:
+        return None
+    raw = json.dumps({"t": position, "p": prefix or ""}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], prefix: Optional[str]) -> Optional[str]:
+    """
+    Unwrap an API cursor back into its resume position.
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for another prefix
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        position, cursor_prefix = data["t"], data["p"]
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if cursor_prefix != (prefix or ""):
+        raise ValueError("Cursor does not match the requested prefix")
+    return position
@@ -0,0 +1,201 @@
+import os
+import sys
+import hashlib
+import json
+import threading
+from collections import deque
+from concurrent.futures import CancelledError
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from aws_sentinel import AWSSentinel
+from cursors import decode_cursor, encode_cursor
+
+# Object ACL lookups kept in flight per scan, and keys per ListObjectsV2 page
+OBJECT_SCAN_CONCURRENCY = int(os.getenv("AWS_OBJECT_SCAN_CONCURRENCY", "16"))
+OBJECT_PAGE_SIZE = int(os.getenv("AWS_OBJECT_PAGE_SIZE", "1000"))
+
+PUBLIC_GROUPS = ("AllUsers", "AuthenticatedUsers")
+
+
+def sampled(key: str, rate: float) -> bool:
+    """
+    Deterministic sample of object keys: the same key is always in or out
+    for a given rate, so a resumed scan covers the same objects.
+    """
+    if rate >= 1:
+        return True
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") < rate * 2 ** 64
+
+
+def evaluate_object_acl(bucket_name: str, key: str, acl: Dict) -> Optional[Dict]:
+    """Return a finding if the object ACL grants access to a public group."""
+    public_read = False
+    public_write = False
+    groups = set()
+
+    for grant in acl.get('Grants', []):
+        grantee = grant.get('Grantee', {})
+        permission = grant.get('Permission')
+        if grantee.get('Type') != 'Group':
+            continue
+        group = grantee.get('URI', '').rsplit('/', 1)[-1]
+        if group not in PUBLIC_GROUPS:
+            continue
+        groups.add(group)
+        if permission in ['READ', 'FULL_CONTROL']:
+            public_read = True
+        if permission in ['WRITE_ACP', 'FULL_CONTROL']:
+            public_write = True
+
+    if not groups:
+        return None
+    return {
+        "bucket": bucket_name,
+        "key": key,
+        "grantees": sorted(groups),
+        "public_read": public_read,
+        "public_write": public_write,
+        "status": "CRITICAL" if public_write or "AllUsers" in groups else "WARNING"
+    }
+
+
+class ObjectScanner:
+    """
+    Object-level exposure scan for one bucket.
+    Walks ListObjectsV2 one page at a time and checks object ACLs on the
+    sentinel's S3 pool with a fixed number in flight, so memory stays flat
+    however many objects the bucket holds. Results come back as a stream of
+    finding/error/checkpoint records; a checkpoint cursor resumes the scan
+    after the last fully checked page.
+    """
+
+    def __init__(self, sentinel: AWSSentinel, concurrency: int = OBJECT_SCAN_CONCURRENCY,
+                 page_size: int = OBJECT_PAGE_SIZE):
+        self.sentinel = sentinel
+        self.concurrency = max(1, concurrency)
+        self.page_size = max(1, min(page_size, 1000))
+
+    def iter_pages(self, bucket_name: str, prefix: Optional[str] = None,
+                   start_after: Optional[str] = None) -> Iterator[List[str]]:
+        """Yield object keys one ListObjectsV2 page at a time."""
+        client = self.sentinel.client_for_bucket(bucket_name)
+        params = {"Bucket": bucket_name, "MaxKeys": self.page_size}
+        if prefix:
+            params["Prefix"] = prefix
+        if start_after:
+            params["StartAfter"] = start_after
+
+        while True:
+            response = client.list_objects_v2(**params)
+            keys = [obj['Key'] for obj in response.get('Contents', [])]
+            if keys:
+                yield keys
+            if not response.get('IsTruncated') or not response.get('NextContinuationToken'):
+                return
+            params["ContinuationToken"] = response['NextContinuationToken']
+
+    def _check_object(self, bucket_name: str, key: str) -> Optional[Dict]:
+        client = self.sentinel.client_for_bucket(bucket_name)
+        acl = client.get_object_acl(Bucket=bucket_name, Key=key)
+        return evaluate_object_acl(bucket_name, key, acl)
+
+    def scan(self, bucket_name: str, prefix: Optional[str] = None,
+             checkpoint: Optional[str] = None, sample: float = 1.0,
+             cancel_event: Optional[threading.Event] = None) -> Iterator[Dict]:
+        """
+        Yield scan records for a bucket:
+            {"type": "finding", ...}     a public object
+            {"type": "error", ...}       an object whose ACL could not be read
+            {"type": "checkpoint", ...}  cursor to resume after this page
+            {"type": "summary", ...}     totals, once the listing is exhausted
+
+        Raises:
+            ValueError: If the checkpoint is malformed or for another prefix
+        """
+        start_after = decode_cursor(checkpoint, prefix)
+        executor = self.sentinel.executor
+        pending = deque()
+        listed = 0
+        checked = 0
+        findings = 0
+
+        def drain(limit: int):
+            nonlocal checked, findings
+            while len(pending) > limit:
+                key, future = pending.popleft()
+                if cancel_event is not None and cancel_event.is_set():
+                    raise CancelledError("Object scan cancelled")
+                if future is None:
+                    # Page boundary: everything up to key has been checked
+                    yield {"type": "checkpoint", "cursor": encode_cursor(key, prefix),
+                           "checked": checked}
+                    continue
+                checked += 1
+                try:
+                    finding = future.result()
+                except CancelledError:
+                    raise
+                except Exception as e:
+                    yield {"type": "error", "bucket": bucket_name, "key": key, "error": str(e)}
+                    continue
+                if finding is not None:
+                    findings += 1
+                    yield {"type": "finding", **finding}
+
+        try:
+            for keys in self.iter_pages(bucket_name, prefix, start_after):
+                for key in keys:
+                    listed += 1
+                    if not sampled(key, sample):
+                        continue
+                    pending.append((key, executor.submit(self._check_object, bucket_name, key)))
+                    yield from drain(self.concurrency)
+                pending.append((keys[-1], None))
+            yield from drain(0)
+        finally:
+            for _, future in pending:
+                if future is not None:
+                    future.cancel()
+
+        yield {
+            "type": "summary",
+            "bucket": bucket_name,
+            "listed": listed,
+            "checked": checked,
+            "public_objects": findings,
+            "sample": sample,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+
+if __name__ == "__main__":
+    # Usage: python object_scanner.py <bucket> [prefix] [checkpoint_file]
+    # The checkpoint file is updated after every page and read back on restart.
+    if len(sys.argv) < 2:
+        print("Usage: python object_scanner.py <bucket> [prefix] [checkpoint_file]")
+        sys.exit(1)
+
+    bucket = sys.argv[1]
+    scan_prefix = sys.argv[2] if len(sys.argv) > 2 else None
+    checkpoint_file = sys.argv[3] if len(sys.argv) > 3 else None
+
+    resume = None
+    if checkpoint_file and os.path.exists(checkpoint_file):
+        with open(checkpoint_file) as f:
+            resume = f.read().strip() or None
+        print(f"Resuming {bucket} from checkpoint")
+
+    scanner = ObjectScanner(AWSSentinel())
+    try:
+        for record in scanner.scan(bucket, scan_prefix, resume):
+            if record["type"] == "checkpoint":
+                if checkpoint_file:
+                    with open(checkpoint_file + ".tmp", "w") as f:
+                        f.write(record["cursor"])
+                    os.replace(checkpoint_file + ".tmp", checkpoint_file)
+                continue
+            print(json.dumps(record))
+    finally:
+        scanner.sentinel.shutdown()
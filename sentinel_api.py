@@ -2,23 +2,97 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import platform
+import asyncio
 import datetime
 import json
 import os
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, HTTPException, Depends, Header
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
-from Security_Vault import SecurityVault
-from shadow_gate import ShadowGate
-from aws_sentinel import AWSSentinel
+from Security_Vault import ROTATE_CHUNK_SIZE, ROTATE_WORKERS, RotationStats, SecurityVault
+from shadow_gate import ACCESS_TOKEN_EXPIRE_MINUTES, ShadowGate, shutdown_hash_pool
+from aws_sentinel import AWSSentinel, AsyncAWSSentinel, AuditSummary, BUCKET_PAGE_SIZE, resolve_checks
+from cursors import decode_cursor
+from user_store import create_user_store
+from aws_accounts import MultiAccountAuditor, load_accounts
+from sentinel_metrics import ADMISSION_ERRORS, AUTH_REJECTED, MetricsMiddleware, render
+from admission import (
+    AUTH_IP_BURST, AUTH_IP_RATE, AUTH_USER_BURST, AUTH_USER_RATE,
+    REGISTER_IP_BURST, REGISTER_IP_RATE, ConcurrencySlots, TokenBucketLimiter,
+    retry_after_header
+)
+from audit_trail import AUDIT_ENABLED, AUDIT_TRAIL_DIR, AuditTrail, AuditTrailMiddleware, annotate
+from audit_index import AUDIT_QUERY_LIMIT, AuditIndex
+from audit_snapshots import SCAN_INTERVAL_SECONDS, ScanScheduler, SnapshotStore, diff_snapshots
 
-app = FastAPI(title="SentinelCloud API", version="2.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop shared worker pools and background scans with the application."""
+    if audit_trail:
+        audit_trail.start()
+    scan_task = None
+    if aws_sentinel and SCAN_INTERVAL_SECONDS > 0:
+        scheduler = ScanScheduler(aws_sentinel.sentinel, snapshot_store, SCAN_INTERVAL_SECONDS)
+        scan_task = asyncio.create_task(scheduler.run())
+    
+    yield
+    
+    if scan_task:
+        scan_task.cancel()
+    shutdown_hash_pool()
+    if aws_sentinel:
+        aws_sentinel.shutdown()
+    if account_auditor:
+        account_auditor.shutdown()
+    if vault:
+        vault.shutdown()
+    if audit_trail:
+        await audit_trail.stop()
+
+
+app = FastAPI(title="SentinelCloud API", version="2.0.0", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+
+# Compliance trail of every request, written off the request path
+audit_trail = AuditTrail() if AUDIT_ENABLED else None
+if audit_trail:
+    app.add_middleware(AuditTrailMiddleware, trail=audit_trail)
+audit_index = AuditIndex(AUDIT_TRAIL_DIR)
 security = HTTPBearer()
 
+# Vault batch limits
+VAULT_MAX_BATCH_SIZE = int(os.getenv("VAULT_MAX_BATCH_SIZE", "100000"))
+VAULT_BATCH_THREAD_THRESHOLD = int(os.getenv("VAULT_BATCH_THREAD_THRESHOLD", "256"))
+VAULT_MAX_RAW_SIZE = int(os.getenv("VAULT_MAX_RAW_SIZE", str(10 * 1024 * 1024)))
+# Largest Fernet token for a VAULT_MAX_RAW_SIZE secret: base64 of the secret
+# plus 73 bytes of header, padding and HMAC, with slack for a trailing newline
+VAULT_MAX_RAW_TOKEN_SIZE = (VAULT_MAX_RAW_SIZE + 73) * 4 // 3 + 100
+# Rotation batches at least this large go to the rotation process pool
+VAULT_ROTATE_PARALLEL_THRESHOLD = int(os.getenv("VAULT_ROTATE_PARALLEL_THRESHOLD", "5000"))
+# Longest JSONL line /vault/rotate-stream buffers: the largest raw token plus room for a record
+VAULT_ROTATE_MAX_LINE = VAULT_MAX_RAW_TOKEN_SIZE + 4096
+
+# Usernames with admin rights (revocation, audit trail, key rotation).
+# Decided server-side: the role claim in a token is never trusted for this.
+ADMIN_USERS = {u.strip() for u in os.getenv("SENTINEL_ADMIN_USERS", "").split(",") if u.strip()}
+
+# How often long AWS calls check whether the client is still connected
+AWS_DISCONNECT_POLL_SECONDS = float(os.getenv("AWS_DISCONNECT_POLL_SECONDS", "1"))
+
 # User storage file
 USERS_FILE = Path("users.json")
 
+# Initialize user storage (backend chosen by SENTINEL_USER_STORE)
+user_store = create_user_store(USERS_FILE)
+
 # Initialize modules
 try:
     vault = SecurityVault()
@@ -28,13 +102,33 @@ except ValueError as e:
     vault = None
     gate = None
 
-# Initialize AWS Sentinel
+# Initialize AWS Sentinel (async facade keeps boto3 off the event loop)
 try:
-    aws_sentinel = AWSSentinel()
+    aws_sentinel = AsyncAWSSentinel(AWSSentinel())
 except ValueError as e:
     print(f"AWS SENTINEL ERROR: {e}")
     aws_sentinel = None
 
+# Multi-account audits (AWS_ACCOUNTS_FILE; falls back to the primary account)
+try:
+    account_auditor = MultiAccountAuditor(
+        load_accounts(), aws_sentinel.sentinel if aws_sentinel else None
+    )
+except ValueError as e:
+    print(f"AWS ACCOUNTS ERROR: {e}")
+    account_auditor = None
+
+# Admission control for the bcrypt-heavy auth routes (shared across workers)
+try:
+    auth_limiter = TokenBucketLimiter()
+except Exception as e:
+    print(f"ADMISSION CONTROL ERROR: {e}")
+    auth_limiter = None
+bcrypt_slots = ConcurrencySlots()
+
+# Persisted audit snapshots (written by the scheduler or the scan daemon)
+snapshot_store = SnapshotStore()
+
 
 # ============================================================================
 # PYDANTIC MODELS
@@ -51,10 +145,46 @@ class DecryptResponse(BaseModel):
     decrypted: str
     timestamp: str
 
+class BatchSecretRequest(BaseModel):
+    secrets: List[str]
+
+class BatchEncryptItem(BaseModel):
+    index: int
+    encrypted: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchDecryptItem(BaseModel):
+    index: int
+    decrypted: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchRotateItem(BaseModel):
+    index: int
+    rotated: Optional[str] = None
+    changed: Optional[bool] = None
+    error: Optional[str] = None
+
+class BatchEncryptResponse(BaseModel):
+    results: List[BatchEncryptItem]
+    succeeded: int
+    failed: int
+    timestamp: str
+
+class BatchDecryptResponse(BaseModel):
+    results: List[BatchDecryptItem]
+    succeeded: int
+    failed: int
+    timestamp: str
+
+class BatchRotateResponse(BaseModel):
+    results: List[BatchRotateItem]
+    succeeded: int
+    failed: int
+    timestamp: str
+
 class UserRegister(BaseModel):
     username: str
     password: str
-    role: str = "user"
 
 class UserLogin(BaseModel):
     username: str
@@ -64,53 +194,72 @@ class TokenResponse(BaseModel):
     access_token: str
     token_type: str
     expires_in: int
+    refresh_token: Optional[str] = None
     user: dict
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+class RevokeRequest(BaseModel):
+    token: Optional[str] = None
+    jti: Optional[str] = None
+    expires_at: Optional[float] = None
+    username: Optional[str] = None
+
 
 # ============================================================================
-# USER STORAGE FUNCTIONS
+# STREAMING HELPERS
 # ============================================================================
 
-def load_users():
-    """Load users from JSON file."""
-    if not USERS_FILE.exists():
-        return {}
-    with open(USERS_FILE, 'r') as f:
-        return json.load(f)
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body iterator also consumes the request body.
+    The stock class listens for disconnects by calling receive() in
+    parallel, which would steal request chunks from the iterator; here a
+    disconnect surfaces through the request stream or a failed send.
+    """
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        
+        if self.background is not None:
+            await self.background()
+
 
-def save_users(users: dict):
-    """Save users to JSON file."""
-    with open(USERS_FILE, 'w') as f:
-        json.dump(users, f, indent=2)
+# ============================================================================
+# USER STORAGE FUNCTIONS
+# ============================================================================
 
 def get_user(username: str):
     """Get user by username."""
-    users = load_users()
-    return users.get(username)
+    return user_store.get(username)
 
-def create_user(username: str, password: str, role: str = "user"):
+async def create_user(username: str, password: str, role: str = "user"):
     """Create new user with hashed password."""
-    users = load_users()
-    
-    if username in users:
+    if user_store.get(username):
         raise ValueError("User already exists")
     
-    users[username] = {
+    # Hash off the event loop; the store re-checks the name under its lock
+    hashed_password = await gate.hash_password_async(password)
+    
+    return user_store.add({
         "username": username,
-        "hashed_password": gate.hash_password(password),
+        "hashed_password": hashed_password,
         "role": role,
         "created_at": datetime.datetime.utcnow().isoformat()
-    }
-    
-    save_users(users)
-    return users[username]
+    })
 
 
 # ============================================================================
 # AUTHENTICATION DEPENDENCY
 # ============================================================================
 
-async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def verify_token(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Verify JWT token and return user payload."""
     if not gate:
         raise HTTPException(status_code=503, detail="Authentication system not initialized")
@@ -118,10 +267,26 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
     try:
         token = credentials.credentials
         payload = gate.verify_token(token)
+        # Picked up by the audit trail
+        request.state.user = payload.get("sub")
         return payload
     except ValueError as e:
         raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
 
+def is_admin(username: Optional[str]) -> bool:
+    """True if username is in SENTINEL_ADMIN_USERS and still exists in the user store."""
+    return bool(username) and username in ADMIN_USERS and get_user(username) is not None
+
+async def require_admin(user: dict = Depends(verify_token)):
+    """
+    Verified token payload of an admin. Admin rights come from
+    SENTINEL_ADMIN_USERS checked against the user store, never from the
+    token's self-asserted role claim.
+    """
+    if not is_admin(user.get("sub")):
+        raise HTTPException(status_code=403, detail="Admin rights required")
+    return user
+
 
 # ============================================================================
 # INFRASTRUCTURE AUDIT ROUTES
@@ -151,6 +316,13 @@ async def root():
         "auth_status": "OPERATIONAL" if gate else "ERROR"
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics merged across all worker processes."""
+    body = await run_in_threadpool(render)
+    return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/audit/health")
 async def get_health():
     """Endpoint to check infrastructure reliability."""
@@ -160,74 +332,237 @@ async def get_health():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/audit/events")
+async def query_audit_events(
+    user: Optional[str] = None,
+    route: Optional[str] = None,
+    status: Optional[int] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = Query(AUDIT_QUERY_LIMIT, ge=1),
+    cursor: Optional[str] = None,
+    admin: dict = Depends(require_admin)
+):
+    """
+    Admin-only search of the audit trail, oldest first. Filters combine:
+    user (JWT sub or auth username), route template (e.g. /vault/decrypt),
+    status, and an ISO time range [since, until). Pass next_cursor back as
+    cursor for the next page.
+    """
+    try:
+        return await run_in_threadpool(
+            audit_index.query, user, route, status, since, until, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
 # ============================================================================
 # AUTHENTICATION ROUTES
 # ============================================================================
 
+async def issue_tokens(user: dict, refresh_token: Optional[str] = None) -> dict:
+    """Build the token response for a user, starting a refresh family if needed."""
+    token_data = {
+        "sub": user["username"],
+        "role": user["role"]
+    }
+    access_token = gate.create_access_token(token_data)
+    if refresh_token is None:
+        # SQLite write: keep it off the event loop
+        refresh_token = await run_in_threadpool(gate.create_refresh_token, user["username"])
+    
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "refresh_token": refresh_token,
+        "user": {
+            "username": user["username"],
+            "role": user["role"],
+            "created_at": user["created_at"]
+        }
+    }
+
+async def admit(request: Request, scope: str, username: Optional[str] = None):
+    """
+    Take a token from the per-IP (and, for login, per-username) buckets,
+    all or nothing: a login rejected by its username bucket does not spend
+    the IP's token. Raises 429 with Retry-After when a bucket is empty.
+    
+    Failure policy: fail open. If the limiter store is unavailable the
+    request is admitted (bcrypt is still capped by bcrypt_slot), logged and
+    counted in sentinel_admission_errors_total. The SQLite transaction runs
+    in the threadpool so a busy store never stalls the event loop.
+    """
+    if not auth_limiter:
+        ADMISSION_ERRORS.inc()
+        return
+    
+    ip = request.client.host if request.client else "unknown"
+    if scope == "register":
+        buckets = [("ip", f"register:ip:{ip}", REGISTER_IP_RATE, REGISTER_IP_BURST)]
+    else:
+        buckets = [
+            ("ip", f"login:ip:{ip}", AUTH_IP_RATE, AUTH_IP_BURST),
+            ("username", f"login:user:{username.lower()}", AUTH_USER_RATE, AUTH_USER_BURST),
+        ]
+    
+    try:
+        rejected, retry_after = await run_in_threadpool(
+            auth_limiter.acquire_all, [bucket[1:] for bucket in buckets]
+        )
+    except Exception as e:
+        ADMISSION_ERRORS.inc()
+        print(f"ADMISSION CONTROL ERROR: {e}")
+        return
+    if rejected is not None:
+        AUTH_REJECTED.inc(reason=buckets[rejected][0])
+        raise HTTPException(
+            status_code=429,
+            detail="Too many attempts. Try again later.",
+            headers={"Retry-After": retry_after_header(retry_after)}
+        )
+
+@asynccontextmanager
+async def bcrypt_slot():
+    """Hold one of the host-wide bcrypt slots, or shed the request with 429."""
+    slot = bcrypt_slots.try_acquire()
+    if slot is None:
+        AUTH_REJECTED.inc(reason="bcrypt_busy")
+        raise HTTPException(
+            status_code=429,
+            detail="Authentication is busy. Try again shortly.",
+            headers={"Retry-After": "1"}
+        )
+    try:
+        yield
+    finally:
+        bcrypt_slots.release(slot)
+
 @app.post("/auth/register", response_model=TokenResponse)
-async def register_user(user_data: UserRegister):
+async def register_user(user_data: UserRegister, request: Request):
     """Register a new user and return access token."""
     if not gate:
         raise HTTPException(status_code=503, detail="Authentication system not initialized")
     
+    annotate(request, subject=user_data.username)
+    await admit(request, "register")
     try:
-        # Create user
-        user = create_user(user_data.username, user_data.password, user_data.role)
+        # Every self-registered account is a plain user
+        async with bcrypt_slot():
+            user = await create_user(user_data.username, user_data.password)
         
-        # Generate token
-        token_data = {
-            "sub": user["username"],
-            "role": user["role"]
-        }
-        access_token = gate.create_access_token(token_data)
-        
-        return {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "expires_in": 1800,  # 30 minutes in seconds
-            "user": {
-                "username": user["username"],
-                "role": user["role"],
-                "created_at": user["created_at"]
-            }
-        }
+        return await issue_tokens(user)
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
 
 @app.post("/auth/login", response_model=TokenResponse)
-async def login_user(credentials: UserLogin):
+async def login_user(credentials: UserLogin, request: Request):
     """Authenticate user and return access token."""
     if not gate:
         raise HTTPException(status_code=503, detail="Authentication system not initialized")
     
+    annotate(request, subject=credentials.username)
+    await admit(request, "login", credentials.username)
+    
     # Get user
     user = get_user(credentials.username)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid username or password")
     
     # Verify password
-    if not gate.verify_password(credentials.password, user["hashed_password"]):
+    async with bcrypt_slot():
+        verified = await gate.verify_password_async(credentials.password, user["hashed_password"])
+    if not verified:
         raise HTTPException(status_code=401, detail="Invalid username or password")
     
-    # Generate token
-    token_data = {
-        "sub": user["username"],
-        "role": user["role"]
+    return await issue_tokens(user)
+
+@app.post("/auth/refresh", response_model=TokenResponse)
+async def refresh_tokens(body: RefreshRequest, request: Request):
+    """
+    Exchange a refresh token for a new access token and a new refresh
+    token. No password or bcrypt involved; each refresh token works once.
+    """
+    if not gate:
+        raise HTTPException(status_code=503, detail="Authentication system not initialized")
+    
+    try:
+        username, refresh_token = await run_in_threadpool(gate.rotate_refresh_token, body.refresh_token)
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    annotate(request, subject=username)
+    
+    # Pick up role changes and deleted accounts
+    user = get_user(username)
+    if not user:
+        raise HTTPException(status_code=401, detail="User no longer exists")
+    
+    return await issue_tokens(user, refresh_token)
+
+@app.post("/auth/logout")
+async def logout(request: Request, body: Optional[LogoutRequest] = None,
+                 user: dict = Depends(verify_token)):
+    """
+    Revoke the access token used for this request (until it expires) and,
+    if given, the refresh token family it was issued with.
+    """
+    try:
+        await run_in_threadpool(gate.revoke_token, user)
+        refresh_revoked = False
+        if body and body.refresh_token:
+            refresh_revoked = await run_in_threadpool(gate.refresh_store.revoke, body.refresh_token)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    annotate(request, jti=user.get("jti"), refresh_token_revoked=refresh_revoked)
+    
+    return {
+        "status": "LOGGED_OUT",
+        "access_token_revoked": True,
+        "refresh_token_revoked": refresh_revoked,
+        "timestamp": datetime.datetime.utcnow().isoformat()
     }
-    access_token = gate.create_access_token(token_data)
+
+@app.post("/auth/revoke")
+async def revoke_tokens(body: RevokeRequest, request: Request, admin: dict = Depends(require_admin)):
+    """
+    Admin-only revocation. Give one of:
+        token     - an access token (revoked by its jti until its exp)
+        jti       - a token id, with expires_at (defaults to the max token lifetime)
+        username  - every access and refresh token the user holds now
+    """
+    if sum(1 for field in (body.token, body.jti, body.username) if field) != 1:
+        raise HTTPException(status_code=400, detail="Give exactly one of token, jti or username")
+    
+    if body.username:
+        await run_in_threadpool(gate.revoke_user, body.username)
+        revoked = {"username": body.username}
+    else:
+        if body.token:
+            try:
+                payload = gate.verify_token(body.token)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        else:
+            default_exp = time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+            payload = {"jti": body.jti, "exp": body.expires_at or default_exp}
+        try:
+            await run_in_threadpool(gate.revoke_token, payload)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        revoked = {"jti": payload["jti"]}
+    annotate(request, revoked=revoked)
     
     return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "expires_in": 1800,
-        "user": {
-            "username": user["username"],
-            "role": user["role"],
-            "created_at": user["created_at"]
-        }
+        "status": "REVOKED",
+        **revoked,
+        "revoked_by": admin.get("sub"),
+        "timestamp": datetime.datetime.utcnow().isoformat()
     }
 
 @app.get("/auth/me")
@@ -253,6 +588,7 @@ async def vault_status():
     return {
         "status": "OPERATIONAL",
         "encryption": "AES-256 (Fernet)",
+        "decrypt_keys": 1 + len(vault.previous_keys),
         "timestamp": datetime.datetime.utcnow().isoformat()
     }
 
@@ -292,59 +628,583 @@ async def decrypt_secret(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Decryption failed: {str(e)}")
 
+async def run_vault_batch(method, items: List[str], http_request: Request) -> dict:
+    """Run a vault batch method, moving large batches to a worker thread."""
+    if len(items) > VAULT_MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(items)} items (max {VAULT_MAX_BATCH_SIZE})"
+        )
+    
+    if len(items) >= VAULT_BATCH_THREAD_THRESHOLD:
+        results = await run_in_threadpool(method, items)
+    else:
+        results = method(items)
+    
+    failed = sum(1 for r in results if "error" in r)
+    annotate(http_request, items=len(results), failed=failed)
+    return {
+        "results": results,
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "timestamp": datetime.datetime.utcnow().isoformat()
+    }
+
+@app.post("/vault/encrypt-batch", response_model=BatchEncryptResponse, response_model_exclude_none=True)
+async def encrypt_secret_batch(
+    request: BatchSecretRequest,
+    http_request: Request,
+    user: dict = Depends(verify_token)  #PROTECTED
+):
+    """Encrypt a list of secrets. Failures are reported per item."""
+    if not vault:
+        raise HTTPException(status_code=503, detail="Vault not initialized")
+    
+    return await run_vault_batch(vault.encrypt_many, request.secrets, http_request)
+
+@app.post("/vault/decrypt-batch", response_model=BatchDecryptResponse, response_model_exclude_none=True)
+async def decrypt_secret_batch(
+    request: BatchSecretRequest,
+    http_request: Request,
+    user: dict = Depends(verify_token)  #PROTECTED
+):
+    """Decrypt a list of tokens. Failures are reported per item."""
+    if not vault:
+        raise HTTPException(status_code=503, detail="Vault not initialized")
+    
+    return await run_vault_batch(vault.decrypt_many, request.secrets, http_request)
+
+@app.post("/vault/rotate", response_model=BatchRotateResponse, response_model_exclude_none=True)
+async def rotate_secret_batch(
+    request: BatchSecretRequest,
+    http_request: Request,
+    admin: dict = Depends(require_admin)
+):
+    """
+    Admin-only: re-encrypt tokens under the current master key. Tokens
+    under a previous key (SENTINEL_PREVIOUS_MASTER_KEYS) are rotated;
+    tokens already current come back unchanged. Large batches are split
+    across the rotation process pool.
+    """
+    if not vault:
+        raise HTTPException(status_code=503, detail="Vault not initialized")
+    
+    if len(request.secrets) >= VAULT_ROTATE_PARALLEL_THRESHOLD:
+        method = vault.rotate_many_parallel
+    else:
+        method = vault.rotate_many
+    return await run_vault_batch(method, request.secrets, http_request)
+
+@app.post("/vault/rotate-stream")
+async def rotate_secret_stream(
+    request: Request,
+    admin: dict = Depends(require_admin)
+):
+    """
+    Admin-only: re-encrypt a JSONL body of any size (JSON strings, objects
+    with an "encrypted" field, or bare tokens, one per line). Lines come
+    back in order as each chunk is rotated; lines that fail are returned
+    unchanged. The last line is {"summary": {...}} with counts and
+    throughput. A line longer than VAULT_ROTATE_MAX_LINE ends the stream
+    early with an "error" field next to the summary.
+    """
+    if not vault:
+        raise HTTPException(status_code=503, detail="Vault not initialized")
+    
+    async def rotated():
+        stats = RotationStats()
+        window = []
+        in_flight = 2 * max(1, ROTATE_WORKERS)
+        start = 0
+        pending = bytearray()
+        lines: List[bytes] = []
+        error = None
+        
+        def submit(batch: List[bytes]):
+            nonlocal start
+            window.append(asyncio.wrap_future(vault.submit_rotation(start, batch)))
+            start += len(batch)
+        
+        async def collect() -> bytes:
+            out, chunk_stats = await window.pop(0)
+            stats.add(chunk_stats)
+            return out
+        
+        try:
+            async for chunk in request.stream():
+                if b"\n" in chunk:
+                    *complete, tail = (bytes(pending) + chunk).split(b"\n")
+                    lines.extend(complete)
+                    pending = bytearray(tail)
+                else:
+                    pending += chunk
+                if len(pending) > VAULT_ROTATE_MAX_LINE:
+                    error = f"Line {start + len(lines)} exceeds {VAULT_ROTATE_MAX_LINE} bytes"
+                    pending = bytearray()
+                    break
+                while len(lines) >= ROTATE_CHUNK_SIZE:
+                    submit(lines[:ROTATE_CHUNK_SIZE])
+                    lines = lines[ROTATE_CHUNK_SIZE:]
+                    while len(window) >= in_flight:
+                        yield await collect()
+            if pending:
+                lines.append(bytes(pending))
+            if lines:
+                submit(lines)
+            while window:
+                yield await collect()
+        finally:
+            for future in window:
+                future.cancel()
+        
+        annotate(request, rotated=stats.rotated, unchanged=stats.unchanged, failed=stats.failed)
+        trailer = {"summary": stats.as_dict()}
+        if error:
+            trailer["error"] = error
+        yield json.dumps(trailer).encode() + b"\n"
+    
+    return DuplexStreamingResponse(rotated(), media_type="application/x-ndjson")
+
+async def read_raw_body(request: Request, limit: int = VAULT_MAX_RAW_SIZE,
+                        stream_route: str = "/vault/encrypt-stream") -> bytes:
+    """Read an octet-stream body, refusing anything over limit bytes."""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Body too large (max {limit} bytes); use {stream_route}"
+        )
+    
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Body too large (max {limit} bytes); use {stream_route}"
+            )
+    return bytes(body)
+
+@app.post("/vault/encrypt-raw")
+async def encrypt_secret_raw(
+    request: Request,
+    user: dict = Depends(verify_token)  #PROTECTED
+):
+    """
+    Encrypt a binary secret sent as application/octet-stream.
+    Returns the Fernet token bytes with no JSON wrapping.
+    """
+    if not vault:
+        raise HTTPException(status_code=503, detail="Vault not initialized")
+    
+    data = await read_raw_body(request)
+    try:
+        token = vault.encrypt_bytes(data)
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return Response(content=token, media_type="application/octet-stream")
+
+@app.post("/vault/decrypt-raw")
+async def decrypt_secret_raw(
+    request: Request,
+    user: dict = Depends(verify_token)  #PROTECTED
+):
+    """
+    Decrypt a Fernet token sent as application/octet-stream.
+    Returns the original bytes, so binary secrets round-trip intact.
+    """
+    if not vault:
+        raise HTTPException(status_code=503, detail="Vault not initialized")
+    
+    token = await read_raw_body(request, VAULT_MAX_RAW_TOKEN_SIZE, "/vault/decrypt-stream")
+    try:
+        data = vault.decrypt_bytes(token.strip())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return Response(content=data, media_type="application/octet-stream")
+
+@app.post("/vault/encrypt-stream")
+async def encrypt_secret_stream(
+    request: Request,
+    user: dict = Depends(verify_token)  #PROTECTED
+):
+    """
+    Encrypt a raw request body of any size. The body is read and the
+    ciphertext written incrementally in the chunked stream format.
+    """
+    if not vault:
+        raise HTTPException(status_code=503, detail="Vault not initialized")
+    
+    encryptor = vault.stream_encryptor()
+    
+    async def ciphertext():
+        async for chunk in request.stream():
+            out = encryptor.update(chunk)
+            if out:
+                yield out
+        yield encryptor.finalize()
+    
+    return DuplexStreamingResponse(ciphertext(), media_type="application/octet-stream")
+
+@app.post("/vault/decrypt-stream")
+async def decrypt_secret_stream(
+    request: Request,
+    user: dict = Depends(verify_token)  #PROTECTED
+):
+    """
+    Decrypt a body produced by /vault/encrypt-stream, returning plaintext
+    incrementally. Header and key errors return 400; corruption found later
+    in the stream aborts the response.
+    """
+    if not vault:
+        raise HTTPException(status_code=503, detail="Vault not initialized")
+    
+    decryptor = vault.stream_decryptor()
+    body = request.stream()
+    pending = []
+    
+    # Validate the stream header before committing to a 200 response
+    try:
+        async for chunk in body:
+            pending.append(decryptor.update(chunk))
+            if decryptor.header_parsed:
+                break
+        if not decryptor.header_parsed:
+            decryptor.finalize()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Decryption failed: {str(e)}")
+    
+    async def plaintext():
+        for out in pending:
+            if out:
+                yield out
+        async for chunk in body:
+            out = decryptor.update(chunk)
+            if out:
+                yield out
+        decryptor.finalize()
+    
+    return DuplexStreamingResponse(plaintext(), media_type="application/octet-stream")
+
 # ============================================================================
 # AWS SECURITY ROUTES (PROTECTED)
 # ============================================================================
 
+async def run_until_disconnect(request: Request, awaitable):
+    """
+    Await an AWS facade call, cancelling it if the client goes away first.
+    Timeouts map to 504.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=AWS_DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="AWS call timed out")
+    finally:
+        if not task.done():
+            task.cancel()
+
+async def fetch_bucket_page(request: Request, limit: Optional[int], cursor: Optional[str],
+                            prefix: Optional[str]):
+    """
+    Resolve paging parameters to (bucket_names, next_cursor).
+    Returns (None, None) when no paging parameter was given.
+    """
+    if limit is None and cursor is None and prefix is None:
+        return None, None
+    
+    try:
+        return await run_until_disconnect(
+            request, aws_sentinel.list_buckets_page(limit or BUCKET_PAGE_SIZE, cursor, prefix)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/aws/buckets")
-async def list_s3_buckets(user: dict = Depends(verify_token)):
-    """List all S3 buckets. Requires authentication."""
+async def list_s3_buckets(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    cursor: Optional[str] = None,
+    prefix: Optional[str] = None,
+    user: dict = Depends(verify_token)
+):
+    """
+    List S3 buckets. Requires authentication.
+    With limit/cursor/prefix, returns one page plus next_cursor.
+    """
     if not aws_sentinel:
         raise HTTPException(status_code=503, detail="AWS Sentinel not initialized")
     
     try:
-        buckets = aws_sentinel.list_buckets()
+        buckets, next_cursor = await fetch_bucket_page(request, limit, cursor, prefix)
+        if buckets is None:
+            buckets = await run_until_disconnect(request, aws_sentinel.list_buckets())
+            paged = {}
+        else:
+            paged = {"next_cursor": next_cursor}
+        
         return {
             "count": len(buckets),
             "buckets": buckets,
+            **paged,
             "timestamp": datetime.datetime.utcnow().isoformat()
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AWS error: {str(e)}")
 
 
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def parse_checks(checks: Optional[str]):
+    """Validate a ?checks=a,b query value against the check registry."""
+    if checks is None:
+        return None
+    try:
+        return resolve_checks(checks.split(","))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/aws/audit/{bucket_name}")
-async def audit_bucket(bucket_name: str, user: dict = Depends(verify_token)):
-    """Perform security audit on specific S3 bucket."""
+async def audit_bucket(
+    bucket_name: str,
+    request: Request,
+    fresh: bool = False,
+    checks: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    user: dict = Depends(verify_token)
+):
+    """
+    Perform security audit on specific S3 bucket.
+    Results are cached (AWS_AUDIT_CACHE_TTL); ?fresh=true forces a new scan
+    and a matching If-None-Match returns 304. ?checks=a,b runs a subset.
+    """
     if not aws_sentinel:
         raise HTTPException(status_code=503, detail="AWS Sentinel not initialized")
     
+    selected = parse_checks(checks)
     try:
-        audit = aws_sentinel.full_security_audit(bucket_name)
-        return audit
+        audit, etag = await run_until_disconnect(
+            request, aws_sentinel.audit_bucket_cached(bucket_name, fresh, selected)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Audit failed: {str(e)}")
+    
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(audit, headers={"ETag": etag})
 
 
 @app.get("/aws/audit-all")
-async def audit_all_buckets(user: dict = Depends(verify_token)):
-    """Perform security audit on ALL S3 buckets. Requires authentication."""
+async def audit_all_buckets(
+    request: Request,
+    fresh: bool = False,
+    stream: bool = False,
+    checks: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    cursor: Optional[str] = None,
+    prefix: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    user: dict = Depends(verify_token)
+):
+    """
+    Perform security audit on ALL S3 buckets. Requires authentication.
+    Per-bucket results come from the audit cache unless ?fresh=true.
+    With limit/cursor/prefix only one page of buckets is audited and
+    next_cursor points at the following page.
+    With ?stream=true or Accept: application/x-ndjson, audits are streamed
+    one per line as they finish, followed by a summary record.
+    """
     if not aws_sentinel:
         raise HTTPException(status_code=503, detail="AWS Sentinel not initialized")
     
+    selected = parse_checks(checks)
     try:
-        results = aws_sentinel.audit_all_buckets()
-        
-        # Summary statistics
-        critical = sum(1 for r in results if r.get('public_access', {}).get('status') == 'CRITICAL')
-        warnings = sum(1 for r in results if r.get('public_access', {}).get('status') == 'WARNING')
-        
-        return {
-            "total_buckets": len(results),
-            "critical_issues": critical,
-            "warnings": warnings,
-            "audits": results,
-            "timestamp": datetime.datetime.utcnow().isoformat()
-        }
+        buckets, next_cursor = await fetch_bucket_page(request, limit, cursor, prefix)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Audit failed: {str(e)}")
+    paged = {} if buckets is None else {"next_cursor": next_cursor}
+    
+    if stream or "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(stream_audits(fresh, buckets, paged, selected), media_type="application/x-ndjson")
+    
+    try:
+        results, etag = await run_until_disconnect(
+            request, aws_sentinel.audit_all_buckets_cached(fresh, buckets=buckets, checks=selected)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Audit failed: {str(e)}")
+    
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    summary = AuditSummary()
+    for audit in results:
+        summary.add(audit)
+    
+    return JSONResponse({
+        **summary.as_dict(),
+        "audits": results,
+        **paged,
+        "timestamp": datetime.datetime.utcnow().isoformat()
+    }, headers={"ETag": etag})
+
+
+async def stream_audits(fresh: bool, buckets: Optional[List[str]], paged: dict,
+                        checks: Optional[tuple] = None):
+    """NDJSON body for /aws/audit-all: one audit per line, then a summary trailer."""
+    summary = AuditSummary()
+    try:
+        async for audit in aws_sentinel.iter_audits(fresh, buckets=buckets, checks=checks):
+            summary.add(audit)
+            yield json.dumps({"type": "audit", "audit": audit}) + "\n"
+    except Exception as e:
+        yield json.dumps({"type": "error", "detail": f"Audit failed: {str(e)}"}) + "\n"
+    
+    yield json.dumps({
+        "type": "summary",
+        **summary.as_dict(),
+        **paged,
+        "timestamp": datetime.datetime.utcnow().isoformat()
+    }) + "\n"
+
+
+@app.get("/aws/audit/{bucket_name}/objects")
+async def audit_bucket_objects(
+    bucket_name: str,
+    prefix: Optional[str] = None,
+    checkpoint: Optional[str] = None,
+    sample: float = Query(1.0, gt=0, le=1),
+    user: dict = Depends(verify_token)
+):
+    """
+    Scan object ACLs in a bucket for public grants, streamed as NDJSON.
+    Findings are written as they are found; a checkpoint record follows each
+    listing page and can be passed back as ?checkpoint= to resume.
+    ?sample=0.1 checks a deterministic 10% of keys.
+    """
+    if not aws_sentinel:
+        raise HTTPException(status_code=503, detail="AWS Sentinel not initialized")
+    
+    try:
+        decode_cursor(checkpoint, prefix)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return StreamingResponse(
+        stream_object_scan(bucket_name, prefix, checkpoint, sample),
+        media_type="application/x-ndjson"
+    )
+
+
+async def stream_object_scan(bucket_name: str, prefix: Optional[str],
+                             checkpoint: Optional[str], sample: float):
+    """NDJSON body for /aws/audit/{bucket_name}/objects."""
+    try:
+        async for record in aws_sentinel.scan_objects(bucket_name, prefix, checkpoint, sample):
+            yield json.dumps(record) + "\n"
+    except Exception as e:
+        yield json.dumps({"type": "error", "detail": f"Object scan failed: {str(e)}"}) + "\n"
+
+
+@app.get("/aws/audit-accounts")
+async def audit_accounts(
+    request: Request,
+    fresh: bool = False,
+    accounts: Optional[str] = None,
+    checks: Optional[str] = None,
+    details: bool = False,
+    user: dict = Depends(verify_token)
+):
+    """
+    Audit every configured AWS account concurrently. Requires authentication.
+    Returns per-account summaries and the combined counts; ?accounts=a,b
+    limits the run and ?details=true includes each account's bucket audits.
+    """
+    if not account_auditor or not account_auditor.accounts:
+        raise HTTPException(status_code=503, detail="No AWS accounts configured")
+    
+    selected = parse_checks(checks)
+    names = [a.strip() for a in accounts.split(",") if a.strip()] if accounts else None
+    try:
+        return await run_until_disconnect(
+            request, account_auditor.audit_accounts_async(fresh, names, selected, details)
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Audit failed: {str(e)}")
+
+
+@app.get("/aws/snapshots")
+async def list_snapshots(user: dict = Depends(verify_token)):
+    """List stored audit snapshot IDs, oldest first."""
+    ids = await run_in_threadpool(snapshot_store.list_ids)
+    return {"count": len(ids), "snapshots": ids}
+
+
+@app.get("/aws/snapshots/latest")
+async def latest_snapshot(user: dict = Depends(verify_token)):
+    """Return the most recent scheduled scan from disk."""
+    snapshot_id = await run_in_threadpool(snapshot_store.latest_id)
+    if snapshot_id is None:
+        raise HTTPException(status_code=404, detail="No snapshots yet")
+    return await run_in_threadpool(snapshot_store.load, snapshot_id)
+
+
+@app.get("/aws/snapshots/diff")
+async def diff_snapshot(
+    from_id: Optional[str] = Query(None, alias="from"),
+    to_id: Optional[str] = Query(None, alias="to"),
+    user: dict = Depends(verify_token)
+):
+    """
+    Buckets whose status changed between two snapshots.
+    Defaults to the two most recent snapshots.
+    """
+    ids = await run_in_threadpool(snapshot_store.list_ids)
+    to_id = to_id or (ids[-1] if ids else None)
+    if from_id is None and to_id in ids:
+        index = ids.index(to_id)
+        from_id = ids[index - 1] if index > 0 else None
+    if not from_id or not to_id:
+        raise HTTPException(status_code=404, detail="Need two snapshots to diff")
+    
+    try:
+        old = await run_in_threadpool(snapshot_store.load, from_id)
+        new = await run_in_threadpool(snapshot_store.load, to_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return diff_snapshots(old, new)
@@ -0,0 +1,399 @@
+import os
+import atexit
+import bisect
+import fcntl
+import json
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Per-process metric shards live here; /metrics merges them so counts are
+# correct across every uvicorn worker
+METRICS_DIR = os.getenv("SENTINEL_METRICS_DIR", os.path.join(tempfile.gettempdir(), "sentinel-metrics"))
+METRICS_FLUSH_SECONDS = float(os.getenv("SENTINEL_METRICS_FLUSH_SECONDS", "5"))
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Registry:
+    """
+    In-process metric values plus the background thread that writes them to
+    this process's shard file. Values reset after a fork so a child never
+    re-reports its parent's counts.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, "_Metric"] = {}
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.dirty = False
+        self._flusher = None
+        self._claimed = None
+
+    def after_fork(self):
+        """
+        Runs in a forked child: the parent's lock may have been held by
+        another thread at fork time, so it is replaced along with the values.
+        """
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.dirty = False
+        self._flusher = None
+        for metric in self.metrics.values():
+            metric.values.clear()
+
+    def register(self, metric: "_Metric"):
+        self.metrics[metric.name] = metric
+
+    def touch(self):
+        """Called under lock on every update."""
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self._flusher = None
+            for metric in self.metrics.values():
+                metric.values.clear()
+        self.dirty = True
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name="metrics-flush")
+            self._flusher.start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while pid == os.getpid():
+            time.sleep(METRICS_FLUSH_SECONDS)
+            self.flush()
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            self.dirty = False
+            return {name: metric.dump() for name, metric in self.metrics.items() if metric.values}
+
+    def flush(self):
+        """Write this process's values to its shard if anything changed."""
+        if not self.dirty:
+            return
+        data = {"pid": os.getpid(), "metrics": self.snapshot()}
+        directory = Path(METRICS_DIR)
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"metrics-{os.getpid()}.json"
+            if self._claimed != os.getpid():
+                # A shard under our pid belongs to an exited process (pid reuse)
+                _retire_shards([path])
+                self._claimed = os.getpid()
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data, separators=(",", ":")))
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"METRICS FLUSH ERROR: {e}")
+
+
+REGISTRY = _Registry()
+atexit.register(REGISTRY.flush)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=REGISTRY.after_fork)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """Monotonic counter, summed across processes."""
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with REGISTRY.lock:
+            REGISTRY.touch()
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dump(self) -> Dict:
+        return {
+            "type": self.kind, "help": self.documentation, "labels": self.labelnames,
+            "samples": [[list(key), value] for key, value in self.values.items()]
+        }
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram, bucket counts summed across processes."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with REGISTRY.lock:
+            REGISTRY.touch()
+            entry = self.values.get(key)
+            if entry is None:
+                # Per-bucket (non-cumulative) counts, then +Inf, sum
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of a with-block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def dump(self) -> Dict:
+        return {
+            "type": self.kind, "help": self.documentation, "labels": self.labelnames,
+            "buckets": self.buckets,
+            "samples": [[list(key), [list(counts), total]] for key, (counts, total) in self.values.items()]
+        }
+
+
+# ============================================================================
+# METRIC DEFINITIONS
+# ============================================================================
+
+HTTP_REQUESTS = Counter(
+    "sentinel_http_requests_total", "HTTP requests by route and status",
+    ("method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "sentinel_http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route")
+)
+
+BCRYPT_SECONDS = Histogram(
+    "sentinel_bcrypt_seconds", "bcrypt hash/verify time",
+    ("op",), buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0)
+)
+JWT_DECODE_SECONDS = Histogram(
+    "sentinel_jwt_decode_seconds", "JWT signature verification time",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+)
+JWT_FAILURES = Counter("sentinel_jwt_failures_total", "Rejected JWTs", ("reason",))
+JWT_CACHE = Counter("sentinel_jwt_cache_total", "Verified-token cache lookups", ("result",))
+
+VAULT_BYTES = Counter("sentinel_vault_bytes_total", "Bytes passed through the vault", ("op",))
+VAULT_SECONDS = Histogram(
+    "sentinel_vault_seconds", "Fernet encrypt/decrypt time",
+    ("op",), buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+)
+VAULT_ERRORS = Counter("sentinel_vault_errors_total", "Failed vault operations", ("op",))
+
+AUTH_REJECTED = Counter("sentinel_auth_rejected_total", "Auth requests shed by admission control", ("reason",))
+ADMISSION_ERRORS = Counter("sentinel_admission_errors_total", "Auth requests admitted unchecked because the limiter store failed")
+
+S3_CALLS = Counter("sentinel_s3_calls_total", "S3 API calls by operation and outcome", ("operation", "outcome"))
+S3_LATENCY = Histogram("sentinel_s3_call_seconds", "S3 API call latency including retries", ("operation",))
+S3_THROTTLED = Counter("sentinel_s3_throttled_total", "S3 attempts rejected by throttling", ("operation",))
+
+AUDIT_EVENTS = Counter("sentinel_audit_events_total", "Audit trail events by outcome", ("outcome",))
+AUDIT_FLUSH_SECONDS = Histogram(
+    "sentinel_audit_flush_seconds", "Audit trail batch write time",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+)
+AUDIT_WRITE_ERRORS = Counter("sentinel_audit_write_errors_total", "Failed audit trail batch writes")
+
+
+# ============================================================================
+# AGGREGATION
+# ============================================================================
+
+RETIRED_SHARD = "metrics-retired.json"
+
+
+def _read_shards() -> List[Dict]:
+    shards = []
+    for path in Path(METRICS_DIR).glob("metrics-*.json"):
+        try:
+            shards.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            # Being replaced right now; the next scrape picks it up
+            continue
+    return shards
+
+
+def _pid_alive(pid) -> bool:
+    if not isinstance(pid, int):
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge(shards: Iterable[Dict], merged: Optional[Dict[str, Dict]] = None) -> Dict[str, Dict]:
+    """Sum shard samples into merged (name -> metric with samples keyed by label tuple)."""
+    merged = {} if merged is None else merged
+    for shard in shards:
+        for name, metric in shard["metrics"].items():
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                current = target["samples"].get(key)
+                if metric["type"] == "histogram":
+                    if current is None or len(current[0]) != len(value[0]):
+                        target["samples"][key] = [list(value[0]), value[1]]
+                    else:
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                else:
+                    target["samples"][key] = (current or 0) + value
+    return merged
+
+
+def _retire_shards(paths: List[Path]):
+    """
+    Fold the shards of exited processes into the retired aggregate and
+    delete them, so the directory does not grow with every worker restart
+    and a reused pid cannot overwrite a dead process's counts.
+    """
+    directory = Path(METRICS_DIR)
+    with open(directory / ".retire.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        shards = []
+        for path in paths:
+            try:
+                shards.append(json.loads(path.read_text()))
+            except FileNotFoundError:
+                # Already folded by another process
+                continue
+            except (OSError, ValueError):
+                continue
+        if not shards:
+            return
+
+        retired = directory / RETIRED_SHARD
+        try:
+            merged = _merge([json.loads(retired.read_text())])
+        except FileNotFoundError:
+            merged = {}
+        merged = _merge(shards, merged)
+        data = {"pid": None, "metrics": {
+            name: {**metric, "samples": [[list(key), value] for key, value in metric["samples"].items()]}
+            for name, metric in merged.items()
+        }}
+        tmp = retired.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, separators=(",", ":")))
+        os.replace(tmp, retired)
+        for path in paths:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def collect() -> Dict[str, Dict]:
+    """
+    Merge every process's shard. Shards of exited processes are folded
+    into one retired aggregate, so counters never go backwards when a
+    worker restarts.
+    """
+    REGISTRY.flush()
+    own = os.getpid()
+    shards = [s for s in _read_shards() if s.get("pid") != own]
+
+    dead = [s["pid"] for s in shards if s.get("pid") is not None and not _pid_alive(s["pid"])]
+    if dead:
+        try:
+            _retire_shards([Path(METRICS_DIR) / f"metrics-{pid}.json" for pid in dead])
+            shards = [s for s in _read_shards() if s.get("pid") != own]
+        except OSError as e:
+            print(f"METRICS RETIRE ERROR: {e}")
+
+    shards.append({"pid": own, "metrics": REGISTRY.snapshot()})
+    return _merge(shards)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(merged: Optional[Dict[str, Dict]] = None) -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    merged = collect() if merged is None else merged
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric["labels"]
+        for key, value in sorted(metric["samples"].items()):
+            if metric["type"] == "histogram":
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(list(metric["buckets"]) + ["+Inf"], counts):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _number(bound)
+                    lines.append(f"{name}_bucket{_labels(labelnames, key, ('le', le))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labelnames, key)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(labelnames, key)} {cumulative}")
+            else:
+                lines.append(f"{name}{_labels(labelnames, key)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request counts and latency per route
+    template (e.g. /aws/audit/{bucket_name}), so label cardinality stays
+    bounded. Streaming responses are timed until the last body chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc(method=method, route=path, status=status[0])
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=method, route=path)
@@ -2,22 +2,395 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
+import asyncio
+import hashlib
+import hmac
+import math
+import secrets
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from jose import ExpiredSignatureError, JWTError, jwt
 from passlib.context import CryptContext
 
+from sentinel_metrics import BCRYPT_SECONDS, JWT_CACHE, JWT_DECODE_SECONDS, JWT_FAILURES
+
 # Configuration
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 JWT_ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# bcrypt runs in worker processes so it never blocks the event loop.
+# The pool is per API process: N uvicorn workers start N pools of this size.
+HASH_POOL_WORKERS = int(os.getenv("SHADOW_GATE_HASH_WORKERS") or os.cpu_count() or 1)
+
+# Verified-token LRU cache size (0 disables the cache)
+TOKEN_CACHE_SIZE = int(os.getenv("SHADOW_GATE_TOKEN_CACHE_SIZE", "10000"))
+
+# Access token revocation: authoritative SQLite store, per-worker Bloom filter
+REVOCATION_DB_PATH = os.getenv("SHADOW_GATE_REVOCATION_DB", "data/revocations.db")
+REVOCATION_SYNC_SECONDS = float(os.getenv("SHADOW_GATE_REVOCATION_SYNC_SECONDS", "1"))
+REVOCATION_CAPACITY = int(os.getenv("SHADOW_GATE_REVOCATION_CAPACITY", "100000"))
+
+# Rotating refresh tokens
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("SHADOW_GATE_REFRESH_DAYS", "30"))
+REFRESH_DB_PATH = os.getenv("SHADOW_GATE_REFRESH_DB", "data/refresh_tokens.db")
+
 if not JWT_SECRET_KEY:
     raise ValueError("JWT_SECRET_KEY not found in environment")
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+_hash_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _hash_password(password: str) -> Tuple[str, float]:
+    """Pool worker: hash a password. Returns (hash, seconds)."""
+    start = time.perf_counter()
+    hashed = pwd_context.hash(password)
+    return hashed, time.perf_counter() - start
+
+
+def _verify_password(plain_password: str, hashed_password: str) -> Tuple[bool, float]:
+    """Pool worker: verify a password against its hash. Returns (ok, seconds)."""
+    start = time.perf_counter()
+    ok = pwd_context.verify(plain_password, hashed_password)
+    return ok, time.perf_counter() - start
+
+
+def get_hash_pool() -> ProcessPoolExecutor:
+    """Return the bcrypt process pool, creating it on first use."""
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(max_workers=max(1, HASH_POOL_WORKERS))
+    return _hash_pool
+
+
+def shutdown_hash_pool():
+    """Stop the bcrypt process pool (called on application shutdown)."""
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=True, cancel_futures=True)
+        _hash_pool = None
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest)."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationList:
+    """
+    Revoked access tokens.
+    SQLite holds the authoritative entries (by jti, plus per-user "issued
+    before" cutoffs), each kept only until the tokens it covers expire.
+    Every worker mirrors them into a Bloom filter and a small dict that a
+    background thread refreshes every REVOCATION_SYNC_SECONDS, so the
+    verify path does no I/O unless the filter reports a (possible) hit.
+    """
+
+    _SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS revoked_tokens (
+            id         INTEGER PRIMARY KEY AUTOINCREMENT,
+            jti        TEXT NOT NULL UNIQUE,
+            expires_at REAL NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS revoked_users (
+            id            INTEGER PRIMARY KEY AUTOINCREMENT,
+            username      TEXT NOT NULL,
+            revoked_after REAL NOT NULL,
+            expires_at    REAL NOT NULL
+        )""",
+    )
+    _INSERT_TOKEN = "INSERT OR IGNORE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)"
+    _INSERT_USER = "INSERT INTO revoked_users (username, revoked_after, expires_at) VALUES (?, ?, ?)"
+    _SELECT_TOKEN = "SELECT 1 FROM revoked_tokens WHERE jti = ? AND expires_at > ?"
+    _NEW_TOKENS = "SELECT id, jti FROM revoked_tokens WHERE id > ? AND expires_at > ?"
+    _NEW_USERS = "SELECT id, username, revoked_after FROM revoked_users WHERE id > ? AND expires_at > ?"
+    _COUNT_TOKENS = "SELECT COUNT(*) FROM revoked_tokens WHERE expires_at > ?"
+    _PRUNE = (
+        "DELETE FROM revoked_tokens WHERE expires_at <= ?",
+        "DELETE FROM revoked_users WHERE expires_at <= ?",
+    )
+    _REBUILD_SECONDS = 600
+
+    def __init__(self, path=REVOCATION_DB_PATH, sync_interval: float = REVOCATION_SYNC_SECONDS,
+                 capacity: int = REVOCATION_CAPACITY):
+        self.path = str(path)
+        self.sync_interval = sync_interval
+        self.capacity = capacity
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        self._sync_pid = None
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in self._SCHEMA:
+            conn.execute(statement)
+
+        self._rebuild()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _rebuild(self):
+        """Prune expired entries and rebuild the filter from what is left."""
+        now = time.time()
+        conn = self._connection()
+        for statement in self._PRUNE:
+            conn.execute(statement, (now,))
+        count = conn.execute(self._COUNT_TOKENS, (now,)).fetchone()[0]
+
+        bloom = BloomFilter(max(self.capacity, 2 * count))
+        last_token = 0
+        for row_id, jti in conn.execute(self._NEW_TOKENS, (0, now)):
+            bloom.add(jti)
+            last_token = max(last_token, row_id)
+        users = conn.execute(self._NEW_USERS, (0, now)).fetchall()
+
+        with self._sync_lock:
+            self._bloom, self._user_cutoffs = bloom, {}
+            self._last_token, self._last_user = last_token, 0
+            self._merge_users(users)
+            self._rebuild_at = now + self._REBUILD_SECONDS
+
+    def _merge_users(self, rows):
+        """Fold revoked_users rows into the cutoff dict (called under _sync_lock)."""
+        if not rows:
+            return
+        # Replaced rather than mutated so is_revoked can read it without the lock
+        cutoffs = dict(self._user_cutoffs)
+        for row_id, username, revoked_after in rows:
+            cutoffs[username] = max(cutoffs.get(username, 0), revoked_after)
+            self._last_user = max(self._last_user, row_id)
+        self._user_cutoffs = cutoffs
+
+    def sync(self):
+        """Pull entries other workers added since the last sync."""
+        now = time.time()
+        if now >= self._rebuild_at:
+            self._rebuild()
+            return
+
+        conn = self._connection()
+        tokens = conn.execute(self._NEW_TOKENS, (self._last_token, now)).fetchall()
+        users = conn.execute(self._NEW_USERS, (self._last_user, now)).fetchall()
+        with self._sync_lock:
+            for row_id, jti in tokens:
+                self._bloom.add(jti)
+                self._last_token = max(self._last_token, row_id)
+            self._merge_users(users)
+
+    def _sync_loop(self):
+        pid = os.getpid()
+        while pid == os.getpid():
+            time.sleep(self.sync_interval)
+            try:
+                self.sync()
+            except sqlite3.Error as e:
+                print(f"REVOCATION SYNC ERROR: {e}")
+
+    def _ensure_syncing(self):
+        if self._sync_pid != os.getpid():
+            with self._sync_lock:
+                if self._sync_pid != os.getpid():
+                    self._sync_pid = os.getpid()
+                    threading.Thread(target=self._sync_loop, daemon=True, name="revocation-sync").start()
+
+    def revoke(self, jti: str, expires_at: float):
+        """Revoke one token until its exp."""
+        self._connection().execute(self._INSERT_TOKEN, (jti, expires_at))
+        with self._sync_lock:
+            self._bloom.add(jti)
+
+    def revoke_user(self, username: str, expires_at: float):
+        """Revoke every token issued to a user so far (until expires_at)."""
+        now = time.time()
+        self._connection().execute(self._INSERT_USER, (username, now, expires_at))
+        with self._sync_lock:
+            # Row id 0: leave _last_user alone so sync still reads rows other workers wrote before ours
+            self._merge_users([(0, username, now)])
+
+    def is_revoked(self, payload: dict) -> bool:
+        """Hot path: filter and dict lookups; SQLite only on a filter hit."""
+        self._ensure_syncing()
+
+        cutoff = self._user_cutoffs.get(payload.get("sub"))
+        if cutoff is not None and payload.get("iat", 0) <= cutoff:
+            return True
+
+        jti = payload.get("jti")
+        if jti is None or jti not in self._bloom:
+            return False
+        # Possible hit (or false positive): ask the authoritative store
+        return self._connection().execute(self._SELECT_TOKEN, (jti, time.time())).fetchone() is not None
+
+
+class RefreshTokenStore:
+    """
+    Rotating refresh tokens in SQLite (WAL).
+    A token is "<id>.<secret>"; only an HMAC of the secret is stored, so
+    validation is one primary-key lookup plus a constant-time compare.
+    Every token belongs to a family (one login). Presenting a token that
+    was already rotated means it leaked, and revokes the whole family.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS refresh_tokens (
+            token_id    TEXT PRIMARY KEY,
+            family_id   TEXT NOT NULL,
+            username    TEXT NOT NULL,
+            secret_hash TEXT NOT NULL,
+            expires_at  REAL NOT NULL,
+            used_at     REAL,
+            revoked     INTEGER NOT NULL DEFAULT 0
+        )
+    """
+    _INDEX = "CREATE INDEX IF NOT EXISTS refresh_tokens_family ON refresh_tokens (family_id)"
+    _SELECT = "SELECT family_id, username, secret_hash, expires_at, used_at, revoked FROM refresh_tokens WHERE token_id = ?"
+    _INSERT = "INSERT INTO refresh_tokens (token_id, family_id, username, secret_hash, expires_at) VALUES (?, ?, ?, ?, ?)"
+    _MARK_USED = "UPDATE refresh_tokens SET used_at = ? WHERE token_id = ?"
+    _REVOKE_FAMILY = "UPDATE refresh_tokens SET revoked = 1 WHERE family_id = ?"
+    _REVOKE_USER = "UPDATE refresh_tokens SET revoked = 1 WHERE username = ?"
+    _PRUNE = "DELETE FROM refresh_tokens WHERE expires_at < ?"
+    _PRUNE_EVERY = 1000
+
+    def __init__(self, path=REFRESH_DB_PATH, secret: str = JWT_SECRET_KEY,
+                 expire_days: int = REFRESH_TOKEN_EXPIRE_DAYS):
+        self.path = str(path)
+        self.expire_seconds = expire_days * 86400
+        self._hmac_key = hashlib.sha256(b"refresh-token:" + secret.encode()).digest()
+        self._local = threading.local()
+        self._issued = 0
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(self._SCHEMA)
+        conn.execute(self._INDEX)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _hash(self, secret: str) -> str:
+        return hmac.new(self._hmac_key, secret.encode(), hashlib.sha256).hexdigest()
+
+    def _insert(self, conn, username: str, family_id: str, now: float) -> str:
+        token_id = secrets.token_urlsafe(12)
+        secret = secrets.token_urlsafe(32)
+        conn.execute(self._INSERT, (token_id, family_id, username, self._hash(secret), now + self.expire_seconds))
+        self._issued += 1
+        if self._issued % self._PRUNE_EVERY == 0:
+            conn.execute(self._PRUNE, (now,))
+        return f"{token_id}.{secret}"
+
+    def issue(self, username: str) -> str:
+        """Start a new token family (one per login) and return its first token."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            token = self._insert(conn, username, uuid.uuid4().hex, time.time())
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return token
+
+    def rotate(self, token: str) -> Tuple[str, str]:
+        """
+        Exchange a refresh token for its successor.
+        Returns (username, new_token).
+
+        Raises:
+            ValueError: If the token is unknown, expired, revoked or reused
+        """
+        token_id, _, secret = token.partition(".")
+        if not token_id or not secret:
+            raise ValueError("Invalid refresh token")
+
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(self._SELECT, (token_id,)).fetchone()
+            if row is None or not hmac.compare_digest(row[2], self._hash(secret)):
+                raise ValueError("Invalid refresh token")
+
+            family_id, username, _, expires_at, used_at, revoked = row
+            if revoked:
+                raise ValueError("Refresh token revoked")
+            if used_at is not None:
+                # Someone already rotated this token: treat the family as stolen
+                conn.execute(self._REVOKE_FAMILY, (family_id,))
+                conn.execute("COMMIT")
+                raise ValueError("Refresh token reuse detected; session revoked")
+            if expires_at < now:
+                raise ValueError("Refresh token expired")
+
+            conn.execute(self._MARK_USED, (now, token_id))
+            new_token = self._insert(conn, username, family_id, now)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return username, new_token
+
+    def revoke(self, token: str) -> bool:
+        """Revoke the family a token belongs to (logout). Returns False if unknown."""
+        token_id, _, secret = token.partition(".")
+        conn = self._connection()
+        row = conn.execute(self._SELECT, (token_id,)).fetchone()
+        if row is None or not hmac.compare_digest(row[2], self._hash(secret)):
+            return False
+        conn.execute(self._REVOKE_FAMILY, (row[0],))
+        return True
+
+    def revoke_user(self, username: str) -> int:
+        """Revoke every refresh token a user holds. Returns rows changed."""
+        return self._connection().execute(self._REVOKE_USER, (username,)).rowcount
+
 
 class ShadowGate:
     """
@@ -25,15 +398,55 @@ class ShadowGate:
     Handles token generation, validation, and password hashing.
     """
     
+    def __init__(self, token_cache_size: int = TOKEN_CACHE_SIZE, refresh_db=REFRESH_DB_PATH,
+                 revocation_db=REVOCATION_DB_PATH):
+        self._refresh_db = refresh_db
+        self._refresh_store: Optional[RefreshTokenStore] = None
+        self._refresh_lock = threading.Lock()
+        self._revocation_db = revocation_db
+        self._revocations: Optional[RevocationList] = None
+        
+        # sha256(token) -> (exp, payload), least recently used first
+        self._token_cache: OrderedDict = OrderedDict()
+        self._token_cache_size = token_cache_size
+        self._token_cache_lock = threading.Lock()
+        self.token_cache_hits = 0
+        self.token_cache_misses = 0
+    
+    # The pool workers only measure bcrypt; the timing is recorded here in
+    # the API process, so pool children never touch the metrics registry.
+    
     @staticmethod
     def hash_password(password: str) -> str:
         """Hash a password for secure storage."""
-        return pwd_context.hash(password)
+        hashed, seconds = _hash_password(password)
+        BCRYPT_SECONDS.observe(seconds, op="hash")
+        return hashed
     
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
         """Verify a password against its hash."""
-        return pwd_context.verify(plain_password, hashed_password)
+        ok, seconds = _verify_password(plain_password, hashed_password)
+        BCRYPT_SECONDS.observe(seconds, op="verify")
+        return ok
+    
+    @staticmethod
+    async def hash_password_async(password: str) -> str:
+        """Hash a password in the bcrypt process pool."""
+        loop = asyncio.get_running_loop()
+        hashed, seconds = await loop.run_in_executor(get_hash_pool(), _hash_password, password)
+        BCRYPT_SECONDS.observe(seconds, op="hash")
+        return hashed
+    
+    @staticmethod
+    async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        """Verify a password in the bcrypt process pool."""
+        loop = asyncio.get_running_loop()
+        ok, seconds = await loop.run_in_executor(
+            get_hash_pool(), _verify_password, plain_password, hashed_password
+        )
+        BCRYPT_SECONDS.observe(seconds, op="verify")
+        return ok
     
     @staticmethod
     def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -54,16 +467,22 @@ class ShadowGate:
         else:
             expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         
-        to_encode.update({"exp": expire})
+        # jti identifies the token for revocation; iat for per-user revocation.
+        # iat keeps milliseconds (rounded down): a whole-second value would put
+        # a token issued just after a revoke_user at or below its cutoff.
+        issued_at = math.floor(time.time() * 1000) / 1000
+        to_encode.update({"exp": expire, "iat": issued_at, "jti": uuid.uuid4().hex})
         encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
         
         return encoded_jwt
     
-    @staticmethod
-    def verify_token(token: str) -> dict:
+    def verify_token(self, token: str) -> dict:
         """
         Verify and decode a JWT token.
         
+        Tokens that already passed verification are served from an LRU
+        cache until their exp, so repeat requests skip the decode.
+        
         Args:
             token: JWT token string
         
@@ -71,14 +490,112 @@ class ShadowGate:
             Decoded token payload
         
         Raises:
-            JWTError: If token is invalid or expired
+            ValueError: If token is invalid or expired
         """
-        try:
-            payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        key = hashlib.sha256(token.encode()).digest()
+        
+        payload = None
+        with self._token_cache_lock:
+            entry = self._token_cache.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._token_cache.move_to_end(key)
+                    self.token_cache_hits += 1
+                    payload = dict(entry[1])
+                else:
+                    # Expired: drop it and let jwt.decode reject the token
+                    del self._token_cache[key]
+            if payload is None:
+                self.token_cache_misses += 1
+        
+        if payload is not None:
+            JWT_CACHE.inc(result="hit")
+            self._check_revoked(payload)
             return payload
+        JWT_CACHE.inc(result="miss")
+        
+        try:
+            with JWT_DECODE_SECONDS.time():
+                payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        except ExpiredSignatureError as e:
+            JWT_FAILURES.inc(reason="expired")
+            raise ValueError(f"Invalid token: {e}")
         except JWTError as e:
+            JWT_FAILURES.inc(reason="invalid")
             raise ValueError(f"Invalid token: {e}")
-
+        
+        exp = payload.get("exp")
+        if self._token_cache_size > 0 and isinstance(exp, (int, float)):
+            with self._token_cache_lock:
+                self._token_cache[key] = (exp, dict(payload))
+                self._token_cache.move_to_end(key)
+                while len(self._token_cache) > self._token_cache_size:
+                    self._token_cache.popitem(last=False)
+        
+        self._check_revoked(payload)
+        return payload
+    
+    def _check_revoked(self, payload: dict):
+        if self.revocations.is_revoked(payload):
+            JWT_FAILURES.inc(reason="revoked")
+            raise ValueError("Token has been revoked")
+    
+    def revoke_token(self, payload: dict):
+        """Revoke a verified token (by jti) until it expires."""
+        if not payload.get("jti"):
+            raise ValueError("Token has no jti and cannot be revoked individually")
+        self.revocations.revoke(payload["jti"], payload["exp"])
+    
+    def revoke_user(self, username: str):
+        """Revoke every access and refresh token issued to a user so far."""
+        # Covers any access token still alive, whatever its issue time
+        expires_at = time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        self.revocations.revoke_user(username, expires_at)
+        self.refresh_store.revoke_user(username)
+    
+    @property
+    def revocations(self) -> RevocationList:
+        """Access token revocation list, opened on first use."""
+        if self._revocations is None:
+            with self._refresh_lock:
+                if self._revocations is None:
+                    self._revocations = RevocationList(self._revocation_db)
+        return self._revocations
+    
+    @property
+    def refresh_store(self) -> RefreshTokenStore:
+        """Refresh token store, opened on first use."""
+        if self._refresh_store is None:
+            with self._refresh_lock:
+                if self._refresh_store is None:
+                    self._refresh_store = RefreshTokenStore(self._refresh_db)
+        return self._refresh_store
+    
+    def create_refresh_token(self, username: str) -> str:
+        """Issue a long-lived refresh token starting a new rotation family."""
+        return self.refresh_store.issue(username)
+    
+    def rotate_refresh_token(self, refresh_token: str) -> Tuple[str, str]:
+        """
+        Validate a refresh token and rotate it. No bcrypt involved.
+        
+        Returns:
+            (username, new_refresh_token)
+        
+        Raises:
+            ValueError: If the token is invalid, expired, revoked or reused
+        """
+        return self.refresh_store.rotate(refresh_token)
+    
+    def token_cache_stats(self) -> dict:
+        """Return hit/miss counters and current size of the token cache."""
+        with self._token_cache_lock:
+            return {
+                "hits": self.token_cache_hits,
+                "misses": self.token_cache_misses,
+                "size": len(self._token_cache),
+                "max_size": self._token_cache_size
+            }
 
 if __name__ == "__main__":
     # Test the gate
@@ -101,6 +618,8 @@ if __name__ == "__main__":
     # Test token verification
     decoded = gate.verify_token(token)
     print(f"Decoded Token: {decoded}")
+    gate.verify_token(token)
+    print(f"Token Cache: {gate.token_cache_stats()}")
     
     print("\n" + "=" * 60)
     print("Shadow-Gate operational. Authentication system ready.")
@@ -0,0 +1,76 @@
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+from cryptography.fernet import Fernet
+
+
+# The application modules read their configuration at import time, so the
+# environment has to be in place before any test module imports them.
+# Everything they write (users.json, SQLite stores, audit segments) goes
+# to a throwaway directory.
+ROOT = Path(__file__).resolve().parent.parent
+WORK_DIR = Path(tempfile.mkdtemp(prefix="sentinel-tests-"))
+ADMIN_USERNAME = "sentinel-admin"
+
+os.environ.update({
+    "JWT_SECRET_KEY": "sentinel-test-secret",
+    "SENTINEL_MASTER_KEY": Fernet.generate_key().decode(),
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_SCAN_INTERVAL_SECONDS": "0",
+    "SENTINEL_ADMIN_USERS": ADMIN_USERNAME,
+    "SENTINEL_ADMISSION_DIR": str(WORK_DIR / "admission"),
+    "SENTINEL_METRICS_DIR": str(WORK_DIR / "metrics"),
+    "SENTINEL_AUDIT_DIR": str(WORK_DIR / "audit"),
+    "SENTINEL_USERS_DB": str(WORK_DIR / "users.db"),
+    "SHADOW_GATE_REFRESH_DB": str(WORK_DIR / "refresh_tokens.db"),
+    "SHADOW_GATE_REVOCATION_DB": str(WORK_DIR / "revocations.db"),
+    "AWS_SNAPSHOT_DIR": str(WORK_DIR / "snapshots"),
+    # Admission control has its own tests; keep it out of the API tests
+    "SENTINEL_AUTH_IP_RATE": "0",
+    "SENTINEL_AUTH_USER_RATE": "0",
+    "SENTINEL_REGISTER_IP_RATE": "0",
+})
+os.chdir(WORK_DIR)
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient for the API, with the lifespan (pools, audit writer) running."""
+    from fastapi.testclient import TestClient
+    from sentinel_api import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def register(client):
+    """Register a fresh user and return the token response."""
+    def _register(username=None, **extra):
+        body = {"username": username or f"user-{uuid.uuid4().hex[:8]}", "password": "correct-horse", **extra}
+        response = client.post("/auth/register", json=body)
+        assert response.status_code == 200, response.text
+        return response.json()
+    return _register
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    """Bearer header for the allowlisted admin (SENTINEL_ADMIN_USERS)."""
+    body = {"username": ADMIN_USERNAME, "password": "correct-horse"}
+    response = client.post("/auth/register", json=body)
+    if response.status_code != 200:
+        response = client.post("/auth/login", json=body)
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def bearer(tokens: dict) -> dict:
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
@@ -0,0 +1,68 @@
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def limiter(tmp_path):
+    from admission import TokenBucketLimiter
+
+    return TokenBucketLimiter(tmp_path / "buckets.db")
+
+
+def test_bucket_admits_burst_then_rejects(limiter):
+    assert [limiter.acquire("k", 60, 3) for _ in range(3)] == [0.0, 0.0, 0.0]
+    retry_after = limiter.acquire("k", 60, 3)
+    assert 0 < retry_after <= 1.0
+
+
+def test_disabled_bucket_always_admits(limiter):
+    assert all(limiter.acquire("k", 0, 1) == 0.0 for _ in range(10))
+
+
+def test_rejection_does_not_spend_other_buckets(limiter):
+    ip, user = ("ip", 60, 3), ("user", 60, 1)
+    assert limiter.acquire_all([ip, user]) == (None, 0.0)
+    for _ in range(5):
+        rejected, retry_after = limiter.acquire_all([ip, user])
+        assert rejected == 1 and retry_after > 0
+
+    # The IP bucket only paid for the one admitted attempt
+    other_user = ("other", 60, 5)
+    assert [limiter.acquire_all([ip, other_user])[0] for _ in range(3)] == [None, None, 0]
+
+
+def test_buckets_are_shared_between_instances(tmp_path):
+    from admission import TokenBucketLimiter
+
+    first = TokenBucketLimiter(tmp_path / "buckets.db")
+    second = TokenBucketLimiter(tmp_path / "buckets.db")
+    assert first.acquire("k", 60, 1) == 0.0
+    assert second.acquire("k", 60, 1) > 0
+
+
+def test_admit_fails_open_and_counts_errors(client, monkeypatch):
+    import sentinel_api
+    from sentinel_metrics import ADMISSION_ERRORS
+
+    def broken(buckets):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(sentinel_api, "AUTH_IP_RATE", 60.0)
+    monkeypatch.setattr(sentinel_api.auth_limiter, "acquire_all", broken)
+    before = ADMISSION_ERRORS.values.get((), 0)
+    response = client.post("/auth/login", json={"username": "nobody", "password": "wrong-password"})
+    assert response.status_code == 401
+    assert ADMISSION_ERRORS.values.get((), 0) == before + 1
+
+
+def test_login_rate_limit_returns_retry_after(client, monkeypatch):
+    import sentinel_api
+
+    monkeypatch.setattr(sentinel_api, "AUTH_USER_RATE", 1.0)
+    monkeypatch.setattr(sentinel_api, "AUTH_USER_BURST", 1.0)
+    body = {"username": "rate-limited", "password": "wrong-password"}
+    assert client.post("/auth/login", json=body).status_code == 401
+    response = client.post("/auth/login", json=body)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
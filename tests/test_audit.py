@@ -0,0 +1,81 @@
+import pytest
+
+from conftest import bearer
+
+
+def test_audit_events_requires_admin(client, register, admin_headers):
+    assert client.get("/audit/events").status_code in (401, 403)
+    assert client.get("/audit/events", headers=bearer(register(role="admin"))).status_code == 403
+
+    response = client.get("/audit/events", headers=admin_headers, params={"limit": 5})
+    assert response.status_code == 200
+    assert "events" in response.json()
+
+
+def _event(second: int, user: str, route: str = "/vault/encrypt", status: int = 200) -> dict:
+    return {
+        "ts": f"2024-01-01T00:00:{second:02d}",
+        "id": f"{second:02d}-{user}",
+        "route": route,
+        "status": status,
+        "user": user,
+    }
+
+
+@pytest.fixture(params=[True, False], ids=["gzip", "plain"])
+def trail(tmp_path, request):
+    """Two writers (workers) whose segments interleave in time."""
+    from audit_trail import AuditFileWriter
+
+    writers = [AuditFileWriter(tmp_path, compress=request.param, retention_days=0) for _ in range(2)]
+    for batch in range(3):
+        for worker, writer in enumerate(writers):
+            writer.write([_event(batch * 10 + worker * 2 + i, f"user{worker}") for i in range(2)])
+    writers[0].close()  # one finalized segment, one still being written
+    return tmp_path
+
+
+def test_query_merges_segments_in_time_order(trail):
+    from audit_index import AuditIndex
+
+    result = AuditIndex(trail).query(limit=100)
+    times = [e["ts"] for e in result["events"]]
+    assert result["count"] == 12
+    assert times == sorted(times)
+    assert result["next_cursor"] is None
+
+
+def test_query_pages_with_cursor(trail):
+    from audit_index import AuditIndex
+
+    index = AuditIndex(trail)
+    seen, cursor = [], None
+    while True:
+        page = index.query(limit=5, cursor=cursor)
+        seen.extend(e["id"] for e in page["events"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 12
+    assert seen == sorted(seen)
+
+
+def test_query_filters_and_skips_blocks(trail):
+    from audit_index import AuditIndex
+
+    result = AuditIndex(trail).query(user="user1", since="2024-01-01T00:00:10")
+    assert [e["user"] for e in result["events"]] == ["user1"] * 4
+    assert all(e["ts"] >= "2024-01-01T00:00:10" for e in result["events"])
+    assert result["blocks_read"] < result["blocks_total"]
+
+
+def test_cursor_is_bound_to_its_filters(trail):
+    from audit_index import AuditIndex
+
+    index = AuditIndex(trail)
+    cursor = index.query(user="user0", limit=2)["next_cursor"]
+    assert cursor
+    with pytest.raises(ValueError):
+        index.query(user="user1", cursor=cursor)
+    with pytest.raises(ValueError):
+        index.query(cursor="not-a-cursor")
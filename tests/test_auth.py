@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+from conftest import bearer
+
+
+def test_register_ignores_requested_role(client, register):
+    tokens = register(role="admin")
+    assert tokens["user"]["role"] == "user"
+    assert client.get("/auth/me", headers=bearer(tokens)).json()["role"] == "user"
+
+
+def test_self_registered_admin_cannot_revoke(client, register):
+    """Regression: role=admin at registration used to pass require_admin."""
+    attacker = register(role="admin")
+    victim = register()
+    response = client.post("/auth/revoke", headers=bearer(attacker),
+                           json={"username": victim["user"]["username"]})
+    assert response.status_code == 403
+    assert client.get("/auth/me", headers=bearer(victim)).status_code == 200
+
+
+def test_forged_role_claim_is_not_admin(client, register):
+    """A validly signed token claiming role=admin still needs the allowlist."""
+    from sentinel_api import gate
+
+    user = register()
+    forged = gate.create_access_token({"sub": user["user"]["username"], "role": "admin"})
+    response = client.post("/auth/revoke", headers={"Authorization": f"Bearer {forged}"},
+                           json={"username": user["user"]["username"]})
+    assert response.status_code == 403
+
+
+def test_allowlisted_admin_can_revoke_user(client, register, admin_headers):
+    victim = register()
+    response = client.post("/auth/revoke", headers=admin_headers,
+                           json={"username": victim["user"]["username"]})
+    assert response.status_code == 200
+    assert client.get("/auth/me", headers=bearer(victim)).status_code == 401
+    refreshed = client.post("/auth/refresh", json={"refresh_token": victim["refresh_token"]})
+    assert refreshed.status_code == 401
+
+
+def test_logout_revokes_access_token(client, register):
+    tokens = register()
+    assert client.post("/auth/logout", headers=bearer(tokens)).status_code == 200
+    assert client.get("/auth/me", headers=bearer(tokens)).status_code == 401
+
+
+def test_refresh_rotates_and_detects_reuse(client, register):
+    tokens = register()
+    first = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert first.status_code == 200
+    rotated = first.json()["refresh_token"]
+    assert rotated != tokens["refresh_token"]
+
+    # Replaying the old token revokes the whole family, including its successor
+    reused = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert reused.status_code == 401
+    assert "reuse" in reused.json()["detail"].lower()
+    assert client.post("/auth/refresh", json={"refresh_token": rotated}).status_code == 401
+
+
+def test_revocation_list_syncs_between_workers(tmp_path):
+    from shadow_gate import RevocationList
+
+    path = tmp_path / "revocations.db"
+    writer = RevocationList(path, sync_interval=3600)
+    reader = RevocationList(path, sync_interval=3600)
+    expires = time.time() + 60
+    writer.revoke("jti-1", expires)
+    writer.revoke_user("alice", expires)
+
+    # The writer sees its own revocations at once, the reader after a sync
+    assert writer.is_revoked({"jti": "jti-1", "sub": "bob", "iat": time.time()})
+    reader.sync()
+    assert reader.is_revoked({"jti": "jti-1", "sub": "bob", "iat": time.time()})
+    assert reader.is_revoked({"jti": "jti-2", "sub": "alice", "iat": time.time() - 1})
+    assert not reader.is_revoked({"jti": "jti-3", "sub": "bob", "iat": time.time()})
+
+
+def test_user_revocation_spares_tokens_issued_later(tmp_path):
+    from shadow_gate import RevocationList
+
+    revocations = RevocationList(tmp_path / "revocations.db", sync_interval=3600)
+    revocations.revoke_user("alice", time.time() + 60)
+    time.sleep(0.002)
+    assert not revocations.is_revoked({"jti": "new", "sub": "alice", "iat": time.time()})
+
+
+def test_bloom_filter_has_no_false_negatives():
+    from shadow_gate import BloomFilter
+
+    bloom = BloomFilter(1000)
+    items = [f"jti-{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"other-{i}" in bloom for i in range(1000))
+    assert false_positives < 20
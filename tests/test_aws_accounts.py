@@ -0,0 +1,47 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+
+class FakeSTS:
+    def __init__(self):
+        self.calls = []
+
+    def assume_role(self, **params):
+        self.calls.append(params)
+        return {"Credentials": {
+            "AccessKeyId": f"AKIA{len(self.calls)}",
+            "SecretAccessKey": "secret",
+            "SessionToken": "token",
+            "Expiration": datetime(2099, 1, 1, tzinfo=timezone.utc),
+        }}
+
+
+def test_assume_role_session_uses_public_provider_chain(monkeypatch):
+    import boto3
+    from aws_accounts import session_for_account
+
+    sts = FakeSTS()
+    monkeypatch.setattr(boto3.session.Session, "client", lambda self, name, **kwargs: sts)
+    account = {"name": "prod", "role_arn": "arn:aws:iam::123456789012:role/audit", "external_id": "x-1"}
+    session = session_for_account(account)
+    credentials = session.get_credentials()
+
+    # Deferred: STS is only called once the credentials are used
+    assert credentials.method == "sts-assume-role"
+    assert sts.calls == []
+    assert credentials.get_frozen_credentials().access_key == "AKIA1"
+    assert sts.calls == [{"RoleArn": account["role_arn"], "RoleSessionName": "aws-sentinel", "ExternalId": "x-1"}]
+
+
+def test_load_accounts_validates_entries(tmp_path):
+    from aws_accounts import load_accounts
+
+    assert load_accounts(tmp_path / "missing.json") == []
+    path = tmp_path / "accounts.json"
+    for accounts in ({"name": "a"}, [{"name": "a"}, {"name": "a"}],
+                     [{"name": "a", "profile": "p", "role_arn": "r"}], [{"role_arn": "r"}]):
+        path.write_text(json.dumps(accounts))
+        with pytest.raises(ValueError):
+            load_accounts(path)
@@ -0,0 +1,122 @@
+import threading
+from collections import Counter
+
+import pytest
+
+
+RESPONSES = {
+    "get_bucket_acl": {"Grants": [{"Grantee": {"Type": "Group",
+                                               "URI": "http://acs.amazonaws.com/groups/global/AllUsers"},
+                                   "Permission": "WRITE"}]},
+    "get_bucket_encryption": {"ServerSideEncryptionConfiguration": {"Rules": []}},
+    "get_bucket_versioning": {"Status": "Enabled", "MFADelete": "Disabled"},
+}
+
+
+@pytest.fixture
+def sentinel(monkeypatch):
+    """AWSSentinel whose S3 calls are answered locally and counted."""
+    from aws_sentinel import AWSSentinel
+
+    sentinel = AWSSentinel(max_workers=4, cache_ttl=300)
+    sentinel.calls = Counter()
+    sentinel.gate = threading.Event()
+    sentinel.gate.set()
+    lock = threading.Lock()
+
+    def fake_call(bucket_name, operation):
+        sentinel.gate.wait(5)
+        with lock:
+            sentinel.calls[operation] += 1
+        if operation in RESPONSES:
+            return RESPONSES[operation], None
+        return None, RuntimeError(f"{operation} not stubbed")
+
+    monkeypatch.setattr(sentinel, "_call", fake_call)
+    yield sentinel
+    sentinel.shutdown()
+
+
+def test_default_checks_are_the_original_three():
+    from aws_sentinel import CHECK_REGISTRY, DEFAULT_CHECKS, resolve_checks
+
+    assert set(DEFAULT_CHECKS) == {"public_access", "encryption", "versioning"}
+    assert resolve_checks(None) == DEFAULT_CHECKS
+    assert resolve_checks(["versioning", " mfa_delete", "versioning"]) == ("mfa_delete", "versioning")
+    assert {"mfa_delete", "public_access_block", "policy_status", "logging", "lifecycle"} <= set(CHECK_REGISTRY)
+    with pytest.raises(ValueError):
+        resolve_checks(["no_such_check"])
+
+
+def test_audit_shares_each_s3_call(sentinel):
+    audit = sentinel.full_security_audit("bucket", checks=["versioning", "mfa_delete"])
+    assert audit["versioning"]["versioning_enabled"] is True
+    assert audit["mfa_delete"]["mfa_delete_enabled"] is False
+    assert sentinel.calls == {"get_bucket_versioning": 1}
+
+
+def test_default_audit_runs_only_default_checks(sentinel):
+    audit = sentinel.full_security_audit("bucket")
+    assert {k for k in audit if k not in ("bucket", "timestamp")} == {"public_access", "encryption", "versioning"}
+    assert audit["public_access"]["status"] == "CRITICAL"
+
+
+def test_summary_counts_buckets_by_public_access():
+    from aws_sentinel import AuditSummary
+
+    summary = AuditSummary()
+    summary.add({"public_access": {"status": "CRITICAL"}, "encryption": {"status": "WARNING"},
+                 "logging": {"status": "WARNING"}})
+    summary.add({"public_access": {"status": "WARNING"}, "encryption": {"status": "SECURE"}})
+    summary.add({"public_access": {"status": "SECURE"}, "policy_status": {"status": "CRITICAL"}})
+
+    result = summary.as_dict()
+    assert (result["total_buckets"], result["critical_issues"], result["warnings"]) == (3, 1, 1)
+    assert result["findings_by_check"] == {
+        "public_access": {"CRITICAL": 1, "WARNING": 1},
+        "encryption": {"CRITICAL": 0, "WARNING": 1},
+        "logging": {"CRITICAL": 0, "WARNING": 1},
+        "policy_status": {"CRITICAL": 1, "WARNING": 0},
+    }
+
+
+def test_concurrent_audits_share_one_in_flight_scan(sentinel):
+    sentinel.gate.clear()
+    first, key = sentinel._audit_future("bucket", checks=("versioning",))
+    second, second_key = sentinel._audit_future("bucket", checks=("versioning",))
+    assert second is first and second_key == key
+    assert len(sentinel._inflight[key][1]) == 1
+
+    sentinel.gate.set()
+    audit, _ = sentinel._audit_result(first)
+    assert audit["versioning"]["status"] == "SECURE"
+    assert sentinel.calls == {"get_bucket_versioning": 1}
+    assert key not in sentinel._inflight
+
+    # Served from the cache now, without another S3 call
+    sentinel.full_security_audit("bucket", checks=["versioning"])
+    assert sentinel.calls == {"get_bucket_versioning": 1}
+
+
+def test_last_caller_to_give_up_cancels_the_scan(sentinel):
+    from concurrent.futures import CancelledError
+
+    sentinel.gate.clear()
+    # Occupy every worker so the audit's call stays queued
+    blockers = [sentinel.executor.submit(sentinel.gate.wait, 5) for _ in range(sentinel.max_workers)]
+    future, key = sentinel._audit_future("bucket", checks=("versioning",))
+    sentinel._audit_future("bucket", checks=("versioning",))
+    calls = sentinel._inflight[key][1]
+
+    sentinel._release_audit(key, future)
+    assert not calls[0].cancelled()
+    sentinel._release_audit(key, future)
+    assert calls[0].cancelled()
+    assert key not in sentinel._inflight
+    with pytest.raises(CancelledError):
+        future.result(timeout=5)
+
+    sentinel.gate.set()
+    for blocker in blockers:
+        blocker.result(timeout=5)
+    assert sentinel.calls == {}
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+
+def _user(name: str) -> dict:
+    return {"username": name, "hashed_password": "x", "role": "user", "created_at": "2024-01-01T00:00:00"}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "users.json"
+
+
+def test_appends_keep_a_valid_json_file(path):
+    from user_store import JSONUserStore
+
+    store = JSONUserStore(path)
+    for name in ("alice", "bob", "carol"):
+        store.add(_user(name))
+    assert json.loads(path.read_text()) == {name: _user(name) for name in ("alice", "bob", "carol")}
+    with pytest.raises(ValueError):
+        store.add(_user("bob"))
+
+
+def test_other_workers_see_new_users(path):
+    from user_store import JSONUserStore
+
+    writer, reader = JSONUserStore(path), JSONUserStore(path)
+    assert reader.get("alice") is None
+    writer.add(_user("alice"))
+    assert reader.get("alice") == _user("alice")
+
+
+def test_appends_beyond_the_tail_window(path):
+    from user_store import JSONUserStore
+
+    store = JSONUserStore(path)
+    big = dict(_user("big"), note="x" * (3 * JSONUserStore._TAIL_WINDOW))
+    store.add(big)
+    store.add(_user("after"))
+    assert json.loads(path.read_text()) == {"big": big, "after": _user("after")}
+
+
+@pytest.mark.parametrize("cut", [5, 40, 90])
+def test_torn_append_is_cut_back(path, cut, capsys):
+    from user_store import JSONUserStore
+
+    JSONUserStore(path).add(_user("alice"))
+    intact = path.read_bytes()
+    JSONUserStore(path).add(_user("bob"))
+    # Simulate a crash part-way through bob's append
+    path.write_bytes(path.read_bytes()[:len(intact) - 1 + cut])
+
+    store = JSONUserStore(path)
+    assert store.all() == {"alice": _user("alice")}
+    assert "repaired torn write" in capsys.readouterr().out
+    assert json.loads(path.read_text()) == {"alice": _user("alice")}
+    store.add(_user("bob"))
+    assert JSONUserStore(path).get("bob") == _user("bob")
+
+
+def test_torn_first_entry_leaves_an_empty_store(path):
+    from user_store import JSONUserStore
+
+    JSONUserStore(path).add(_user("alice"))
+    path.write_bytes(path.read_bytes()[:30])
+    assert JSONUserStore(path).all() == {}
+
+
+def test_sqlite_store_and_migration(tmp_path, path):
+    from user_store import JSONUserStore, SQLiteUserStore, migrate_json_to_sqlite
+
+    JSONUserStore(path).add(_user("alice"))
+    db = tmp_path / "users.db"
+    assert migrate_json_to_sqlite(path, db) == 1
+    store = SQLiteUserStore(db)
+    assert store.get("alice") == _user("alice")
+    with pytest.raises(ValueError):
+        store.add(_user("alice"))
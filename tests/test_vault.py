@@ -0,0 +1,181 @@
+import json
+
+import pytest
+from cryptography.fernet import Fernet
+
+from conftest import bearer
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return Fernet.generate_key(), Fernet.generate_key()
+
+
+@pytest.fixture(scope="module")
+def old_vault(keys):
+    from Security_Vault import SecurityVault
+
+    return SecurityVault(keys[1], previous_keys=[])
+
+
+@pytest.fixture(scope="module")
+def vault(keys):
+    """Vault after a key rotation: new primary key, old key still decrypts."""
+    from Security_Vault import SecurityVault
+
+    rotated = SecurityVault(keys[0], previous_keys=[keys[1]])
+    yield rotated
+    rotated.shutdown()
+
+
+def _encrypt_stream(vault, payload: bytes, chunk_size: int = 1024) -> bytes:
+    return b"".join(vault.encrypt_stream([payload[i:i + 700] for i in range(0, len(payload), 700)], chunk_size))
+
+
+def _decrypt_stream(vault, data: bytes, piece: int = 333) -> bytes:
+    return b"".join(vault.decrypt_stream(data[i:i + piece] for i in range(0, len(data), piece)))
+
+
+def test_secret_round_trip(vault):
+    token = vault.encrypt_secret("db-password")
+    assert token != "db-password"
+    assert vault.decrypt_secret(token) == "db-password"
+    assert vault.decrypt_bytes(vault.encrypt_bytes(b"\x00\xffbinary")) == b"\x00\xffbinary"
+
+
+def test_decrypt_rejects_foreign_or_tampered_tokens(vault):
+    from Security_Vault import SecurityVault
+
+    stranger = SecurityVault(Fernet.generate_key(), previous_keys=[])
+    with pytest.raises(ValueError):
+        vault.decrypt_secret(stranger.encrypt_secret("secret"))
+    token = vault.encrypt_secret("secret")
+    with pytest.raises(ValueError):
+        vault.decrypt_secret(token[:-4] + ("A" if token[-4] != "A" else "B") + token[-3:])
+
+
+def test_batch_results_keep_index_and_errors(vault):
+    encrypted = vault.encrypt_many(["a", "b"])
+    tokens = [encrypted[0]["encrypted"], "garbage", encrypted[1]["encrypted"]]
+    results = vault.decrypt_many(tokens)
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[0]["decrypted"] == "a" and results[2]["decrypted"] == "b"
+    assert "error" in results[1]
+
+
+def test_rotation_moves_old_tokens_to_primary_key(vault, old_vault, keys):
+    old_token = old_vault.encrypt_secret("rotate me")
+    rotated, changed = vault.rotate_secret(old_token)
+    assert changed
+    assert Fernet(keys[0]).decrypt(rotated.encode()) == b"rotate me"
+
+    current = vault.encrypt_secret("already current")
+    assert vault.rotate_secret(current) == (current, False)
+
+    from Security_Vault import SecurityVault
+    with pytest.raises(ValueError):
+        vault.rotate_secret(SecurityVault(Fernet.generate_key(), previous_keys=[]).encrypt_secret("x"))
+
+
+def test_rotate_lines_keeps_form_order_and_failures(vault, old_vault):
+    from Security_Vault import RotationStats
+
+    old = old_vault.encrypt_secret
+    lines = [
+        json.dumps(old("one")).encode() + b"\n",
+        json.dumps({"id": 2, "encrypted": old("two")}).encode() + b"\n",
+        old("three").encode() + b"\n",
+        b"not a token\n",
+        json.dumps(vault.encrypt_secret("five")).encode() + b"\n",
+    ]
+    stats = RotationStats()
+    out = b"".join(vault.rotate_lines(lines, chunk_size=2, stats=stats)).splitlines()
+
+    assert vault.decrypt_secret(json.loads(out[0])) == "one"
+    record = json.loads(out[1])
+    assert record["id"] == 2 and vault.decrypt_secret(record["encrypted"]) == "two"
+    assert vault.decrypt_secret(out[2].decode()) == "three"
+    assert out[3] == b"not a token"
+    summary = stats.as_dict()
+    assert (summary["rotated"], summary["unchanged"], summary["failed"]) == (3, 1, 1)
+    assert summary["failed_lines"] == [3]
+
+
+@pytest.mark.parametrize("size", [0, 1, 1024, 1025, 5000])
+def test_stream_round_trip(vault, size):
+    payload = bytes(i % 251 for i in range(size))
+    assert _decrypt_stream(vault, _encrypt_stream(vault, payload)) == payload
+
+
+def test_stream_under_previous_key_still_decrypts(vault, old_vault):
+    data = _encrypt_stream(old_vault, b"x" * 3000)
+    assert _decrypt_stream(vault, data) == b"x" * 3000
+
+
+def _frames(data: bytes):
+    """Split an SVS1 stream into its header and raw frames."""
+    from Security_Vault import STREAM_FINAL_FLAG, STREAM_FRAME, STREAM_HEADER
+
+    header, offset, frames = data[:STREAM_HEADER.size], STREAM_HEADER.size, []
+    while offset < len(data):
+        (length,) = STREAM_FRAME.unpack_from(data, offset)
+        end = offset + STREAM_FRAME.size + (length & ~STREAM_FINAL_FLAG)
+        frames.append(data[offset:end])
+        offset = end
+    return header, frames
+
+
+def test_stream_detects_truncation(vault):
+    data = _encrypt_stream(vault, b"y" * 4000)
+    header, frames = _frames(data)
+    assert len(frames) == 4
+
+    # Dropping the final frame ends cleanly on a frame boundary, but is caught
+    with pytest.raises(ValueError, match="truncated"):
+        _decrypt_stream(vault, header + b"".join(frames[:-1]))
+    with pytest.raises(ValueError):
+        _decrypt_stream(vault, data[:-5])
+
+
+def test_stream_rejects_reordered_frames(vault):
+    header, frames = _frames(_encrypt_stream(vault, b"z" * 4000))
+    with pytest.raises(ValueError, match="authentication"):
+        _decrypt_stream(vault, header + frames[1] + frames[0] + b"".join(frames[2:]))
+
+
+def test_stream_header_is_authenticated(vault):
+    from Security_Vault import STREAM_HEADER
+
+    data = bytearray(_encrypt_stream(vault, b"w" * 2000))
+    # Shrink the declared chunk size: still valid, but the header is the AAD
+    magic, key_id, salt, chunk_size = STREAM_HEADER.unpack_from(data)
+    data[:STREAM_HEADER.size] = STREAM_HEADER.pack(magic, key_id, salt, chunk_size + 1)
+    with pytest.raises(ValueError, match="authentication"):
+        _decrypt_stream(vault, bytes(data))
+
+
+def test_stream_rejects_flipped_ciphertext_and_unknown_keys(vault):
+    from Security_Vault import SecurityVault
+
+    data = bytearray(_encrypt_stream(vault, b"v" * 2000))
+    data[-1] ^= 0x01
+    with pytest.raises(ValueError):
+        _decrypt_stream(vault, bytes(data))
+
+    stranger = SecurityVault(Fernet.generate_key(), previous_keys=[])
+    with pytest.raises(ValueError, match="unknown master key"):
+        _decrypt_stream(stranger, _encrypt_stream(vault, b"u"))
+
+
+def test_rotate_routes_require_admin(client, register, admin_headers):
+    from sentinel_api import vault
+
+    impostor = bearer(register(role="admin"))
+    token = vault.encrypt_secret("s")
+    assert client.post("/vault/rotate", headers=impostor, json={"secrets": [token]}).status_code == 403
+    assert client.post("/vault/rotate-stream", headers=impostor,
+                       content=json.dumps(token) + "\n").status_code == 403
+
+    response = client.post("/vault/rotate", headers=admin_headers, json={"secrets": [token]})
+    assert response.status_code == 200
+    assert response.json()["results"][0]["changed"] is False
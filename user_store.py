@@ -0,0 +1,299 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import fcntl
+import json
+import os
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+# Backend selection: "json" (users.json) or "sqlite"
+USER_STORE_BACKEND = os.getenv("SENTINEL_USER_STORE", "json").lower()
+USERS_DB_PATH = os.getenv("SENTINEL_USERS_DB", "users.db")
+
+
+class JSONUserStore:
+    """
+    User repository backed by users.json.
+    Keeps an in-memory index, reloads it when another worker changes the
+    file, and appends new users in place instead of rewriting the file.
+    """
+
+    def __init__(self, path="users.json"):
+        self.path = Path(path)
+        self._users: Dict[str, dict] = {}
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _file_stamp(self):
+        """Return (mtime, size) of the backing file, or None if missing."""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _refresh(self, locked=None):
+        """
+        Reload the index if the file changed since the last load.
+        locked is the flock-held file object when the caller is a writer.
+        """
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+
+        if stamp is None:
+            self._users = {}
+            self._stamp = None
+            return
+
+        try:
+            with open(self.path, 'r') as f:
+                users = json.load(f)
+        except ValueError:
+            # Another process is mid-write, or one crashed mid-write: take
+            # the file lock so a live writer finishes first, then repair
+            if locked is not None:
+                users = self._repair(locked)
+            else:
+                with open(self.path, 'r+b') as f:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    try:
+                        users = self._repair(f)
+                    finally:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+            stamp = self._file_stamp()
+
+        self._users = users
+        self._stamp = stamp
+
+    def get(self, username: str) -> Optional[dict]:
+        """Get user by username."""
+        with self._lock:
+            self._refresh()
+            return self._users.get(username)
+
+    def all(self) -> Dict[str, dict]:
+        """Return a copy of every stored user keyed by username."""
+        with self._lock:
+            self._refresh()
+            return dict(self._users)
+
+    def add(self, user: dict) -> dict:
+        """
+        Append a new user to the file.
+
+        Raises:
+            ValueError: If the username is already taken
+        """
+        username = user["username"]
+
+        with self._lock:
+            self.path.touch(exist_ok=True)
+            with open(self.path, 'r+b') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # Pick up writes other workers made before we got the lock
+                    self._stamp = None
+                    self._refresh(f)
+                    if username in self._users:
+                        raise ValueError("User already exists")
+
+                    self._append(f, username, user)
+                    self._users[username] = user
+                    self._stamp = self._file_stamp()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+        return user
+
+    # Bytes read back from the end of the file to find the closing brace
+    _TAIL_WINDOW = 4096
+
+    @classmethod
+    def _append(cls, f, username: str, user: dict):
+        """
+        Insert one entry before the closing brace of the JSON object.
+        Only a window at the end of the file is read and rewritten; a
+        crash part-way leaves a torn tail that _repair cuts off.
+        """
+        size = f.seek(0, os.SEEK_END)
+        window = cls._TAIL_WINDOW
+        while True:
+            base = max(0, size - window)
+            f.seek(base)
+            tail = f.read().rstrip()
+            body = tail[:-1].rstrip() if tail.endswith(b'}') else b''
+            if body or base == 0:
+                break
+            window *= 2
+
+        if not tail:
+            # Empty or new file
+            start, prefix = 0, '{'
+        elif not body:
+            raise ValueError("User store file is corrupt")
+        else:
+            start = base + len(body)
+            prefix = '' if body.endswith(b'{') else ','
+
+        # Same layout as json.dump(users, f, indent=2) without the outer braces
+        entry = json.dumps({username: user}, indent=2)[1:-1]
+
+        f.seek(start)
+        f.write((prefix + entry + '}').encode())
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+
+    def _repair(self, f) -> Dict[str, dict]:
+        """
+        Parse the file under its lock; if an append was torn by a crash,
+        cut back to the last complete entry. Entries use the indent=2
+        layout, so each one ends with a newline and two-space "}" (JSON
+        strings cannot hold a raw newline). The torn user was never
+        confirmed to its caller, so nothing acknowledged is lost.
+
+        Raises:
+            ValueError: If no complete prefix of the file parses
+        """
+        f.seek(0)
+        data = f.read()
+        try:
+            return json.loads(data) if data.strip() else {}
+        except ValueError:
+            pass
+
+        cut = len(data)
+        while cut > 0:
+            cut = data.rfind(b'\n  }', 0, cut)
+            if cut == -1:
+                # Even the first entry is torn
+                end = data.find(b'{') + 1 if data.lstrip().startswith(b'{') else 0
+            else:
+                end = cut + 4
+            if end <= 0:
+                break
+            try:
+                users = json.loads(data[:end] + b'\n}')
+            except ValueError:
+                continue
+            f.seek(end)
+            f.write(b'\n}')
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+            print(f"USER STORE WARNING: repaired torn write in {self.path}")
+            return users
+
+        raise ValueError(f"{self.path} is corrupt and could not be repaired")
+
+
+class SQLiteUserStore:
+    """
+    User repository backed by SQLite in WAL mode.
+    Lookups go through the username primary key index; readers never block
+    on writers, and each worker process/thread holds its own connection.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            username        TEXT PRIMARY KEY,
+            hashed_password TEXT NOT NULL,
+            role            TEXT NOT NULL,
+            created_at      TEXT NOT NULL
+        )
+    """
+    _SELECT_ONE = "SELECT username, hashed_password, role, created_at FROM users WHERE username = ?"
+    _SELECT_ALL = "SELECT username, hashed_password, role, created_at FROM users"
+    _INSERT = "INSERT INTO users (username, hashed_password, role, created_at) VALUES (?, ?, ?, ?)"
+    _INSERT_IGNORE = "INSERT OR IGNORE INTO users (username, hashed_password, role, created_at) VALUES (?, ?, ?, ?)"
+
+    def __init__(self, path=USERS_DB_PATH):
+        self.path = str(path)
+        self._local = threading.local()
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute(self._SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, username: str) -> Optional[dict]:
+        """Get user by username."""
+        row = self._connection().execute(self._SELECT_ONE, (username,)).fetchone()
+        return dict(row) if row else None
+
+    def all(self) -> Dict[str, dict]:
+        """Return every stored user keyed by username."""
+        rows = self._connection().execute(self._SELECT_ALL).fetchall()
+        return {row["username"]: dict(row) for row in rows}
+
+    def add(self, user: dict) -> dict:
+        """
+        Insert a new user.
+
+        Raises:
+            ValueError: If the username is already taken
+        """
+        conn = self._connection()
+        try:
+            with conn:
+                conn.execute(self._INSERT, self._row(user))
+        except sqlite3.IntegrityError:
+            raise ValueError("User already exists")
+        return user
+
+    def import_users(self, users: Dict[str, dict]) -> int:
+        """Bulk-insert users, skipping names that already exist. Returns rows added."""
+        conn = self._connection()
+        with conn:
+            before = conn.total_changes
+            conn.executemany(self._INSERT_IGNORE, (self._row(u) for u in users.values()))
+            return conn.total_changes - before
+
+    @staticmethod
+    def _row(user: dict):
+        return (user["username"], user["hashed_password"], user["role"], user["created_at"])
+
+
+def create_user_store(users_file="users.json"):
+    """Build the user store selected by SENTINEL_USER_STORE."""
+    if USER_STORE_BACKEND == "sqlite":
+        return SQLiteUserStore(USERS_DB_PATH)
+    if USER_STORE_BACKEND == "json":
+        return JSONUserStore(users_file)
+    raise ValueError(f"Unknown SENTINEL_USER_STORE backend: {USER_STORE_BACKEND}")
+
+
+def migrate_json_to_sqlite(users_file="users.json", db_path=USERS_DB_PATH) -> int:
+    """One-shot copy of users.json into the SQLite store. Safe to re-run."""
+    users = JSONUserStore(users_file).all()
+    return SQLiteUserStore(db_path).import_users(users)
+
+
+if __name__ == "__main__":
+    # Usage: python user_store.py migrate [users.json] [users.db]
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("Usage: python user_store.py migrate [users.json] [users.db]")
+        sys.exit(1)
+
+    source = sys.argv[2] if len(sys.argv) > 2 else "users.json"
+    target = sys.argv[3] if len(sys.argv) > 3 else USERS_DB_PATH
+
+    added = migrate_json_to_sqlite(source, target)
+    print(f"Migrated {added} users from {source} to {target}")